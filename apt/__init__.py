@@ -16,25 +16,91 @@
 #  along with this program; if not, write to the Free Software
 #  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
 #  USA
-# import the core of apt_pkg
-"""High-Level Interface for working with apt."""
+"""High-Level Interface for working with apt.
+
+The classes and functions of this package are imported from their modules
+when they are first used, and the configuration and the package system are
+initialized when the first :class:`Cache` or :class:`Cdrom` is created, so
+importing :mod:`apt` is cheap for programs which only need parts of it.
+
+Importing :mod:`apt` does not initialize :mod:`apt_pkg`; programs which
+use :mod:`apt_pkg` directly before creating a :class:`Cache` must call
+:func:`apt_pkg.init_config` and :func:`apt_pkg.init_system` themselves.
+"""
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
 import apt_pkg
 
-from apt.cache import Cache as Cache
-from apt.cache import ProblemResolver as ProblemResolver
+if TYPE_CHECKING:
+    from apt.cache import Cache as Cache
+    from apt.cache import ProblemResolver as ProblemResolver
+    from apt.cachediff import cache_diff as cache_diff
+    from apt.cdrom import Cdrom as Cdrom
+    from apt.package import Package as Package
+    from apt.package import Version as Version
+    from apt.scan import scan_roots as scan_roots
+
+__all__ = ["Cache", "Cdrom", "Package", "cache_diff", "scan_roots"]
+
+# The modules the public names of the package are imported from
+_LAZY = {
+    "Cache": "apt.cache",
+    "Cdrom": "apt.cdrom",
+    "Package": "apt.package",
+    "ProblemResolver": "apt.cache",
+    "Version": "apt.package",
+    "cache_diff": "apt.cachediff",
+    "scan_roots": "apt.scan",
+}
+
+# Submodules which used to be imported with the package
+_SUBMODULES = {
+    "aio",
+    "cache",
+    "cachediff",
+    "cdrom",
+    "changelog",
+    "fileindex",
+    "indexstore",
+    "package",
+    "progress",
+    "scan",
+    "search",
+    "stats",
+}
+
+_initialized = False
+
+
+def _init() -> None:
+    """Initialize the configuration and the package system once.
+
+    The configuration is not re-initialized if it has already been.
+    """
+    global _initialized
+    if _initialized:
+        return
+    if "APT" not in apt_pkg.config:
+        apt_pkg.init_config()
+    apt_pkg.init_system()
+    _initialized = True
 
-# import some fancy classes
-from apt.package import Package as Package
-from apt.package import Version as Version
 
-Cache  # pyflakes
-ProblemResolver  # pyflakes
-Version  # pyflakes
-from apt.cdrom import Cdrom as Cdrom
+def __getattr__(name: str) -> Any:
+    if name in _SUBMODULES:
+        # Importing a submodule makes it an attribute of the package
+        return importlib.import_module(f"{__name__}.{name}")
+    try:
+        module = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
 
-# init the package system, but do not re-initialize config
-if "APT" not in apt_pkg.config:
-    apt_pkg.init_config()
-apt_pkg.init_system()
 
-__all__ = ["Cache", "Cdrom", "Package"]
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY) | _SUBMODULES)
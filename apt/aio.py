@@ -0,0 +1,325 @@
+# aio.py - asyncio front-end for long running cache operations
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+"""Run cache operations from asyncio programs.
+
+The functions in this module start :meth:`apt.Cache.update`,
+:meth:`apt.Cache.fetch_archives` and :meth:`apt.Cache.commit` in a worker
+thread of the event loop and return an :class:`Operation`. Awaiting the
+operation returns the result of the cache method, and iterating over it
+with ``async for`` yields :class:`ProgressEvent` objects as they occur::
+
+    operation = cache.update_async()
+    async for event in operation:
+        print(event.kind, event.percent)
+    await operation
+
+The cache must not be used by other code while the operation runs.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+import apt_pkg
+
+from apt.progress.base import AcquireProgress, InstallProgress
+
+if TYPE_CHECKING:
+    from apt.cache import Cache
+
+__all__ = [
+    "Operation",
+    "ProgressEvent",
+    "commit",
+    "fetch_archives",
+    "update",
+]
+
+
+class ProgressEvent:
+    """An event reported by a running :class:`Operation`.
+
+    The attribute :attr:`kind` describes the event. Download events are
+    ``"start"`` and ``"stop"`` for the start and end of a download run,
+    ``"fetch"``, ``"done"``, ``"fail"`` and ``"ims_hit"`` for items, with
+    :attr:`uri`, :attr:`description` and, for failures, :attr:`message` set,
+    and ``"pulse"``, which is reported periodically. Installation events
+    are ``"status"`` with :attr:`package`, :attr:`percent` and
+    :attr:`message` set, and ``"error"`` with :attr:`package` and
+    :attr:`message` set.
+
+    Download events also carry the state of the download in
+    :attr:`current_bytes`, :attr:`total_bytes`, :attr:`current_items`,
+    :attr:`total_items` and :attr:`current_cps`, and the overall progress
+    in :attr:`percent`.
+
+    .. versionadded:: 3.0
+    """
+
+    __slots__ = (
+        "kind",
+        "uri",
+        "description",
+        "package",
+        "message",
+        "percent",
+        "current_bytes",
+        "total_bytes",
+        "current_items",
+        "total_items",
+        "current_cps",
+    )
+
+    def __init__(
+        self,
+        kind: str,
+        uri: str | None = None,
+        description: str | None = None,
+        package: str | None = None,
+        message: str | None = None,
+        percent: float = 0.0,
+        current_bytes: float = 0.0,
+        total_bytes: float = 0.0,
+        current_items: int = 0,
+        total_items: int = 0,
+        current_cps: float = 0.0,
+    ) -> None:
+        self.kind = kind
+        self.uri = uri
+        self.description = description
+        self.package = package
+        self.message = message
+        self.percent = percent
+        self.current_bytes = current_bytes
+        self.total_bytes = total_bytes
+        self.current_items = current_items
+        self.total_items = total_items
+        self.current_cps = current_cps
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for name in self.__slots__
+            if getattr(self, name) not in (None, 0, 0.0)
+        )
+        return f"<ProgressEvent {fields}>"
+
+
+class _AcquireProgress(AcquireProgress):
+    """Forward download progress to an operation."""
+
+    def __init__(self, operation: Operation) -> None:
+        self._operation = operation
+
+    def _event(self, kind: str, item: apt_pkg.AcquireItemDesc | None = None) -> None:
+        total = self.total_bytes + self.total_items
+        percent = 0.0
+        if total:
+            percent = (self.current_bytes + self.current_items) * 100.0 / total
+        event = ProgressEvent(
+            kind,
+            percent=percent,
+            current_bytes=self.current_bytes,
+            total_bytes=self.total_bytes,
+            current_items=self.current_items,
+            total_items=self.total_items,
+            current_cps=self.current_cps,
+        )
+        if item is not None:
+            event.uri = item.uri
+            event.description = item.description
+            if kind == "fail":
+                event.message = item.owner.error_text
+        self._operation._emit(event)
+
+    def done(self, item: apt_pkg.AcquireItemDesc) -> None:
+        self._event("done", item)
+
+    def fail(self, item: apt_pkg.AcquireItemDesc) -> None:
+        self._event("fail", item)
+
+    def fetch(self, item: apt_pkg.AcquireItemDesc) -> None:
+        self._event("fetch", item)
+
+    def ims_hit(self, item: apt_pkg.AcquireItemDesc) -> None:
+        self._event("ims_hit", item)
+
+    def pulse(self, owner: apt_pkg.Acquire) -> bool:
+        self._event("pulse")
+        return not self._operation.cancelled
+
+    def start(self) -> None:
+        AcquireProgress.start(self)
+        self._event("start")
+
+    def stop(self) -> None:
+        self._event("stop")
+
+
+class _InstallProgress(InstallProgress):
+    """Forward installation progress to an operation."""
+
+    def __init__(self, operation: Operation) -> None:
+        InstallProgress.__init__(self)
+        self._operation = operation
+
+    def error(self, pkg: str, errormsg: str) -> None:
+        self._operation._emit(ProgressEvent("error", package=pkg, message=errormsg))
+
+    def status_change(self, pkg: str, percent: float, status: str) -> None:
+        self._operation._emit(
+            ProgressEvent("status", package=pkg, message=status, percent=percent)
+        )
+
+
+class Operation:
+    """A cache operation running in a worker thread.
+
+    An operation is awaitable, returning the result of the operation or
+    raising its exception, and an asynchronous iterator over the
+    :class:`ProgressEvent` objects reported by it. Events are queued from
+    the start of the operation, so they are not lost if the iteration
+    starts late; the iteration ends when the operation has finished.
+
+    Calling :meth:`cancel`, or cancelling a task awaiting the operation,
+    stops a download at the next progress pulse, which makes the operation
+    raise :class:`apt.cache.FetchCancelledException`, or
+    :class:`apt.cache.FetchFailedException` for updates. An installation
+    that already started is not interrupted.
+
+    .. versionadded:: 3.0
+    """
+
+    def __init__(
+        self,
+        func: Callable[[Operation], Any],
+        loop: asyncio.AbstractEventLoop | None = None,
+        executor: concurrent.futures.Executor | None = None,
+    ) -> None:
+        self._loop = loop or asyncio.get_running_loop()
+        self._events: asyncio.Queue[ProgressEvent | None] = asyncio.Queue()
+        self._cancel = threading.Event()
+        self._future = self._loop.run_in_executor(executor, self._run, func)
+
+    def _run(self, func: Callable[[Operation], Any]) -> Any:
+        try:
+            return func(self)
+        finally:
+            self._loop.call_soon_threadsafe(self._events.put_nowait, None)
+
+    def _emit(self, event: ProgressEvent) -> None:
+        """Queue *event*; may be called from any thread."""
+        self._loop.call_soon_threadsafe(self._events.put_nowait, event)
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether :meth:`cancel` has been called."""
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        """Request the operation to stop."""
+        self._cancel.set()
+
+    def done(self) -> bool:
+        """Whether the operation has finished."""
+        return self._future.done()
+
+    async def wait(self) -> Any:
+        """Wait for the operation to finish and return its result."""
+        try:
+            return await asyncio.shield(self._future)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def __await__(self) -> Any:
+        return self.wait().__await__()
+
+    def __aiter__(self) -> Operation:
+        return self
+
+    async def __anext__(self) -> ProgressEvent:
+        event = await self._events.get()
+        if event is None:
+            # Keep the end marker for further iterations
+            self._events.put_nowait(None)
+            raise StopAsyncIteration
+        return event
+
+
+def update(
+    cache: Cache,
+    sources_list: str | None = None,
+    pulse_interval: int = 0,
+    raise_on_error: bool = True,
+) -> Operation:
+    """Run :meth:`apt.Cache.update` in a worker thread.
+
+    The parameters are passed to :meth:`apt.Cache.update`. The cache is
+    not reopened afterwards.
+
+    .. versionadded:: 3.0
+    """
+
+    def run(operation: Operation) -> int:
+        return cache.update(
+            _AcquireProgress(operation), pulse_interval, raise_on_error, sources_list
+        )
+
+    return Operation(run)
+
+
+def fetch_archives(
+    cache: Cache, allow_unauthenticated: bool | None = None
+) -> Operation:
+    """Run :meth:`apt.Cache.fetch_archives` in a worker thread.
+
+    .. versionadded:: 3.0
+    """
+
+    def run(operation: Operation) -> int:
+        return cache.fetch_archives(
+            _AcquireProgress(operation), allow_unauthenticated=allow_unauthenticated
+        )
+
+    return Operation(run)
+
+
+def commit(
+    cache: Cache,
+    install_progress: InstallProgress | None = None,
+    allow_unauthenticated: bool | None = None,
+) -> Operation:
+    """Run :meth:`apt.Cache.commit` in a worker thread.
+
+    Unless *install_progress* is given, the progress of the installation
+    is reported as events of the operation.
+
+    .. versionadded:: 3.0
+    """
+
+    def run(operation: Operation) -> bool:
+        fetch_progress = _AcquireProgress(operation)
+        if install_progress is not None:
+            return cache.commit(fetch_progress, install_progress, allow_unauthenticated)
+        with _InstallProgress(operation) as progress:
+            return cache.commit(fetch_progress, progress, allow_unauthenticated)
+
+    return Operation(run)
@@ -21,18 +21,29 @@
 
 from __future__ import annotations
 
+import concurrent.futures
+import contextlib
 import fnmatch
+import functools
+import http.client
 import os
+import threading
+import time
 import warnings
 import weakref
-from collections.abc import Callable, Iterator, KeysView
-from typing import Any, cast
+from collections.abc import Callable, Iterable, Iterator, KeysView, Sequence
+from typing import Any, TypeVar, cast
 
 import apt_pkg
 
+import apt.aio
 import apt.progress.text
+from apt.changelog import ChangelogFetcher
+from apt.fileindex import FileIndex
+from apt.indexstore import IndexStore
 from apt.package import Package, Version
 from apt.progress.base import AcquireProgress, InstallProgress, OpProgress
+from apt.search import SearchIndex
 
 
 class FetchCancelledException(IOError):
@@ -48,7 +59,13 @@ class UntrustedException(FetchFailedException):
 
 
 class LockFailedException(IOError):
-    """Exception that is thrown when locking fails."""
+    """Exception that is thrown when locking fails.
+
+    The attribute :attr:`holder_pid` is the process ID of the process
+    holding the lock, or ``None`` if it is not known.
+    """
+
+    holder_pid: int | None = None
 
 
 class CacheClosedException(Exception):
@@ -58,24 +75,232 @@ class CacheClosedException(Exception):
 class _WrappedLock:
     """Wraps an apt_pkg.FileLock to raise LockFailedException.
 
-    Initialized using a directory path."""
+    Initialized using a directory path and the number of seconds to wait
+    for the lock."""
 
-    def __init__(self, path: str) -> None:
+    def __init__(self, path: str, timeout: float = 0.0) -> None:
         self._path = path
-        self._lock = apt_pkg.FileLock(os.path.join(path, "lock"))
+        self._lock = apt_pkg.FileLock(os.path.join(path, "lock"), timeout)
+
+    @property
+    def timeout(self) -> float:
+        return self._lock.timeout
+
+    @timeout.setter
+    def timeout(self, timeout: float) -> None:
+        self._lock.timeout = timeout
 
     def __enter__(self) -> None:
         try:
             return self._lock.__enter__()
         except apt_pkg.Error as e:
-            raise LockFailedException(
+            exc = LockFailedException(
                 ("Failed to lock directory %s: %s") % (self._path, e)
             )
+            exc.holder_pid = self._lock.holder
+            raise exc
 
     def __exit__(self, typ: object, value: object, traceback: object) -> None:
         return self._lock.__exit__(typ, value, traceback)
 
 
+class Span:
+    """A span of a :class:`Tracer`, covering one operation.
+
+    Spans are context managers, entered for the time of the operation. This
+    class is the span of the default tracer, which records nothing.
+
+    .. versionadded:: 3.0
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> Span:
+        return self
+
+    def __exit__(self, typ: object, value: object, traceback: object) -> None:
+        return None
+
+    def is_recording(self) -> bool:
+        """Return whether attributes set on the span are recorded.
+
+        Attributes which are expensive to compute are only set on spans
+        which record them.
+        """
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set the attribute *key* of the span to *value*."""
+
+
+_NO_SPAN = Span()
+
+
+class Tracer:
+    """Trace the operations of :class:`Cache` and :class:`ProblemResolver`.
+
+    The operations call :meth:`span` with the name of the operation and
+    set attributes on the returned span, like the numbers of packages or
+    the bytes fetched. The spans of the phases of an operation, like
+    building the cache while opening it, are entered while the span of the
+    operation is.
+
+    This class does nothing. Subclass it to forward the spans to a tracing
+    system; for example, for an OpenTelemetry tracer::
+
+        class OpenTelemetryTracer(apt.cache.Tracer):
+            def __init__(self, tracer):
+                self.tracer = tracer
+
+            def span(self, name, attributes=None):
+                return self.tracer.start_as_current_span(name, attributes=attributes)
+
+        apt.cache.set_tracer(OpenTelemetryTracer(trace.get_tracer("apt")))
+
+    The spans and their attributes are:
+
+    ``apt.cache.open``
+        :meth:`Cache.open`, with the phases ``apt.cache.open.build`` for
+        building or loading the package cache, ``apt.cache.open.depcache``
+        for initializing the states of the packages and
+        ``apt.cache.open.sources`` for reading the sources lists. The
+        attributes are ``packages`` and ``versions``, and ``sources`` on
+        the span of the sources lists.
+    ``apt.cache.update``
+        :meth:`Cache.update`, with the attributes ``success`` and
+        ``bytes_fetched``, as last reported to the progress object.
+    ``apt.cache.fetch_archives``
+        Fetching the archives, from :meth:`Cache.fetch_archives` and
+        :meth:`Cache.commit`, with the attributes ``items``,
+        ``bytes_needed``, ``items_failed`` and ``bytes_fetched``.
+    ``apt.cache.install_archives``
+        :meth:`Cache.install_archives`, also called by :meth:`Cache.commit`,
+        with the attribute ``result``.
+    ``apt.cache.commit``
+        :meth:`Cache.commit`.
+    ``apt.cache.upgrade``
+        :meth:`Cache.upgrade`, with the attribute ``dist_upgrade``.
+    ``apt.cache.resolve``
+        :meth:`ProblemResolver.resolve` and
+        :meth:`ProblemResolver.resolve_by_keep`, with the attribute
+        ``by_keep``.
+
+    The spans of :meth:`Cache.commit`, :meth:`Cache.upgrade` and
+    ``apt.cache.resolve`` have the attributes ``install_count``,
+    ``delete_count``, ``keep_count`` and ``broken_count`` of the changes
+    marked, at the start of a commit and at the end otherwise.
+
+    .. versionadded:: 3.0
+    """
+
+    def span(self, name: str, attributes: dict[str, Any] | None = None) -> Span:
+        """Return a span for the operation *name* with the *attributes*.
+
+        The returned object is a context manager whose ``__enter__()``
+        returns an object with the methods of :class:`Span`.
+        """
+        return _NO_SPAN
+
+
+_tracer = Tracer()
+
+
+def set_tracer(tracer: Tracer | None) -> None:
+    """Trace the caches without a tracer of their own with *tracer*.
+
+    Passing ``None`` restores the default tracer, which does nothing.
+
+    .. versionadded:: 3.0
+    """
+    global _tracer
+    _tracer = tracer if tracer is not None else Tracer()
+
+
+# Held while a cache with its own configuration swapped it in for the
+# process-wide configuration of apt_pkg.
+_config_lock = threading.RLock()
+
+# How long a cache with its own configuration waits for the package system
+# lock at a time, before letting other caches swap theirs in.
+_LOCK_SLICE = 0.1
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+
+def _copy_config(config: apt_pkg.Configuration) -> apt_pkg.Configuration:
+    """Return a copy of *config*."""
+    copy = apt_pkg.Configuration()
+    lists = set()
+    for key in config.keys():
+        if not key.endswith("::"):
+            copy.set(key, config.find(key))
+        elif key not in lists:
+            # The items of a list all have the same key
+            lists.add(key)
+            for value in config.value_list(key[:-2]):
+                copy.set(key, value)
+    return copy
+
+
+def _translation_files(lists_dir: str, languages: Sequence[str]) -> list[str]:
+    """Return the translation files in *lists_dir* for *languages*.
+
+    The files are ordered like their languages in *languages*, followed by
+    English if it is not among them. Other languages are left out.
+    """
+    order = dict.fromkeys([*languages, "en"])
+    rank = {lang: i for i, lang in enumerate(order)}
+    found = []
+    for name in os.listdir(lists_dir):
+        _, sep, lang = name.partition("_i18n_Translation-")
+        lang = lang.split(".", 1)[0]
+        if sep and lang in rank:
+            found.append((rank[lang], name))
+    return [os.path.join(lists_dir, name) for _, name in sorted(found)]
+
+
+def _with_config(func: _F) -> _F:
+    """Run the decorated method of Cache with the configuration of the cache."""
+
+    @functools.wraps(func)
+    def wrapper(self: Cache, *args: Any, **kwargs: Any) -> Any:
+        with self._use_config():
+            return func(self, *args, **kwargs)
+
+    return cast(_F, wrapper)
+
+
+def _with_system(func: _F) -> _F:
+    """Like _with_config, also initializing the package system for it."""
+
+    @functools.wraps(func)
+    def wrapper(self: Cache, *args: Any, **kwargs: Any) -> Any:
+        with self._use_config(init_system=True):
+            return func(self, *args, **kwargs)
+
+    return cast(_F, wrapper)
+
+
+class _ConfiguredPackageManager:
+    """A PackageManager installing with the configuration of a cache.
+
+    The install actions run in a child process forked by the install
+    progress, which makes the configuration the one used by apt_pkg
+    without waiting for the lock of the parent process.
+    """
+
+    def __init__(self, pm: apt_pkg.PackageManager, config: apt_pkg.Configuration):
+        self._pm = pm
+        self._config = config
+
+    def do_install(self, status_fd: int = -1) -> int:
+        apt_pkg.swap_config(self._config, init_system=True)
+        return self._pm.do_install(status_fd)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pm, name)
+
+
 class Cache:
     """Dictionary-like package cache.
 
@@ -93,6 +318,31 @@ class Cache:
     sources.list and system lists/files are not read, only file relative
     to the given rootdir,
     memonly  -- build the cache in memory only.
+    config   -- an apt_pkg.Configuration object to use instead of the
+    global configuration apt_pkg.config, which is left untouched. The
+    global configuration and the package system are initialized when the
+    first cache without a configuration of its own is created.
+    index_store -- an apt.indexstore.IndexStore to share the package
+    lists, the status file and the caches generated from them with other
+    caches having identical ones. The cache then works on a private copy
+    of the configuration, redirected to the store each time it is opened,
+    and the package cache is kept in the store even if memonly is set.
+    Such caches cannot be updated and cannot commit changes.
+    tracer   -- a Tracer receiving the spans of the operations of the
+    cache, instead of the one set by set_tracer().
+
+    A cache with its own configuration makes it the configuration used by
+    apt_pkg while the cache opens, changes, updates, or sets up a commit,
+    which serializes these operations with those of the other caches with
+    their own configuration. Downloading archives and running dpkg happen
+    without holding the configuration. Caches for several root directories
+    can thus be used from one process, including from several threads,
+    provided code outside of apt.Cache does not use apt_pkg concurrently.
+    For example::
+
+        config = apt_pkg.Configuration()
+        apt_pkg.init_config(config)
+        cache = apt.Cache(rootdir="/srv/chroot", config=config)
 
 
     .. versionchanged:: 1.0
@@ -100,6 +350,12 @@ class Cache:
         The cache now supports package names with special architecture
         qualifiers such as :all and :native. It does not export them
         in :meth:`keys()`, though, to keep :meth:`keys()` a unique set.
+
+    .. versionchanged:: 3.0
+
+        Added the *config*, *index_store* and *tracer* parameters. The
+        package system is initialized here instead of when :mod:`apt` is
+        imported.
     """
 
     def __init__(
@@ -107,56 +363,183 @@ class Cache:
         progress: OpProgress | None = None,
         rootdir: str | None = None,
         memonly: bool = False,
+        config: apt_pkg.Configuration | None = None,
+        index_store: IndexStore | None = None,
+        tracer: Tracer | None = None,
     ) -> None:
+        if config is None:
+            apt._init()
+        self._config = config
+        self._index_store = index_store
+        # With an index store, the configuration naming the files of the
+        # root directory, and the store entry the cache was last opened from
+        self._index_source: apt_pkg.Configuration | None = None
+        self._index_entry: str | None = None
+        self._tracer = tracer
         self._cache: apt_pkg.Cache = cast(apt_pkg.Cache, None)
         self._depcache: apt_pkg.DepCache = cast(apt_pkg.DepCache, None)
         self._records: apt_pkg.PackageRecords = cast(
             apt_pkg.PackageRecords, None
         )  # noqa
+        # PackageRecords are cursors, so each thread gets its own one, kept
+        # in the "records" attribute and freed with its thread
+        self._thread_records = threading.local()
         self._list: apt_pkg.SourceList = cast(apt_pkg.SourceList, None)
         self._callbacks: dict[str, list[Callable[..., None] | str]] = {}  # noqa
         self._callbacks2: dict[
             str, list[tuple[Callable[..., Any], tuple[Any, ...], dict[Any, Any]]]
         ] = {}  # noqa
-        self._weakref: weakref.WeakValueDictionary[str, apt.Package] = (
-            weakref.WeakValueDictionary()
-        )  # noqa
+        # Identity map of live Package wrappers, indexed by apt_pkg.Package.id
+        self._pkgmap: list[weakref.ReferenceType[Package] | None] = []
+        self._weakpackages: weakref.WeakSet[Package] = weakref.WeakSet()  # noqa
         self._weakversions: weakref.WeakSet[Version] = weakref.WeakSet()  # noqa
+        self._file_index: FileIndex | None = None
+        self._search_index: SearchIndex | None = None
         self._changes_count = -1
         self._sorted_set: list[str] | None = None
+        # Results of closure() and reverse_closure() for the open cache
+        self._closures: dict[tuple[Any, ...], frozenset[int]] = {}
+        # Provides index of the open cache: for each looked up name, whether
+        # it has versions and the (package, version) pairs providing it, or
+        # None for unknown names. The providers whose candidate provides the
+        # name are kept separately, until the next change.
+        self._provides: dict[
+            str, tuple[bool, list[tuple[apt_pkg.Package, apt_pkg.Version]]] | None
+        ] = {}
+        self._candidate_providers: dict[str, list[Package]] = {}
 
         self.connect("cache_post_open", "_inc_changes_count")
         self.connect("cache_post_change", "_inc_changes_count")
+        config = self.config
         if memonly:
             # force apt to build its caches in memory
-            apt_pkg.config.set("Dir::Cache::pkgcache", "")
+            config.set("Dir::Cache::pkgcache", "")
         if rootdir:
             rootdir = os.path.abspath(rootdir)
             if os.path.exists(rootdir + "/etc/apt/apt.conf"):
-                apt_pkg.read_config_file(apt_pkg.config, rootdir + "/etc/apt/apt.conf")
+                apt_pkg.read_config_file(config, rootdir + "/etc/apt/apt.conf")
             if os.path.isdir(rootdir + "/etc/apt/apt.conf.d"):
-                apt_pkg.read_config_dir(apt_pkg.config, rootdir + "/etc/apt/apt.conf.d")
-            apt_pkg.config.set("Dir", rootdir)
-            apt_pkg.config.set("Dir::State::status", rootdir + "/var/lib/dpkg/status")
+                apt_pkg.read_config_dir(config, rootdir + "/etc/apt/apt.conf.d")
+            config.set("Dir", rootdir)
+            config.set("Dir::State::status", rootdir + "/var/lib/dpkg/status")
             # also set dpkg to the rootdir path so that its called for the
             # --print-foreign-architectures call
             if os.path.exists(os.path.join(rootdir, "usr", "bin", "dpkg")):
-                apt_pkg.config.set(
+                config.set(
                     "Dir::bin::dpkg", os.path.join(rootdir, "usr", "bin", "dpkg")
                 )
             # create required dirs/files when run with special rootdir
             # automatically
             self._check_and_create_required_dirs(rootdir)
             # Call InitSystem so the change to Dir::State::Status is actually
-            # recognized (LP: #320665)
-            apt_pkg.init_system()
+            # recognized (LP: #320665); a configuration of the cache is
+            # initialized whenever it is used.
+            if self._config is None:
+                apt_pkg.init_system()
+
+        if index_store is not None:
+            # The store entry is chosen on each open(), and only set in a
+            # private copy of the configuration
+            self._index_source = config
+            self._config = config = _copy_config(config)
 
         # Prepare a lock object (context manager for archive lock)
-        archive_dir = apt_pkg.config.find_dir("Dir::Cache::Archives")
+        archive_dir = config.find_dir("Dir::Cache::Archives")
         self._archive_lock = _WrappedLock(archive_dir)
 
         self.open(progress)
 
+    @property
+    def config(self) -> apt_pkg.Configuration:
+        """The configuration used by the cache.
+
+        With an index store, this is a private copy of the configuration
+        passed to the cache, which reads the package lists and the status
+        file from the store.
+
+        .. versionadded:: 3.0
+        """
+        if self._config is None:
+            return apt_pkg.config
+        return self._config
+
+    @property
+    def _root_config(self) -> apt_pkg.Configuration:
+        """The configuration naming the files of the root directory."""
+        if self._index_source is not None:
+            return self._index_source
+        return self.config
+
+    @property
+    def tracer(self) -> Tracer:
+        """The :class:`Tracer` of the cache.
+
+        Unless a tracer was passed to the constructor or set here, this is
+        the tracer set by :func:`set_tracer`.
+
+        .. versionadded:: 3.0
+        """
+        if self._tracer is None:
+            return _tracer
+        return self._tracer
+
+    @tracer.setter
+    def tracer(self, tracer: Tracer | None) -> None:
+        self._tracer = tracer
+
+    @contextlib.contextmanager
+    def _use_config(self, init_system: bool = False) -> Iterator[None]:
+        """Make the configuration of the cache the one used by apt_pkg.
+
+        With *init_system*, also initialize the package system for the
+        configuration if another one was initialized since, as needed to
+        build the cache or to fetch files. Keep the block short, as other
+        caches with their own configuration wait for it.
+        """
+        if self._config is None:
+            if init_system:
+                with _config_lock:
+                    apt_pkg.swap_config(apt_pkg.config, init_system=True)
+            yield
+            return
+        with _config_lock:
+            old = apt_pkg.swap_config(self._config, init_system)
+            try:
+                if init_system and not self._config.value_list("APT::Architectures"):
+                    # Keep the architectures, which otherwise have to be asked
+                    # from dpkg each time the system is initialized for them
+                    for arch in apt_pkg.get_architectures():
+                        self._config.set("APT::Architectures::", arch)
+                yield
+            finally:
+                apt_pkg.swap_config(old)
+
+    def _lock_system(self, stack: contextlib.ExitStack, timeout: float) -> None:
+        """Enter the package system lock for the configuration of the cache.
+
+        The lock is released when *stack* is closed. A cache with its own
+        configuration waits for the lock in slices of _LOCK_SLICE seconds,
+        so other caches are not blocked for the whole *timeout*.
+        """
+        if self._config is None:
+            with self._use_config(init_system=True):
+                stack.enter_context(apt_pkg.SystemLock(timeout))
+            return
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = max(deadline - time.monotonic(), 0.0)
+            wait = min(remaining, _LOCK_SLICE)
+            with self._use_config(init_system=True):
+                start = time.monotonic()
+                try:
+                    stack.enter_context(apt_pkg.SystemLock(wait))
+                    return
+                except apt_pkg.Error:
+                    # SystemLock gives up early if the lock is not contended
+                    if remaining <= wait or time.monotonic() - start < wait:
+                        raise
+
+    @_with_config
     def fix_broken(self) -> None:
         """Fix broken packages."""
         self._depcache.fix_broken()
@@ -203,29 +586,58 @@ class Cache:
             for callback, args, kwds in self._callbacks2[name]:
                 callback(self, *args, **kwds)
 
+    @_with_system
     def open(self, progress: OpProgress | None = None) -> None:
         """Open the package cache, after that it can be used like
         a dictionary
         """
         if progress is None:
             progress = apt.progress.base.OpProgress()
-        # close old cache on (re)open
-        self.close()
-        self.op_progress = progress
-        self._run_callbacks("cache_pre_open")
-
-        self._cache = apt_pkg.Cache(progress)
-        self._depcache = apt_pkg.DepCache(self._cache)
-        self._records = apt_pkg.PackageRecords(self._cache)
-        self._list = apt_pkg.SourceList()
-        self._list.read_main_list()
-        self._sorted_set = None
-        self.__remap()
-
-        self._have_multi_arch = len(apt_pkg.get_architectures()) > 1
-
-        progress.done()
-        self._run_callbacks("cache_post_open")
+        tracer = self.tracer
+        with tracer.span("apt.cache.open") as span:
+            # close old cache on (re)open
+            self.close()
+            self.op_progress = progress
+            self._run_callbacks("cache_pre_open")
+
+            if self._index_store is not None:
+                assert self._index_source is not None
+                entry = self._index_store.prepare(self._index_source, self.config)
+                if entry != self._index_entry:
+                    # The package system keeps the path of the status file
+                    apt_pkg.init_system()
+                    self._index_entry = entry
+
+            with tracer.span("apt.cache.open.build"):
+                self._cache = apt_pkg.Cache(progress)
+            with tracer.span("apt.cache.open.depcache"):
+                self._depcache = apt_pkg.DepCache(self._cache)
+            self._records = apt_pkg.PackageRecords(self._cache)
+            self._thread_records = threading.local()
+            self._thread_records.records = self._records
+            with tracer.span("apt.cache.open.sources") as sources_span:
+                self._list = apt_pkg.SourceList()
+                self._list.read_main_list()
+                if sources_span.is_recording():
+                    sources_span.set_attribute("sources", len(self._list.list))
+            self._sorted_set = None
+            self._closures = {}
+            self._provides = {}
+            self._candidate_providers = {}
+            self._search_index = None
+            # dpkg may have changed the installed files since the last open
+            if self._file_index is not None and self._file_index.loaded:
+                if self._file_index.refresh():
+                    self._file_index.save()
+            self.__remap()
+
+            self._have_multi_arch = len(apt_pkg.get_architectures()) > 1
+
+            progress.done()
+            self._run_callbacks("cache_post_open")
+            if span.is_recording():
+                span.set_attribute("packages", self._cache.package_count)
+                span.set_attribute("versions", self._cache.version_count)
 
     def __remap(self) -> None:
         """Called after cache reopen() to relocate to new cache.
@@ -233,37 +645,73 @@ class Cache:
         Relocate objects like packages and versions from the old
         underlying cache to the new one.
         """
-        for key in list(self._weakref.keys()):
-            try:
-                pkg = self._weakref[key]
-            except KeyError:
-                continue
-
+        # Package IDs are only valid within one cache, so the identity map
+        # is rebuilt from the live wrappers rather than from the old map.
+        pkgmap: list[weakref.ReferenceType[Package] | None]
+        pkgmap = [None] * self._cache.package_count
+        for pkg in list(self._weakpackages):
             try:
                 pkg._pkg = self._cache[pkg._pkg.name, pkg._pkg.architecture]
             except LookupError:
-                del self._weakref[key]
-
+                self._weakpackages.discard(pkg)
+                continue
+            pkgmap[pkg._pkg.id] = weakref.ref(pkg)
+        self._pkgmap = pkgmap
+
+        # Versions are matched through an index of (package id, ver_str, hash)
+        # covering the packages with live Version wrappers, so that every
+        # version list is only walked once per open.
+        verindex: dict[tuple[int, str, int], list[apt_pkg.Version]] = {}
+        indexed: set[int] = set()
         for ver in list(self._weakversions):
-            # Package has been reseated above, reseat version
-            for v in ver.package._pkg.version_list:
-                # Requirements as in debListParser::SameVersion
+            if ver.package not in self._weakpackages:
+                # The package could not be relocated, neither can the version
+                self._weakversions.discard(ver)
+                continue
+            pkg_id = ver.package._pkg.id
+            if pkg_id not in indexed:
+                indexed.add(pkg_id)
+                for v in ver.package._pkg.version_list:
+                    key = (pkg_id, v.ver_str, v.hash)
+                    verindex.setdefault(key, []).append(v)
+
+            cand = ver._cand
+            for v in verindex.get((pkg_id, cand.ver_str, cand.hash), ()):
+                # Remaining requirements as in debListParser::SameVersion
                 if (
-                    v.hash == ver._cand.hash
-                    and (v.size == 0 or ver._cand.size == 0 or v.size == ver._cand.size)
-                    and v.multi_arch == ver._cand.multi_arch
-                    and v.ver_str == ver._cand.ver_str
-                ):
+                    v.size == 0 or cand.size == 0 or v.size == cand.size
+                ) and v.multi_arch == cand.multi_arch:
                     ver._cand = v
+                    ver._record_cache = None
                     break
             else:
-                self._weakversions.remove(ver)
+                self._weakversions.discard(ver)
 
     def close(self) -> None:
         """Close the package cache"""
         # explicitely free the FDs that _records has open
         del self._records
         self._records = cast(apt_pkg.PackageRecords, None)
+        self._thread_records = threading.local()
+
+    def _get_records(self) -> apt_pkg.PackageRecords:
+        """Return the PackageRecords object of the calling thread.
+
+        A PackageRecords object is positioned at one record at a time,
+        so threads reading package records concurrently each use their
+        own object. They are created on demand and freed when their thread
+        exits, or by close().
+        """
+        thread_records = self._thread_records
+        records: apt_pkg.PackageRecords | None
+        records = getattr(thread_records, "records", None)
+        if records is not None:
+            return records
+        if self._records is None:
+            raise CacheClosedException("Cache object used after close() called")
+        records = apt_pkg.PackageRecords(self._cache)
+        thread_records.records = records
+        return records
 
     def __enter__(self) -> Cache:
         """Enter the with statement"""
@@ -304,9 +752,17 @@ class Cache:
 
         .. versionadded:: 1.0.0
         """
-        fullname = rawpkg.get_fullname(pretty=True)
-
-        return self._weakref.setdefault(fullname, Package(self, rawpkg))
+        pkg_id = rawpkg.id
+        ref = self._pkgmap[pkg_id]
+        if ref is not None:
+            pkg = ref()
+            if pkg is not None:
+                return pkg
+
+        pkg = Package(self, rawpkg)
+        self._pkgmap[pkg_id] = weakref.ref(pkg)
+        self._weakpackages.add(pkg)
+        return pkg
 
     def __iter__(self) -> Iterator[Package]:
         # We iterate sorted over package names here. With this we read the
@@ -315,8 +771,7 @@ class Cache:
         # is disastrous if we use compressed package indexes, and slower than
         # necessary for uncompressed indexes.
         for pkgname in self.keys():
-            pkg = Package(self, self._cache[pkgname])
-            yield self._weakref.setdefault(pkgname, pkg)
+            yield self._rawpkg_to_pkg(self._cache[pkgname])
 
     def __is_real_pkg(self, rawpkg: apt_pkg.Package) -> bool:
         """Check if the apt_pkg.Package provided is a real package."""
@@ -343,6 +798,102 @@ class Cache:
             )
         return list(self._sorted_set)  # We need a copy here, caller may modify
 
+    def records_for(
+        self, versions: Iterable[Version], fields: Sequence[str] = ("record",)
+    ) -> list[dict[str, Any]]:
+        """Read the package records of many versions at once.
+
+        Return a list with a dictionary for each version in *versions*,
+        mapping the names in *fields* to the values of the attributes of
+        the same name of the version. Supported fields are 'filename',
+        'homepage', 'md5', 'raw_description', 'record', 'sha1', 'sha256',
+        'source_name' and 'source_version'.
+
+        The records are looked up once per version, ordered by their
+        position in the index files, so that each index file is read
+        sequentially instead of seeking back and forth. The values are
+        also cached in the versions, so accessing the corresponding
+        attributes of the versions later does not cause another lookup.
+
+        .. versionadded:: 3.0
+        """
+        for field in fields:
+            if field not in apt.package._RECORD_FIELDS:
+                raise ValueError("Unknown record field: %r" % field)
+
+        versions = list(versions)
+        verfiles = [(ver._cand.file_list[0], ver) for ver in versions]
+        verfiles.sort(key=lambda item: (item[0][0].id, item[0][1]))
+        for verfile, ver in verfiles:
+            ver._fill_record_cache(fields, verfile)
+
+        return [{field: getattr(ver, field) for field in fields} for ver in versions]
+
+    def get_changelogs(
+        self,
+        pkgs: Iterable[Package],
+        concurrency: int = 8,
+        uri: str | None = None,
+        cachedir: str | None = None,
+        max_age: float = 0.0,
+        cancel_lock: threading.Event | None = None,
+    ) -> list[str]:
+        """Download the changelogs of many packages in parallel.
+
+        Return a list with the changelog of each package in *pkgs*, as
+        :meth:`Package.get_changelog` would return it for the parameters
+        *uri* and *cancel_lock*. The changelogs are downloaded by up to
+        *concurrency* threads, over keep-alive connections shared by all
+        threads. Packages built from the same source package are only
+        downloaded once.
+
+        Downloaded changelogs are stored in the directory *cachedir*, keyed
+        by source package name and version, and revalidated with a
+        conditional request unless they are younger than *max_age* seconds.
+        The directory defaults to the one set in ``Dir::Cache::changelogs``,
+        or ``changelogs`` in ``Dir::Cache``; see
+        :class:`apt.changelog.ChangelogFetcher` for details.
+
+        .. versionadded:: 3.0
+        """
+        if cachedir is None:
+            cachedir = self.config.find_file("Dir::Cache::changelogs") or (
+                os.path.join(self.config.find_dir("Dir::Cache"), "changelogs")
+            )
+
+        pkgs = list(pkgs)
+        results = [""] * len(pkgs)
+        jobs: dict[tuple[str, str, str], list[int]] = {}
+        for i, pkg in enumerate(pkgs):
+            location = None
+            if pkg._changelog == "":
+                location = pkg._changelog_location(uri)
+            if location is None:
+                # Already downloaded, or no changelog available
+                results[i] = pkg.get_changelog(uri, cancel_lock)
+            else:
+                jobs.setdefault(location, []).append(i)
+
+        def fetch(
+            location: tuple[str, str, str]
+        ) -> tuple[str | None, Exception | None]:
+            try:
+                return fetcher.fetch(*location, cancel_lock=cancel_lock), None
+            except (OSError, http.client.HTTPException) as error:
+                return None, error
+
+        with ChangelogFetcher(cachedir, max_age=max_age) as fetcher:
+            with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+                futures = {executor.submit(fetch, loc): loc for loc in jobs}
+                for future in concurrent.futures.as_completed(futures):
+                    _uri, src_pkg, src_ver = location = futures[future]
+                    text, error = future.result()
+                    for i in jobs[location]:
+                        results[i] = pkgs[i]._changelog_result(
+                            src_pkg, src_ver, text, error
+                        )
+        return results
+
     def get_changes(self) -> list[Package]:
         """Get the marked changes"""
         changes = []
@@ -352,6 +903,7 @@ class Cache:
                 changes.append(self._rawpkg_to_pkg(rawpkg))
         return changes
 
+    @_with_config
     def upgrade(self, dist_upgrade: bool = False) -> None:
         """Upgrade all packages.
 
@@ -359,18 +911,30 @@ class Cache:
         installed as well (and conflicting packages may be removed). The
         default value is False.
         """
-        self.cache_pre_change()
-        self._depcache.upgrade(dist_upgrade)
-        self.cache_post_change()
+        with self.tracer.span(
+            "apt.cache.upgrade", {"dist_upgrade": dist_upgrade}
+        ) as span:
+            self.cache_pre_change()
+            self._depcache.upgrade(dist_upgrade)
+            self.cache_post_change()
+            if span.is_recording():
+                self._set_change_attributes(span)
+
+    def _set_change_attributes(self, span: Span) -> None:
+        """Set the numbers of the marked changes as attributes of *span*."""
+        span.set_attribute("install_count", self._depcache.inst_count)
+        span.set_attribute("delete_count", self._depcache.del_count)
+        span.set_attribute("keep_count", self._depcache.keep_count)
+        span.set_attribute("broken_count", self._depcache.broken_count)
 
     @property
+    @_with_system
     def required_download(self) -> int:
         """Get the size of the packages that are required to download."""
-        if self._records is None:
-            raise CacheClosedException("Cache object used after close() called")
+        records = self._get_records()
         pm = apt_pkg.PackageManager(self._depcache)
         fetcher = apt_pkg.Acquire()
-        pm.get_archives(fetcher, self._list, self._records)
+        pm.get_archives(fetcher, self._list, records)
         return fetcher.fetch_needed
 
     @property
@@ -396,7 +960,7 @@ class Cache:
         self, fetcher: apt_pkg.Acquire, allow_unauthenticated: bool | None
     ) -> int:
         if allow_unauthenticated is None:
-            allow_unauthenticated = apt_pkg.config.find_b(
+            allow_unauthenticated = self.config.find_b(
                 "APT::Get::" "AllowUnauthenticated", False
             )
 
@@ -434,22 +998,35 @@ class Cache:
         allow_unauthenticated: bool | None = None,
     ) -> int:
         """fetch the needed archives"""
-        if self._records is None:
-            raise CacheClosedException("Cache object used after close() called")
+        with self.tracer.span("apt.cache.fetch_archives") as span:
+            records = self._get_records()
 
-        # this may as well throw a SystemError exception
-        if not pm.get_archives(fetcher, self._list, self._records):
-            return False
+            # this may as well throw a SystemError exception
+            with self._use_config(init_system=True):
+                if not pm.get_archives(fetcher, self._list, records):
+                    return False
 
-        # now run the fetcher, throw exception if something fails to be
-        # fetched
-        return self._run_fetcher(fetcher, allow_unauthenticated)
+            if span.is_recording():
+                span.set_attribute("items", len(fetcher.items))
+                span.set_attribute("bytes_needed", fetcher.fetch_needed)
+            try:
+                # now run the fetcher, throw exception if something fails to
+                # be fetched
+                return self._run_fetcher(fetcher, allow_unauthenticated)
+            finally:
+                if span.is_recording():
+                    done = [i for i in fetcher.items if i.status == i.STAT_DONE]
+                    span.set_attribute("items_failed", len(fetcher.items) - len(done))
+                    span.set_attribute(
+                        "bytes_fetched", sum(i.filesize for i in done if not i.local)
+                    )
 
     def fetch_archives(
         self,
         progress: AcquireProgress | None = None,
         fetcher: apt_pkg.Acquire | None = None,
         allow_unauthenticated: bool | None = None,
+        lock_timeout: float | None = None,
     ) -> int:
         """Fetch the archives for all packages marked for install/upgrade.
 
@@ -465,28 +1042,57 @@ class Cache:
         to allow unauthenticated downloads. If not specified, it defaults to
         the configuration option `APT::Get::AllowUnauthenticated`.
 
+        The keyword-only parameter *lock_timeout* is the number of seconds
+        to wait for the archives directory if it is locked by another
+        process. If not specified, it defaults to the configuration option
+        `DPkg::Lock::Timeout`, or 0.
+
         .. versionadded:: 0.8.0
+
+        .. versionchanged:: 3.0
+            Added the *lock_timeout* parameter.
         """
         if progress is not None and fetcher is not None:
             raise ValueError("Takes a progress or a an Acquire object")
         if progress is None:
             progress = apt.progress.text.AcquireProgress()
-        if fetcher is None:
-            fetcher = apt_pkg.Acquire(progress)
+        with self._use_config(init_system=True):
+            if fetcher is None:
+                fetcher = apt_pkg.Acquire(progress)
+            pm = apt_pkg.PackageManager(self._depcache)
+        if lock_timeout is None:
+            lock_timeout = self.config.find_i("DPkg::Lock::Timeout")
+        self._archive_lock.timeout = lock_timeout
 
+        # The configuration is only swapped in to set the download up, not
+        # while it runs
         with self._archive_lock:
-            return self._fetch_archives(
-                fetcher, apt_pkg.PackageManager(self._depcache), allow_unauthenticated
-            )
+            return self._fetch_archives(fetcher, pm, allow_unauthenticated)
 
-    def is_virtual_package(self, pkgname: str) -> bool:
-        """Return whether the package is a virtual package."""
+    def _provides_entry(
+        self, pkgname: str
+    ) -> tuple[bool, list[tuple[apt_pkg.Package, apt_pkg.Version]]] | None:
+        """Return the entry of *pkgname* in the provides index."""
         try:
-            pkg = self._cache[pkgname]
+            return self._provides[pkgname]
         except KeyError:
-            return False
+            pass
+        try:
+            vp = self._cache[pkgname]
+        except KeyError:
+            entry = None
         else:
-            return bool(pkg.has_provides and not pkg.has_versions)
+            entry = (
+                bool(vp.has_versions),
+                [(version.parent_pkg, version) for _, _, version in vp.provides_list],
+            )
+        self._provides[pkgname] = entry
+        return entry
+
+    def is_virtual_package(self, pkgname: str) -> bool:
+        """Return whether the package is a virtual package."""
+        entry = self._provides_entry(pkgname)
+        return entry is not None and not entry[0] and bool(entry[1])
 
     def get_providing_packages(
         self,
@@ -507,29 +1113,174 @@ class Cache:
         If 'include_nonvirtual' is True then it will search for all
         packages providing pkgname, even if pkgname is not itself
         a virtual pkg.
+
+        .. versionchanged:: 3.0
+
+            The providers are looked up once per name and kept until the
+            cache is opened again; the providers whose candidate provides
+            the package are kept until the next change of the cache.
         """
+        entry = self._provides_entry(pkgname)
+        if entry is None or (entry[0] and not include_nonvirtual):
+            return []
+        if not candidate_only:
+            return list({self._rawpkg_to_pkg(rawpkg) for rawpkg, _ in entry[1]})
 
-        providers: set[Package] = set()
-        get_candidate_ver = self._depcache.get_candidate_ver
         try:
-            vp = self._cache[pkgname]
-            if vp.has_versions and not include_nonvirtual:
-                return list(providers)
+            providers = self._candidate_providers[pkgname]
+        except KeyError:
+            get_candidate_ver = self._depcache.get_candidate_ver
+            providers = list(
+                {
+                    self._rawpkg_to_pkg(rawpkg)
+                    for rawpkg, version in entry[1]
+                    if version == get_candidate_ver(rawpkg)
+                }
+            )
+            self._candidate_providers[pkgname] = providers
+        return list(providers)  # We need a copy here, caller may modify
+
+    def _closure(
+        self,
+        pkgs: Iterable[Package],
+        types: Sequence[str],
+        or_policy: str,
+        which: str,
+        reverse: bool,
+    ) -> frozenset[int]:
+        ids = frozenset(pkg.id for pkg in pkgs)
+        key = (ids, tuple(types), or_policy, which, reverse)
+        try:
+            return self._closures[key]
         except KeyError:
-            return list(providers)
+            pass
+        result = frozenset(
+            self._cache.closure(list(ids), list(types), which, or_policy, reverse)
+        )
+        self._closures[key] = result
+        return result
+
+    def closure(
+        self,
+        pkgs: Iterable[Package],
+        types: Sequence[str] = ("Depends", "PreDepends"),
+        or_policy: str = "all",
+        which: str = "candidate",
+    ) -> frozenset[int]:
+        """Return the IDs of the packages *pkgs* pull in.
+
+        The result contains the :attr:`Package.id` of the packages in
+        *pkgs* and of all packages they depend on, directly or indirectly,
+        through dependencies whose type is in *types*, like 'Depends' or
+        'Recommends'. The dependencies of the candidate versions are
+        followed, or of the installed versions if *which* is 'installed',
+        or of all versions if it is 'all'. A dependency on a virtual
+        package reaches the virtual package and its providers.
+
+        If *or_policy* is 'all', all alternatives of a dependency are
+        followed; if it is 'first', only the first one, which APT would
+        normally choose, is.
+
+        The closure is computed by :meth:`apt_pkg.Cache.closure` and kept
+        until the cache is opened again, or, for the candidate versions,
+        until the cache changes.
+
+        .. versionadded:: 3.0
+        """
+        return self._closure(pkgs, types, or_policy, which, False)
+
+    def reverse_closure(
+        self,
+        pkgs: Iterable[Package],
+        types: Sequence[str] = ("Depends", "PreDepends"),
+        or_policy: str = "all",
+        which: str = "installed",
+    ) -> frozenset[int]:
+        """Return the IDs of the packages depending on *pkgs*.
+
+        This is the reverse of :meth:`closure`: the result contains the
+        :attr:`Package.id` of the packages in *pkgs* and of all packages
+        depending on them, directly or indirectly, that is the packages
+        whose dependencies would break if *pkgs* were removed. By default
+        the dependencies of the installed versions are considered. With
+        the *or_policy* 'all', a package is included if any alternative
+        of its dependency is, even if another one would remain installed.
+
+        .. versionadded:: 3.0
+        """
+        return self._closure(pkgs, types, or_policy, which, True)
+
+    def _policy(self, preferences: str | apt_pkg.Policy | None) -> apt_pkg.Policy:
+        """Return the policy of the given preferences of candidate_diff()."""
+        if preferences is None:
+            return self._depcache.policy
+        if isinstance(preferences, apt_pkg.Policy):
+            return preferences
+        policy = apt_pkg.Policy(self._cache)
+        if os.path.isdir(preferences):
+            success = policy.read_pindir(preferences)
+        else:
+            success = policy.read_pinfile(preferences)
+        if not success:
+            raise SystemError("Could not read the preferences %r" % preferences)
+        policy.init_defaults()
+        return policy
+
+    @_with_config
+    def candidate_diff(
+        self,
+        old: str | apt_pkg.Policy | None = None,
+        new: str | apt_pkg.Policy | None = None,
+    ) -> dict[str, tuple[Version | None, Version | None]]:
+        """Return the packages whose candidate differs between two policies.
+
+        The parameters *old* and *new* are each the path of a preferences
+        file, or of a directory of them like ``/etc/apt/preferences.d``, an
+        :class:`apt_pkg.Policy` object, or ``None`` for the preferences of
+        the cache. The result maps the name of each package whose candidate
+        would change from *old* to *new* to a tuple of its old and new
+        candidate; a package without candidate has ``None`` instead.
+
+        The candidates are computed by :meth:`apt_pkg.Policy.candidates_array`
+        without opening the cache again, and without changing the candidates
+        of the cache.
+
+        .. versionadded:: 3.0
+        """
+        old_candidates = self._policy(old).candidates_array()
+        new_candidates = self._policy(new).candidates_array()
+        changed = {
+            pkg_id
+            for pkg_id, (before, after) in enumerate(
+                zip(old_candidates, new_candidates)
+            )
+            if before != after
+        }
 
-        for provides, providesver, version in vp.provides_list:
-            rawpkg = version.parent_pkg
-            if not candidate_only or (version == get_candidate_ver(rawpkg)):
-                providers.add(self._rawpkg_to_pkg(rawpkg))
-        return list(providers)
+        diff: dict[str, tuple[Version | None, Version | None]] = {}
+        if not changed:
+            return diff
+        for rawpkg in self._cache.packages:
+            if rawpkg.id not in changed:
+                continue
+            pkg = self._rawpkg_to_pkg(rawpkg)
+            versions = {ver.id: ver for ver in rawpkg.version_list}
+            before = versions.get(old_candidates[rawpkg.id])
+            after = versions.get(new_candidates[rawpkg.id])
+            diff[pkg.name] = (
+                Version(pkg, before) if before is not None else None,
+                Version(pkg, after) if after is not None else None,
+            )
+        return diff
 
+    @_with_system
     def update(
         self,
         fetch_progress: AcquireProgress | None = None,
         pulse_interval: int = 0,
         raise_on_error: bool = True,
         sources_list: str | None = None,
+        lock_timeout: float | None = None,
     ) -> int:
         """Run the equivalent of apt-get update.
 
@@ -542,38 +1293,64 @@ class Cache:
         .
         sources_list -- Update a alternative sources.list than the default.
         Note that the sources.list.d directory is ignored in this case
+
+        If the lists directory is locked by another process, wait up to
+        *lock_timeout* seconds for the lock before raising
+        :class:`LockFailedException`. The default is the value of the
+        option ``DPkg::Lock::Timeout``, or 0.
+
+        A cache with its own configuration keeps it in use for the whole
+        update, as the package lists are placed according to it while they
+        are downloaded. Other caches with their own configuration wait for
+        the update meanwhile.
+
+        .. versionchanged:: 3.0
+            Added the *lock_timeout* parameter.
         """
-        with _WrappedLock(apt_pkg.config.find_dir("Dir::State::Lists")):
-            if sources_list:
-                old_sources_list = apt_pkg.config.find("Dir::Etc::sourcelist")
-                old_sources_list_d = apt_pkg.config.find("Dir::Etc::sourceparts")
-                old_cleanup = apt_pkg.config.find("APT::List-Cleanup")
-                apt_pkg.config.set(
-                    "Dir::Etc::sourcelist", os.path.abspath(sources_list)
-                )
-                apt_pkg.config.set("Dir::Etc::sourceparts", "xxx")
-                apt_pkg.config.set("APT::List-Cleanup", "0")
-                slist = apt_pkg.SourceList()
-                slist.read_main_list()
-            else:
-                slist = self._list
+        if self._index_store is not None:
+            raise ValueError("Cannot update a cache opened from an index store")
+        if lock_timeout is None:
+            lock_timeout = self.config.find_i("DPkg::Lock::Timeout")
+        lists_dir = self.config.find_dir("Dir::State::Lists")
+        with self.tracer.span("apt.cache.update") as span:
+            with _WrappedLock(lists_dir, lock_timeout):
+                if sources_list:
+                    old_sources_list = self.config.find("Dir::Etc::sourcelist")
+                    old_sources_list_d = self.config.find("Dir::Etc::sourceparts")
+                    old_cleanup = self.config.find("APT::List-Cleanup")
+                    self.config.set(
+                        "Dir::Etc::sourcelist", os.path.abspath(sources_list)
+                    )
+                    self.config.set("Dir::Etc::sourceparts", "xxx")
+                    self.config.set("APT::List-Cleanup", "0")
+                    slist = apt_pkg.SourceList()
+                    slist.read_main_list()
+                else:
+                    slist = self._list
 
-            try:
-                if fetch_progress is None:
-                    fetch_progress = apt.progress.base.AcquireProgress()
                 try:
-                    res = self._cache.update(fetch_progress, slist, pulse_interval)
-                except SystemError as e:
-                    raise FetchFailedException(e)
-                if not res and raise_on_error:
-                    raise FetchFailedException()
-                else:
-                    return res
-            finally:
-                if sources_list:
-                    apt_pkg.config.set("Dir::Etc::sourcelist", old_sources_list)
-                    apt_pkg.config.set("Dir::Etc::sourceparts", old_sources_list_d)
-                    apt_pkg.config.set("APT::List-Cleanup", old_cleanup)
+                    if fetch_progress is None:
+                        fetch_progress = apt.progress.base.AcquireProgress()
+                    try:
+                        res = self._cache.update(fetch_progress, slist, pulse_interval)
+                    except SystemError as e:
+                        raise FetchFailedException(e)
+                    finally:
+                        if span.is_recording():
+                            span.set_attribute(
+                                "bytes_fetched",
+                                getattr(fetch_progress, "fetched_bytes", 0),
+                            )
+                    span.set_attribute("success", bool(res))
+                    if not res and raise_on_error:
+                        raise FetchFailedException()
+                    else:
+                        return res
+                finally:
+                    if sources_list:
+                        self.config.set("Dir::Etc::sourcelist", old_sources_list)
+                        self.config.set("Dir::Etc::sourceparts", old_sources_list_d)
+                        self.config.set("APT::List-Cleanup", old_cleanup)
 
     def install_archives(
         self, pm: apt_pkg.PackageManager, install_progress: InstallProgress
@@ -588,33 +1365,41 @@ class Cache:
         This releases a system lock in newer versions, if there is any,
         and reestablishes it afterwards.
         """
-        # compat with older API
-        try:
-            install_progress.startUpdate()  # type: ignore
-        except AttributeError:
-            install_progress.start_update()
-
-        did_unlock = apt_pkg.pkgsystem_is_locked()
-        if did_unlock:
-            apt_pkg.pkgsystem_unlock_inner()
-
-        try:
-            res = install_progress.run(pm)
-        finally:
-            if did_unlock:
-                apt_pkg.pkgsystem_lock_inner()
+        with self.tracer.span("apt.cache.install_archives") as span:
+            # compat with older API
+            try:
+                install_progress.startUpdate()  # type: ignore
+            except AttributeError:
+                install_progress.start_update()
+
+            with self._use_config():
+                did_unlock = apt_pkg.pkgsystem_is_locked()
+                if did_unlock:
+                    apt_pkg.pkgsystem_unlock_inner()
+
+            installer: Any = pm
+            if self._config is not None:
+                installer = _ConfiguredPackageManager(pm, self._config)
+            try:
+                res = install_progress.run(installer)
+            finally:
+                if did_unlock:
+                    with self._use_config():
+                        apt_pkg.pkgsystem_lock_inner()
 
-        try:
-            install_progress.finishUpdate()  # type: ignore
-        except AttributeError:
-            install_progress.finish_update()
-        return res
+            try:
+                install_progress.finishUpdate()  # type: ignore
+            except AttributeError:
+                install_progress.finish_update()
+            span.set_attribute("result", res)
+            return res
 
     def commit(
         self,
         fetch_progress: AcquireProgress | None = None,
         install_progress: InstallProgress | None = None,
         allow_unauthenticated: bool | None = None,
+        lock_timeout: float | None = None,
     ) -> bool:
         """Apply the marked changes to the cache.
 
@@ -628,6 +1413,15 @@ class Cache:
         The keyword-only parameter *allow_unauthenticated* specifies whether
         to allow unauthenticated downloads. If not specified, it defaults to
         the configuration option `APT::Get::AllowUnauthenticated`.
+
+        The keyword-only parameter *lock_timeout* is the number of seconds
+        to wait for the package system and the archives directory if they
+        are locked by another process, like unattended-upgrades. If not
+        specified, it defaults to the configuration option
+        `DPkg::Lock::Timeout`, or 0.
+
+        .. versionchanged:: 3.0
+            Added the *lock_timeout* parameter.
         """
         # FIXME:
         # use the new acquire/pkgmanager interface here,
@@ -636,6 +1430,8 @@ class Cache:
         # Current a failed download will just display "error"
         # which is less than optimal!
 
+        if self._index_store is not None:
+            raise ValueError("Cannot commit a cache opened from an index store")
         if fetch_progress is None:
             fetch_progress = apt.progress.base.AcquireProgress()
         if install_progress is None:
@@ -643,9 +1439,20 @@ class Cache:
 
         assert install_progress is not None
 
-        with apt_pkg.SystemLock():
-            pm = apt_pkg.PackageManager(self._depcache)
-            fetcher = apt_pkg.Acquire(fetch_progress)
+        if lock_timeout is None:
+            lock_timeout = self.config.find_i("DPkg::Lock::Timeout")
+        self._archive_lock.timeout = lock_timeout
+
+        with contextlib.ExitStack() as stack:
+            span = stack.enter_context(self.tracer.span("apt.cache.commit"))
+            if span.is_recording():
+                self._set_change_attributes(span)
+            # The configuration is only swapped in to set the commit up; the
+            # downloads and dpkg run without it, see install_archives()
+            self._lock_system(stack, lock_timeout)
+            with self._use_config(init_system=True):
+                pm = apt_pkg.PackageManager(self._depcache)
+                fetcher = apt_pkg.Acquire(fetch_progress)
             with self._archive_lock:
                 while True:
                     # fetch archives first
@@ -668,14 +1475,70 @@ class Cache:
                     fetcher.shutdown()
         return res == pm.RESULT_COMPLETED
 
+    def update_async(
+        self,
+        sources_list: str | None = None,
+        pulse_interval: int = 0,
+        raise_on_error: bool = True,
+    ) -> apt.aio.Operation:
+        """Start :meth:`update` in a worker thread of the running event loop.
+
+        Return an :class:`apt.aio.Operation`, which can be awaited for the
+        result and iterated over for the progress of the update.
+
+        .. versionadded:: 3.0
+        """
+        return apt.aio.update(self, sources_list, pulse_interval, raise_on_error)
+
+    def fetch_archives_async(
+        self, allow_unauthenticated: bool | None = None
+    ) -> apt.aio.Operation:
+        """Start :meth:`fetch_archives` in a worker thread.
+
+        See :meth:`update_async` for the return value.
+
+        .. versionadded:: 3.0
+        """
+        return apt.aio.fetch_archives(self, allow_unauthenticated)
+
+    def commit_async(
+        self,
+        install_progress: InstallProgress | None = None,
+        allow_unauthenticated: bool | None = None,
+    ) -> apt.aio.Operation:
+        """Start :meth:`commit` in a worker thread.
+
+        See :meth:`update_async` for the return value. Unless
+        *install_progress* is given, the progress of the installation is
+        reported by the operation as well.
+
+        .. versionadded:: 3.0
+        """
+        return apt.aio.commit(self, install_progress, allow_unauthenticated)
+
     def clear(self) -> None:
         """Unmark all changes"""
         self._depcache.init()
+        # This also resets the candidates
+        self._candidate_providers.clear()
+        self._clear_candidate_closures()
 
     # cache changes
 
+    def _clear_candidate_closures(self) -> None:
+        """Drop the closures following candidates, which may have changed."""
+        self._closures = {
+            key: value
+            for key, value in self._closures.items()
+            if key[3] != "candidate"
+        }
+        self._cache.clear_closures("candidate")
+
     def cache_post_change(self) -> None:
         "called internally if the cache has changed, emit a signal then"
+        # A change may have changed the candidates
+        self._candidate_providers.clear()
+        self._clear_candidate_closures()
         self._run_callbacks("cache_post_change")
 
     def cache_pre_change(self) -> None:
@@ -753,13 +1616,94 @@ class Cache:
         'dpkg --configure -a' as root.
         """
         dpkg_status_dir = os.path.dirname(
-            apt_pkg.config.find_file("Dir::State::status")
+            self._root_config.find_file("Dir::State::status")
         )
-        for f in os.listdir(os.path.join(dpkg_status_dir, "updates")):
+        try:
+            updates = os.listdir(os.path.join(dpkg_status_dir, "updates"))
+        except FileNotFoundError:
+            return False
+        for f in updates:
             if fnmatch.fnmatch(f, "[0-9]*"):
                 return True
         return False
 
+    @property
+    def file_index(self) -> FileIndex:
+        """Return the :class:`apt.fileindex.FileIndex` of installed files.
+
+        The index maps installed paths to the packages owning them and is
+        loaded on first use. Once it is loaded, it is also used to answer
+        :attr:`apt.package.Package.installed_files`. The index is stored in
+        ``Dir::Cache::fileindex`` of the configuration of the cache.
+
+        .. versionadded:: 3.0
+        """
+        if self._file_index is None:
+            # The info directory is next to the real status file, also when
+            # the cache reads a copy of it from an index store
+            status = self._root_config.find_file("Dir::State::status")
+            config = self.config
+            path = config.find_file("Dir::Cache::fileindex") or (
+                os.path.join(config.find_dir("Dir::Cache"), "fileindex.bin")
+            )
+            self._file_index = FileIndex(
+                os.path.join(os.path.dirname(status), "info"), path
+            )
+        return self._file_index
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """Return the :class:`apt.search.SearchIndex` of the package lists.
+
+        The index covers the package lists and the status file of the open
+        cache, and the translation files in ``Dir::State::Lists`` of the
+        languages in ``Acquire::Languages``, or English. A description
+        translated into several of them is indexed in the first of these
+        languages, in the configured order, with English last. It is
+        stored in ``Dir::Cache::searchindex`` of the configuration of the
+        cache.
+
+        .. versionadded:: 3.0
+        """
+        if self._search_index is None:
+            config = self.config
+            files = [pkgfile.filename for pkgfile in self._cache.file_list]
+            lists_dir = config.find_dir("Dir::State::Lists")
+            if os.path.isdir(lists_dir):
+                with self._use_config():
+                    languages = apt_pkg.get_languages()
+                files += _translation_files(lists_dir, languages)
+            path = config.find_file("Dir::Cache::searchindex") or (
+                os.path.join(config.find_dir("Dir::Cache"), "searchindex.bin")
+            )
+            self._search_index = SearchIndex(
+                (f for f in files if os.path.isfile(f)),
+                path,
+                config.find("APT::Architecture"),
+            )
+        return self._search_index
+
+    def search(
+        self, query: str, fields: Sequence[str] = ("name", "summary", "description")
+    ) -> list[Package]:
+        """Return the packages whose *fields* contain all words of *query*.
+
+        The fields are ``"name"``, ``"summary"`` and ``"description"``, the
+        long description. The packages are ranked by relevance, as by
+        :meth:`apt.search.SearchIndex.search`. Unlike looking at
+        :attr:`apt.package.Version.description` of every package, this
+        does not read the package records but the :attr:`search_index`,
+        which is only rebuilt when the lists changed.
+
+        .. versionadded:: 3.0
+        """
+        packages = []
+        for name, _score in self.search_index.search(query, fields):
+            pkg = self.get(name)
+            if pkg is not None:
+                packages.append(pkg)
+        return packages
+
     @property
     def broken_count(self) -> int:
         """Return the number of packages with broken dependencies."""
@@ -805,15 +1749,21 @@ class ProblemResolver:
 
     def resolve(self) -> None:
         """Resolve dependencies, try to remove packages where needed."""
-        self._cache.cache_pre_change()
-        self._resolver.resolve()
-        self._cache.cache_post_change()
+        with self._cache.tracer.span("apt.cache.resolve", {"by_keep": False}) as span:
+            self._cache.cache_pre_change()
+            self._resolver.resolve()
+            self._cache.cache_post_change()
+            if span.is_recording():
+                self._cache._set_change_attributes(span)
 
     def resolve_by_keep(self) -> None:
         """Resolve dependencies, do not try to remove packages."""
-        self._cache.cache_pre_change()
-        self._resolver.resolve_by_keep()
-        self._cache.cache_post_change()
+        with self._cache.tracer.span("apt.cache.resolve", {"by_keep": True}) as span:
+            self._cache.cache_pre_change()
+            self._resolver.resolve_by_keep()
+            self._cache.cache_post_change()
+            if span.is_recording():
+                self._cache._set_change_attributes(span)
 
     def keep_phased_updates(self) -> None:
         """Keep back phased updates."""
@@ -0,0 +1,173 @@
+# cachediff.py - compare the packages of two package caches
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+"""Compare the packages of two states of the package cache.
+
+:func:`cache_diff` reports the packages added and removed between two
+caches, and those whose candidate, pin priority or installed version
+changed, for example before and after an update::
+
+    before = cache._cache.fingerprint()
+    cache.update()
+    cache.open()
+    diff = apt.cache_diff(before, cache)
+    for name, old, new in diff.candidates:
+        print(name, old, "->", new)
+
+The caches are compared through their fingerprints, as returned by
+:meth:`apt_pkg.Cache.fingerprint` and :func:`apt_pkg.cache_fingerprint`,
+which describe all packages in one native call.
+"""
+from __future__ import annotations
+
+import os
+from typing import Union
+
+import apt_pkg
+
+import apt.cache
+
+__all__ = ["CacheDiff", "cache_diff"]
+
+_MAGIC = "apt-fingerprint 1"
+
+#: The states :func:`cache_diff` can compare: a fingerprint, a cache, or the
+#: path of a package cache file.
+CacheState = Union[bytes, apt.cache.Cache, apt_pkg.Cache, str, os.PathLike[str]]
+
+
+class CacheDiff:
+    """The differences between two states of the package cache.
+
+    Packages are named ``name:architecture``. The attributes are lists,
+    sorted by name:
+
+    :attr:`added`
+        the names of the packages only in the new cache;
+
+    :attr:`removed`
+        the names of the packages only in the old cache;
+
+    :attr:`candidates`
+        (name, old, new) tuples of the packages whose candidate version
+        changed, or whose candidate changed without changing its version
+        string; a package without candidate has ``None``;
+
+    :attr:`priorities`
+        (name, old, new) tuples of the packages whose candidate has another
+        pin priority;
+
+    :attr:`installed`
+        (name, old, new) tuples of the packages whose installed version
+        changed; a package not installed has ``None``.
+
+    A diff is true if anything changed.
+
+    .. versionadded:: 3.0
+    """
+
+    __slots__ = ("added", "removed", "candidates", "priorities", "installed")
+
+    def __init__(self) -> None:
+        self.added: list[str] = []
+        self.removed: list[str] = []
+        self.candidates: list[tuple[str, str | None, str | None]] = []
+        self.priorities: list[tuple[str, int | None, int | None]] = []
+        self.installed: list[tuple[str, str | None, str | None]] = []
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.added
+            or self.removed
+            or self.candidates
+            or self.priorities
+            or self.installed
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"<CacheDiff added={len(self.added)} removed={len(self.removed)}"
+            f" candidates={len(self.candidates)}"
+            f" priorities={len(self.priorities)}"
+            f" installed={len(self.installed)}>"
+        )
+
+
+def _fingerprint(state: CacheState) -> bytes:
+    if isinstance(state, bytes):
+        return state
+    if isinstance(state, apt.cache.Cache):
+        return state._cache.fingerprint()
+    if isinstance(state, apt_pkg.Cache):
+        return state.fingerprint()
+    return apt_pkg.cache_fingerprint(os.fspath(state))
+
+
+def _parse(fingerprint: bytes) -> dict[str, str]:
+    """Map the package names of *fingerprint* to the rest of their lines."""
+    lines = fingerprint.decode("utf-8", "surrogateescape").split("\n")
+    if lines[0] != _MAGIC:
+        raise ValueError("Not a cache fingerprint")
+    return {
+        name: rest
+        for name, _, rest in (line.partition("\t") for line in lines[1:] if line)
+    }
+
+
+def cache_diff(old: CacheState, new: CacheState) -> CacheDiff:
+    """Return the :class:`CacheDiff` from the cache *old* to *new*.
+
+    Each of *old* and *new* is a fingerprint returned by
+    :meth:`apt_pkg.Cache.fingerprint`, an :class:`apt.Cache` or
+    :class:`apt_pkg.Cache`, or the path of a package cache file, like a
+    copy of ``pkgcache.bin`` saved before an update. The candidates of a
+    package cache file are those chosen by the preferences configured now,
+    see :func:`apt_pkg.cache_fingerprint`.
+
+    The comparison takes time linear in the number of packages.
+
+    .. versionadded:: 3.0
+    """
+    # The fingerprints are built natively; comparing them is one dictionary
+    # lookup and one string comparison per package, and only the changed
+    # packages are split into their fields.
+    before = _parse(_fingerprint(old))
+    after = _parse(_fingerprint(new))
+
+    diff = CacheDiff()
+    diff.removed = [name for name in before if name not in after]
+    for name, line in after.items():
+        old_line = before.get(name)
+        if old_line is None:
+            diff.added.append(name)
+            continue
+        if old_line == line:
+            continue
+        old_cand, old_hash, old_prio, old_inst = old_line.split("\t")
+        cand, hash_, prio, inst = line.split("\t")
+        if (old_cand, old_hash) != (cand, hash_):
+            diff.candidates.append((name, old_cand or None, cand or None))
+        if old_prio != prio:
+            diff.priorities.append(
+                (
+                    name,
+                    int(old_prio) if old_prio else None,
+                    int(prio) if prio else None,
+                )
+            )
+        if old_inst != inst:
+            diff.installed.append((name, old_inst or None, inst or None))
+    return diff
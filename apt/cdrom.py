@@ -24,6 +24,7 @@ import glob
 
 import apt_pkg
 
+import apt
 from apt.progress.base import CdromProgress
 
 
@@ -50,6 +51,7 @@ class Cdrom(apt_pkg.Cdrom):
         mountpoint: str | None = None,
         nomount: bool = True,
     ) -> None:
+        apt._init()
         apt_pkg.Cdrom.__init__(self)
         if progress is None:
             self._progress = CdromProgress()
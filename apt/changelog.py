@@ -0,0 +1,308 @@
+# changelog.py - download changelogs of packages
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+"""Download changelogs, reusing connections and caching them on disk.
+
+The :class:`ChangelogFetcher` class downloads the changelogs of source
+packages over HTTP keep-alive connections that are shared by all threads
+using the fetcher. Downloaded changelogs can be stored in a directory,
+keyed by source package name and version; stored changelogs are
+revalidated with a conditional request, so unchanged changelogs are not
+transferred again.
+"""
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.parse
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import apt_pkg
+
+__all__ = ["ChangelogFetcher", "truncate_changelog"]
+
+_MAX_REDIRECTS = 5
+_CHUNK_SIZE = 65536
+
+
+def _strip_epoch(version: str) -> str:
+    return version.split(":", 1)[-1]
+
+
+def truncate_changelog(text: str, src_pkg: str, installed: str | None) -> str:
+    """Return the entries of the changelog *text* newer than *installed*.
+
+    The changelog is cut at the first entry of the source package *src_pkg*
+    whose version is not newer than the version *installed*, ignoring
+    epochs. If *installed* is ``None`` or empty, *text* is returned.
+
+    .. versionadded:: 3.0
+    """
+    if not installed:
+        return text
+    installed = _strip_epoch(installed)
+    regexp = re.compile(r"^%s \(([^)]*)\)" % re.escape(src_pkg), re.MULTILINE)
+    for match in regexp.finditer(text):
+        version = _strip_epoch(match.group(1))
+        if version and apt_pkg.version_compare(version, installed) <= 0:
+            return text[: match.start()]
+    return text
+
+
+class _ConnectionPool:
+    """Idle HTTP connections, shared between threads."""
+
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+
+    def get(self, scheme: str, netloc: str) -> tuple[http.client.HTTPConnection, bool]:
+        """Return a connection to *netloc*, and whether it was used before."""
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+        return self.connect(scheme, netloc), False
+
+    def connect(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        """Return a new connection to *netloc*."""
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def put(self, scheme: str, netloc: str, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+class ChangelogFetcher:
+    """Download changelogs over shared keep-alive connections.
+
+    The parameter *cachedir* is a directory to store downloaded changelogs
+    in. Stored changelogs are returned without a download if they are
+    younger than *max_age* seconds, and revalidated using their ETag or
+    Last-Modified header otherwise. If *cachedir* is ``None``, or cannot be
+    written, changelogs are only kept in memory for the lifetime of the
+    fetcher.
+
+    The parameter *timeout* is the timeout in seconds for establishing a
+    connection and for each read from it.
+
+    A fetcher may be used by several threads at once. It can be used as a
+    context manager, which calls :meth:`close` on exit.
+
+    .. versionadded:: 3.0
+    """
+
+    def __init__(
+        self, cachedir: str | None = None, timeout: float = 2.0, max_age: float = 0.0
+    ) -> None:
+        self.cachedir = cachedir
+        self.max_age = max_age
+        self._pool = _ConnectionPool(timeout)
+        self._lock = threading.Lock()
+        self._memory: dict[tuple[str, str], dict[str, str | float | None]] = {}
+
+    def __enter__(self) -> ChangelogFetcher:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        self._pool.close()
+
+    def _entry_path(self, src_pkg: str, src_ver: str) -> str | None:
+        if not self.cachedir:
+            return None
+        return os.path.join(self.cachedir, f"{src_pkg}_{src_ver}")
+
+    def _load_entry(
+        self, src_pkg: str, src_ver: str
+    ) -> dict[str, str | float | None] | None:
+        with self._lock:
+            entry = self._memory.get((src_pkg, src_ver))
+        if entry is not None:
+            return entry
+        path = self._entry_path(src_pkg, src_ver)
+        if path is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as fobj:
+                entry = json.load(fobj)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or not isinstance(entry.get("text"), str):
+            return None
+        return entry
+
+    def _store_entry(
+        self, src_pkg: str, src_ver: str, entry: dict[str, str | float | None]
+    ) -> None:
+        with self._lock:
+            self._memory[(src_pkg, src_ver)] = entry
+        path = self._entry_path(src_pkg, src_ver)
+        if path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".changelog")
+        except OSError:
+            return
+        try:
+            with open(fd, "w", encoding="utf-8") as fobj:
+                json.dump(entry, fobj)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except OSError:
+            os.unlink(tmp)
+
+    def _request(
+        self,
+        uri: str,
+        headers: dict[str, str],
+        cancel_lock: threading.Event | None,
+    ) -> tuple[http.client.HTTPResponse, bytes] | None:
+        """Perform a GET request on a pooled connection, following redirects.
+
+        Return the response and its body, or ``None`` if *cancel_lock* was
+        set while reading the body.
+        """
+        for _ in range(_MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(uri)
+            target = parts.path or "/"
+            if parts.query:
+                target += "?" + parts.query
+            conn, reused = self._pool.get(parts.scheme, parts.netloc)
+            chunks = []
+            # Never return a connection in an unknown state to the pool,
+            # also not on timeouts or interrupts
+            try:
+                try:
+                    conn.request("GET", target, headers=headers)
+                    response = conn.getresponse()
+                except (http.client.HTTPException, ConnectionError):
+                    conn.close()
+                    if not reused:
+                        raise
+                    # The server closed the idle connection, try a fresh one
+                    conn = self._pool.connect(parts.scheme, parts.netloc)
+                    conn.request("GET", target, headers=headers)
+                    response = conn.getresponse()
+
+                while True:
+                    if cancel_lock and cancel_lock.is_set():
+                        conn.close()
+                        return None
+                    chunk = response.read(_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+            except BaseException:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._pool.put(parts.scheme, parts.netloc, conn)
+
+            location = response.getheader("Location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                uri = urllib.parse.urljoin(uri, location)
+                continue
+            return response, b"".join(chunks)
+
+        raise HTTPError(uri, 310, "Too many redirects", response.msg, None)
+
+    def fetch(
+        self,
+        uri: str,
+        src_pkg: str,
+        src_ver: str,
+        cancel_lock: threading.Event | None = None,
+    ) -> str | None:
+        """Return the changelog of *src_pkg* in version *src_ver* at *uri*.
+
+        Return ``None`` if *cancel_lock*, an instance of threading.Event, is
+        set before the download completed. Raise :class:`HTTPError` if the
+        server does not provide the changelog, and :class:`OSError` if it
+        could not be reached.
+        """
+        entry = self._load_entry(src_pkg, src_ver)
+        if entry is not None and entry.get("uri") == uri:
+            fetched = entry.get("time")
+            if isinstance(fetched, float) and time.time() - fetched < self.max_age:
+                return str(entry["text"])
+        elif entry is not None:
+            entry = None
+
+        if cancel_lock and cancel_lock.is_set():
+            return None
+
+        if not uri.startswith(("http:", "https:")):
+            # Other schemes, like file:, are not pooled or revalidated
+            with urlopen(uri, timeout=self._pool.timeout) as fobj:
+                text = fobj.read().decode("utf-8", "replace")
+            self._store_entry(
+                src_pkg, src_ver, {"uri": uri, "time": time.time(), "text": text}
+            )
+            return text
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = str(entry["etag"])
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = str(entry["last_modified"])
+
+        result = self._request(uri, headers, cancel_lock)
+        if result is None:
+            return None
+        response, body = result
+        if response.status == 304 and entry is not None:
+            text = str(entry["text"])
+        elif response.status == 200:
+            text = body.decode("utf-8", "replace")
+        else:
+            raise HTTPError(uri, response.status, response.reason, response.msg, None)
+
+        self._store_entry(
+            src_pkg,
+            src_ver,
+            {
+                "uri": uri,
+                "etag": response.getheader("ETag"),
+                "last_modified": response.getheader("Last-Modified"),
+                "time": time.time(),
+                "text": text,
+            },
+        )
+        return text
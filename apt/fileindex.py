@@ -0,0 +1,297 @@
+# fileindex.py - index of the files installed by dpkg
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+"""Index of installed files, mapping paths to the packages owning them.
+
+dpkg records the files of each installed package in a ``<package>.list``
+file in its info directory, but has no reverse lookup from a path to its
+package. The :class:`FileIndex` class keeps a sorted table of all installed
+paths and their owners, which is stored on disk and only re-reads the list
+files that changed since the index was written.
+"""
+from __future__ import annotations
+
+import bisect
+import fnmatch
+import os
+import re
+import tempfile
+from collections.abc import Iterable, Iterator
+
+import apt_pkg
+
+__all__ = ["FileIndex"]
+
+_MAGIC = "python-apt file index 1\n"
+
+
+def _glob_prefix(pattern: str) -> str:
+    """Return the literal part of *pattern* before the first wildcard."""
+    match = re.search(r"[*?[]", pattern)
+    return pattern if match is None else pattern[: match.start()]
+
+
+class FileIndex:
+    """Map installed paths to the names of the packages owning them.
+
+    The parameter *infodir* is the dpkg info directory containing the
+    ``.list`` files. It defaults to the ``info`` directory next to the
+    file configured as ``Dir::State::status``.
+
+    The parameter *path* is the file the index is stored in. It defaults
+    to the file set in ``Dir::Cache::fileindex``, or ``fileindex.bin`` in
+    ``Dir::Cache``. If the file cannot be written, e.g. when running as an
+    unprivileged user, the index is only kept in memory.
+
+    The index is loaded and brought up to date on first use. Later changes
+    by dpkg are picked up by calling :meth:`refresh`, which only reads the
+    list files whose modification time or size changed, optionally only
+    checking the list files of some packages.
+
+    Packages are identified by the name of their list file, that is, the
+    package name, qualified with the architecture for multi-arch: same
+    packages (for example ``libc6:amd64``).
+
+    .. versionadded:: 3.0
+    """
+
+    def __init__(self, infodir: str | None = None, path: str | None = None) -> None:
+        if infodir is None:
+            status = apt_pkg.config.find_file("Dir::State::status")
+            infodir = os.path.join(os.path.dirname(status), "info")
+        if path is None:
+            path = apt_pkg.config.find_file("Dir::Cache::fileindex") or (
+                os.path.join(apt_pkg.config.find_dir("Dir::Cache"), "fileindex.bin")
+            )
+        self.infodir = infodir
+        self.path = path
+        self._loaded = False
+        # Package table: the position in the lists is the package id
+        self._names: list[str] = []
+        self._stamps: list[tuple[int, int]] = []
+        self._ids: dict[str, int] = {}
+        # Sorted path table, with the ids of the owners of each path
+        self._paths: list[str] = []
+        self._owners: list[tuple[int, ...]] = []
+        self._files: dict[int, list[str]] | None = None
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._paths)
+
+    def __contains__(self, path: object) -> bool:
+        return isinstance(path, str) and bool(self.owners(path))
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the index has been loaded into memory."""
+        return self._loaded
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self._load()
+            self._loaded = True
+            if self.refresh():
+                self.save()
+
+    def _load(self) -> None:
+        """Read the index from disk, leaving it empty on errors."""
+        try:
+            with open(self.path, encoding="utf-8", errors="surrogateescape") as fobj:
+                if fobj.readline() != _MAGIC:
+                    return
+                names, stamps, paths, owners = [], [], [], []
+                for _ in range(int(fobj.readline())):
+                    mtime, size, name = fobj.readline().rstrip("\n").split(" ", 2)
+                    names.append(name)
+                    stamps.append((int(mtime), int(size)))
+                for line in fobj:
+                    path, ids = line.rstrip("\n").rsplit("\t", 1)
+                    paths.append(path)
+                    owners.append(tuple(int(i) for i in ids.split(",")))
+        except (OSError, ValueError):
+            return
+
+        self._names = names
+        self._stamps = stamps
+        self._paths = paths
+        self._owners = owners
+        self._ids = {name: i for i, name in enumerate(names)}
+
+    def save(self) -> bool:
+        """Write the index to disk.
+
+        Return ``False`` if the index file could not be written.
+        """
+        self._ensure_loaded()
+        directory = os.path.dirname(self.path) or "."
+        try:
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".fileindex")
+        except OSError:
+            return False
+        try:
+            with open(fd, "w", encoding="utf-8", errors="surrogateescape") as fobj:
+                fobj.write(_MAGIC)
+                fobj.write("%d\n" % len(self._names))
+                for name, (mtime, size) in zip(self._names, self._stamps):
+                    fobj.write(f"{mtime} {size} {name}\n")
+                for path, ids in zip(self._paths, self._owners):
+                    fobj.write("{}\t{}\n".format(path, ",".join(map(str, ids))))
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.path)
+        except OSError:
+            os.unlink(tmp)
+            return False
+        return True
+
+    @staticmethod
+    def _read_list(path: str) -> list[str]:
+        with open(path, "rb") as fobj:
+            data = fobj.read().decode("utf-8", "surrogateescape")
+        return [line for line in data.split("\n") if line]
+
+    def refresh(self, names: Iterable[str] | None = None) -> bool:
+        """Re-read the list files changed since the index was built.
+
+        If *names* is given, only the list files of these packages are
+        checked, which is much cheaper than scanning the info directory.
+
+        Return ``True`` if the index changed. Call :meth:`save` to store
+        the updated index on disk.
+        """
+        if not self._loaded:
+            self._load()
+            self._loaded = True
+            names = None
+
+        current: dict[str, tuple[tuple[int, int], str]] = {}
+        if names is not None:
+            for name, stamp in zip(self._names, self._stamps):
+                current[name] = (stamp, "")
+            for name in names:
+                path = os.path.join(self.infodir, name + ".list")
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    current.pop(name, None)
+                    continue
+                current[name] = ((st.st_mtime_ns, st.st_size), path)
+        else:
+            try:
+                with os.scandir(self.infodir) as entries:
+                    for entry in entries:
+                        if not entry.name.endswith(".list"):
+                            continue
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        stamp = (st.st_mtime_ns, st.st_size)
+                        current[entry.name[: -len(".list")]] = (stamp, entry.path)
+            except OSError:
+                pass
+
+        changed = {
+            name
+            for name, (stamp, _path) in current.items()
+            if name not in self._ids or self._stamps[self._ids[name]] != stamp
+        }
+        removed = {name for name in self._ids if name not in current}
+        if not changed and not removed:
+            return False
+
+        # Rebuild the tables, keeping unchanged packages as they are
+        names = [name for name in self._names if name in current]
+        names.extend(sorted(changed.difference(self._ids)))
+        ids = {name: i for i, name in enumerate(names)}
+        remap = {
+            old: ids[name]
+            for old, name in enumerate(self._names)
+            if name in ids and name not in changed
+        }
+        owners: dict[str, list[int]] = {}
+        for path, old_ids in zip(self._paths, self._owners):
+            new_ids = [remap[i] for i in old_ids if i in remap]
+            if new_ids:
+                owners[path] = new_ids
+
+        stamps = []
+        for name in names:
+            stamp, path = current[name]
+            if name in changed:
+                try:
+                    files = self._read_list(path)
+                except OSError:
+                    files = []
+                for file in files:
+                    owners.setdefault(file, []).append(ids[name])
+            stamps.append(stamp)
+
+        self._names, self._stamps, self._ids = names, stamps, ids
+        self._paths = sorted(owners)
+        self._owners = [tuple(sorted(owners[path])) for path in self._paths]
+        self._files = None
+        return True
+
+    def _entry(self, pos: int) -> tuple[str, list[str]]:
+        return self._paths[pos], [self._names[i] for i in self._owners[pos]]
+
+    def owners(self, path: str) -> list[str]:
+        """Return the names of the packages owning *path*."""
+        self._ensure_loaded()
+        if len(path) > 1:
+            path = path.rstrip("/")
+        pos = bisect.bisect_left(self._paths, path)
+        if pos < len(self._paths) and self._paths[pos] == path:
+            return self._entry(pos)[1]
+        return []
+
+    def find_prefix(self, prefix: str) -> Iterator[tuple[str, list[str]]]:
+        """Iterate over (path, owners) for all paths starting with *prefix*."""
+        self._ensure_loaded()
+        pos = bisect.bisect_left(self._paths, prefix)
+        while pos < len(self._paths) and self._paths[pos].startswith(prefix):
+            yield self._entry(pos)
+            pos += 1
+
+    def glob(self, pattern: str) -> Iterator[tuple[str, list[str]]]:
+        """Iterate over (path, owners) for all paths matching *pattern*.
+
+        The pattern uses the syntax of :mod:`fnmatch`, where ``*`` also
+        matches ``/``. Only the part of the table starting with the
+        literal prefix of the pattern is searched.
+        """
+        match = re.compile(fnmatch.translate(pattern)).match
+        for path, owners in self.find_prefix(_glob_prefix(pattern)):
+            if match(path):
+                yield path, owners
+
+    def files(self, name: str) -> list[str] | None:
+        """Return the paths installed by the package *name*.
+
+        Return ``None`` if the package has no list file in the index.
+        The paths are sorted.
+        """
+        self._ensure_loaded()
+        if name not in self._ids:
+            return None
+        if self._files is None:
+            files: dict[int, list[str]] = {}
+            for path, ids in zip(self._paths, self._owners):
+                for i in ids:
+                    files.setdefault(i, []).append(path)
+            self._files = files
+        return list(self._files.get(self._ids[name], []))
@@ -0,0 +1,263 @@
+# indexstore.py - content-addressed store of package caches
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+"""Share generated package caches between root directories.
+
+APT keeps two binary caches: the source package cache, built from the
+package lists, and the package cache, which adds the dpkg status file to
+it. Both are only valid for the exact files they were built from, so root
+directories with identical lists, like container images built from the
+same snapshot, normally each parse their lists again.
+
+An :class:`IndexStore` keeps copies of the inputs of these caches in a
+directory, keyed by a hash of their contents, and redirects the
+configuration of a cache to them. Opening a cache whose inputs are in the
+store maps the stored package cache; if only the status file is new, the
+stored source package cache is reused and just the status file is merged
+into it.
+"""
+from __future__ import annotations
+
+import glob
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+import threading
+from collections.abc import Callable
+
+import apt_pkg
+
+__all__ = ["IndexStore"]
+
+_CHUNK_SIZE = 1 << 20
+
+# Options which change the contents of the generated caches
+_CONFIG_KEYS = (
+    "APT::Architecture",
+    "APT::Architectures",
+    "Acquire::Languages",
+    "APT::Cache-Start",
+    "APT::Cache-Grow",
+)
+
+
+def _hash_file(digest: hashlib._Hash, path: str) -> None:
+    with open(path, "rb") as fobj:
+        while chunk := fobj.read(_CHUNK_SIZE):
+            digest.update(chunk)
+
+
+class IndexStore:
+    """A content-addressed store of package caches in *directory*.
+
+    Pass a store to :class:`apt.Cache` as *index_store*, or call
+    :meth:`prepare` on a configuration before opening a cache with it.
+    The store may be shared by several processes.
+
+    The files are only hashed again when their size, modification time or
+    inode changed; the hashes are kept in the ``digests`` file of the store.
+
+    Caches opened from a store read the package lists and the dpkg status
+    file from the store, so they are meant for analysing root directories;
+    changes cannot be committed.
+
+    .. versionadded:: 3.0
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = os.path.abspath(directory)
+        self._lock = threading.Lock()
+        # The SHA-256 digests of files, by path, with the size, modification
+        # time and inode they were computed for; None until loaded.
+        self._digests: dict[str, tuple[tuple[int, int, int], str]] | None = None
+        self._digests_changed = False
+
+    def _load_digests(self) -> None:
+        self._digests = {}
+        try:
+            with open(
+                os.path.join(self.directory, "digests"),
+                encoding="utf-8",
+                errors="surrogateescape",
+            ) as fobj:
+                for line in fobj:
+                    size, mtime, ino, digest, path = line.rstrip("\n").split(" ", 4)
+                    self._digests[path] = ((int(size), int(mtime), int(ino)), digest)
+        except (OSError, ValueError):
+            pass
+
+    def _save_digests(self) -> None:
+        """Store the digests, dropping those of files which are gone."""
+        assert self._digests is not None
+        self._digests = {
+            path: entry
+            for path, entry in self._digests.items()
+            if os.path.exists(path)
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".digests")
+        except OSError:
+            return
+        try:
+            with open(fd, "w", encoding="utf-8", errors="surrogateescape") as fobj:
+                for path, ((size, mtime, ino), digest) in self._digests.items():
+                    fobj.write(f"{size} {mtime} {ino} {digest} {path}\n")
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, os.path.join(self.directory, "digests"))
+        except OSError:
+            os.unlink(tmp)
+        self._digests_changed = False
+
+    def _file_digest(self, path: str) -> str | None:
+        """Return the digest of the regular file *path*, or None."""
+        assert self._digests is not None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        stamp = (st.st_size, st.st_mtime_ns, st.st_ino)
+        entry = self._digests.get(path)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        digest = hashlib.sha256()
+        _hash_file(digest, path)
+        self._digests[path] = (stamp, digest.hexdigest())
+        self._digests_changed = True
+        return digest.hexdigest()
+
+    def keys(self, config: apt_pkg.Configuration) -> tuple[str, str]:
+        """Return the keys of the lists and of the status file of *config*.
+
+        The key of the lists covers the files in ``Dir::State::Lists``, the
+        sources.list files and the options affecting the generated caches.
+        The key of the status file covers the ``Dir::State::status`` file.
+        """
+        with self._lock:
+            if self._digests is None:
+                self._load_digests()
+            try:
+                return self._keys(config)
+            finally:
+                if self._digests_changed:
+                    self._save_digests()
+
+    def _keys(self, config: apt_pkg.Configuration) -> tuple[str, str]:
+        lists = hashlib.sha256()
+        for key in _CONFIG_KEYS:
+            values = config.value_list(key) or [config.find(key)]
+            lists.update(("%s=%s\0" % (key, ",".join(values))).encode("utf-8"))
+
+        sources = [config.find_file("Dir::Etc::sourcelist")]
+        parts = config.find_dir("Dir::Etc::sourceparts")
+        sources += sorted(glob.glob(os.path.join(parts, "*.list")))
+        sources += sorted(glob.glob(os.path.join(parts, "*.sources")))
+        for path in sources:
+            digest = self._file_digest(path)
+            if digest is not None:
+                name = os.path.basename(path).encode("utf-8", "surrogateescape")
+                lists.update(name + b"\0" + digest.encode("ascii"))
+
+        lists_dir = config.find_dir("Dir::State::Lists")
+        for name in sorted(os.listdir(lists_dir)):
+            if name == "lock":
+                continue
+            digest = self._file_digest(os.path.join(lists_dir, name))
+            if digest is not None:
+                lists.update(b"\0" + name.encode("utf-8", "surrogateescape") + b"\0")
+                lists.update(digest.encode("ascii"))
+
+        status = self._file_digest(config.find_file("Dir::State::status"))
+        if status is None:
+            status = hashlib.sha256().hexdigest()
+        return lists.hexdigest(), status
+
+    def prepare(
+        self,
+        config: apt_pkg.Configuration,
+        target: apt_pkg.Configuration | None = None,
+    ) -> str:
+        """Redirect *config* to the stored copies of its lists and status.
+
+        Add the package lists and the status file of *config* to the store
+        unless they are already there, and point ``Dir::State::Lists``,
+        ``Dir::State::status`` and the cache files of *config* to the entry
+        in the store. If *target* is given, these options are set in it
+        instead, leaving *config* untouched. Return the directory of the
+        entry.
+        """
+        if target is None:
+            target = config
+        lists_key, status_key = self.keys(config)
+        lists_entry = os.path.join(self.directory, lists_key)
+        status_entry = os.path.join(lists_entry, status_key)
+
+        if not os.path.isdir(lists_entry):
+            lists_dir = config.find_dir("Dir::State::Lists")
+            self._add(lists_entry, lambda tmp: self._copy_lists(lists_dir, tmp))
+        if not os.path.isdir(status_entry):
+            status_file = config.find_file("Dir::State::status")
+            self._add(status_entry, lambda tmp: self._copy_status(status_file, tmp))
+
+        target.set("Dir::State::Lists", os.path.join(lists_entry, "lists"))
+        target.set(
+            "Dir::Cache::srcpkgcache", os.path.join(lists_entry, "srcpkgcache.bin")
+        )
+        target.set("Dir::State::status", os.path.join(status_entry, "status"))
+        target.set("Dir::Cache::pkgcache", os.path.join(status_entry, "pkgcache.bin"))
+        return status_entry
+
+    def _add(self, entry: str, fill: Callable[[str], None]) -> None:
+        """Create *entry* atomically, filling it with *fill*."""
+        parent = os.path.dirname(entry)
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+        try:
+            fill(tmp)
+            os.chmod(tmp, 0o755)
+            os.rename(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            # Another process may have added the same entry meanwhile
+            if not os.path.isdir(entry):
+                raise
+
+    @staticmethod
+    def _copy_lists(lists_dir: str, tmp: str) -> None:
+        target = os.path.join(tmp, "lists")
+        os.makedirs(os.path.join(target, "partial"))
+        for name in os.listdir(lists_dir):
+            path = os.path.join(lists_dir, name)
+            if name == "lock" or not os.path.isfile(path):
+                continue
+            # The caches are validated using the modification times, which
+            # links and copy2() preserve.
+            try:
+                os.link(path, os.path.join(target, name))
+            except OSError:
+                shutil.copy2(path, os.path.join(target, name))
+
+    @staticmethod
+    def _copy_status(status_file: str, tmp: str) -> None:
+        os.mkdir(os.path.join(tmp, "updates"))
+        if os.path.isfile(status_file):
+            shutil.copy2(status_file, os.path.join(tmp, "status"))
+        else:
+            open(os.path.join(tmp, "status"), "w").close()
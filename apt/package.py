@@ -24,20 +24,20 @@ from __future__ import annotations
 import logging
 import os
 import re
-import socket
 import subprocess
 import sys
 import threading
-from collections.abc import Iterable, Iterator, Mapping, Sequence
-from http.client import BadStatusLine
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from http.client import HTTPException
 from typing import Any, no_type_check
 from urllib.error import HTTPError
-from urllib.request import urlopen
 
 import apt_pkg
 from apt_pkg import gettext as _
 
 import apt.progress.text
+import apt.stats
+from apt.changelog import ChangelogFetcher, truncate_changelog
 from apt.progress.base import AcquireProgress, InstallProgress
 
 __all__ = (
@@ -383,6 +383,36 @@ class Record(Mapping[Any, Any]):
         return len(self._rec)
 
 
+def _source_pkg(records: apt_pkg.PackageRecords) -> str:
+    try:
+        return records.source_pkg
+    except IndexError:
+        return ""
+
+
+def _source_ver(records: apt_pkg.PackageRecords) -> str:
+    try:
+        return records.source_ver
+    except IndexError:
+        return ""
+
+
+# Fields of a Version read from its package record, mapped to a function
+# extracting their raw value from the records. The values are cached in
+# the Version and can be prefetched with apt.Cache.records_for().
+_RECORD_FIELDS: dict[str, Callable[[apt_pkg.PackageRecords], Any]] = {
+    "filename": lambda records: records.filename,
+    "homepage": lambda records: records.homepage,
+    "md5": lambda records: records.md5_hash,
+    "raw_description": lambda records: records.long_desc,
+    "record": lambda records: records.record,
+    "sha1": lambda records: records.sha1_hash,
+    "sha256": lambda records: records.sha256_hash,
+    "source_name": _source_pkg,
+    "source_version": _source_ver,
+}
+
+
 class Version:
     """Representation of a package version.
 
@@ -395,7 +425,10 @@ class Version:
     def __init__(self, package: Package, cand: apt_pkg.Version) -> None:
         self.package = package
         self._cand = cand
+        self._record_cache: dict[str, Any] | None = None
         self.package._pcache._weakversions.add(self)
+        if apt.stats.enabled:
+            apt.stats.counters["version_wrappers"] += 1
 
     def _cmp(self, other: Any) -> int | Any:
         """Compares against another apt.Version object or a version string.
@@ -456,21 +489,54 @@ class Version:
     def __repr__(self) -> str:
         return f"<Version: package:{self.package.name!r} version:{self.version!r}>"
 
+    def _lookup_records(
+        self, verfile: tuple[apt_pkg.PackageFile, int]
+    ) -> apt_pkg.PackageRecords:
+        """Internal helper that moves the Records to *verfile*."""
+        records = self.package._pcache._get_records()
+        if not records.lookup(verfile):
+            raise LookupError("Could not lookup record")
+
+        return records
+
     @property
     def _records(self) -> apt_pkg.PackageRecords:
         """Internal helper that moves the Records to the right position."""
         # If changing lookup, change fetch_binary() as well
-        if not self.package._pcache._records.lookup(self._cand.file_list[0]):
-            raise LookupError("Could not lookup record")
+        return self._lookup_records(self._cand.file_list[0])
 
-        return self.package._pcache._records
+    def _fill_record_cache(
+        self,
+        fields: Iterable[str],
+        verfile: tuple[apt_pkg.PackageFile, int] | None = None,
+    ) -> dict[str, Any]:
+        """Read the given record fields into the cache, with one lookup."""
+        if self._record_cache is None:
+            self._record_cache = {}
+        cache = self._record_cache
+        missing = [field for field in fields if field not in cache]
+        if missing:
+            if verfile is None:
+                verfile = self._cand.file_list[0]
+            records = self._lookup_records(verfile)
+            for field in missing:
+                cache[field] = _RECORD_FIELDS[field](records)
+        return cache
+
+    def _record_field(self, field: str) -> Any:
+        """Return the raw value of a field of the package record."""
+        cache = self._record_cache
+        if cache is None or field not in cache:
+            cache = self._fill_record_cache((field,))
+        return cache[field]
 
     @property
     def _translated_records(self) -> apt_pkg.PackageRecords | None:
         """Internal helper to get the translated description."""
         desc_iter = self._cand.translated_description
-        if self.package._pcache._records.lookup(desc_iter.file_list.pop(0)):
-            return self.package._pcache._records
+        records = self.package._pcache._get_records()
+        if records.lookup(desc_iter.file_list.pop(0)):
+            return records
         return None
 
     @property
@@ -486,7 +552,7 @@ class Version:
     @property
     def homepage(self) -> str:
         """Return the homepage for the package."""
-        return self._records.homepage
+        return self._record_field("homepage")
 
     @property
     def size(self) -> int:
@@ -526,7 +592,7 @@ class Version:
     @property
     def raw_description(self) -> str:
         """return the long description (raw)."""
-        return self._records.long_desc
+        return self._record_field("raw_description")
 
     @property
     def section(self) -> str:
@@ -592,7 +658,7 @@ class Version:
     def source_name(self) -> str:
         """Return the name of the source package."""
         try:
-            return self._records.source_pkg or self.package.shortname
+            return self._record_field("source_name") or self.package.shortname
         except IndexError:
             return self.package.shortname
 
@@ -600,7 +666,7 @@ class Version:
     def source_version(self) -> str:
         """Return the version of the source package."""
         try:
-            return self._records.source_ver or self._cand.ver_str
+            return self._record_field("source_version") or self._cand.ver_str
         except IndexError:
             return self._cand.ver_str
 
@@ -623,7 +689,7 @@ class Version:
         Return a Record() object for this version which provides access
         to the raw attributes of the candidate version
         """
-        return Record(self._records.record)
+        return Record(self._record_field("record"))
 
     def get_dependencies(self, *types: str) -> list[Dependency]:
         """Return a list of Dependency objects for the given types.
@@ -686,7 +752,7 @@ class Version:
 
         .. versionadded:: 0.7.10
         """
-        return self._records.filename
+        return self._record_field("filename")
 
     @property
     def md5(self) -> str:
@@ -694,7 +760,7 @@ class Version:
 
         .. versionadded:: 0.7.10
         """
-        return self._records.md5_hash
+        return self._record_field("md5")
 
     @property
     def sha1(self) -> str:
@@ -702,7 +768,7 @@ class Version:
 
         .. versionadded:: 0.7.10
         """
-        return self._records.sha1_hash
+        return self._record_field("sha1")
 
     @property
     def sha256(self) -> str:
@@ -710,7 +776,7 @@ class Version:
 
         .. versionadded:: 0.7.10
         """
-        return self._records.sha256_hash
+        return self._record_field("sha256")
 
     @property
     def tasks(self) -> set[str]:
@@ -730,7 +796,7 @@ class Version:
         for packagefile, _unused in self._cand.file_list:
             indexfile = self.package._pcache._list.find_index(packagefile)
             if indexfile:
-                yield indexfile.archive_uri(self._records.filename)
+                yield indexfile.archive_uri(self.filename)
 
     @property
     def uris(self) -> list[str]:
@@ -773,7 +839,7 @@ class Version:
         .. versionadded:: 0.7.10
         """
         if allow_unauthenticated is None:
-            allow_unauthenticated = apt_pkg.config.find_b(
+            allow_unauthenticated = self.package._pcache.config.find_b(
                 "APT::Get::" "AllowUnauthenticated", False
             )
         base = os.path.basename(self._records.filename)
@@ -803,11 +869,13 @@ class Version:
             raise UntrustedError(
                 "The item %r could not be fetched: " "No trusted hash found." % destfile
             )
-        acq = apt_pkg.Acquire(progress or apt.progress.text.AcquireProgress())
-        acqfile = apt_pkg.AcquireFile(
-            acq, self.uri, hashes, self.size, base, destfile=destfile
-        )
-        acq.run()
+        # Download with the settings of the cache, like Dir::Cache and Acquire::*
+        with self.package._pcache._use_config(init_system=True):
+            acq = apt_pkg.Acquire(progress or apt.progress.text.AcquireProgress())
+            acqfile = apt_pkg.AcquireFile(
+                acq, self.uri, hashes, self.size, base, destfile=destfile
+            )
+            acq.run()
 
         if acqfile.status != acqfile.STAT_DONE:
             raise FetchError(
@@ -844,56 +912,58 @@ class Version:
         the configuration option `APT::Get::AllowUnauthenticated`.
         """
         if allow_unauthenticated is None:
-            allow_unauthenticated = apt_pkg.config.find_b(
+            allow_unauthenticated = self.package._pcache.config.find_b(
                 "APT::Get::" "AllowUnauthenticated", False
             )
 
-        src = apt_pkg.SourceRecords()
-        acq = apt_pkg.Acquire(progress or apt.progress.text.AcquireProgress())
-
-        dsc = None
-        record = self._records
-        source_name = record.source_pkg or self.package.shortname
-        source_version = record.source_ver or self._cand.ver_str
-        source_lookup = src.lookup(source_name)
+        # Look up and download the source with the settings of the cache
+        with self.package._pcache._use_config(init_system=True):
+            src = apt_pkg.SourceRecords()
+            acq = apt_pkg.Acquire(progress or apt.progress.text.AcquireProgress())
 
-        while source_lookup and source_version != src.version:
+            dsc = None
+            record = self._records
+            source_name = record.source_pkg or self.package.shortname
+            source_version = record.source_ver or self._cand.ver_str
             source_lookup = src.lookup(source_name)
-        if not source_lookup:
-            raise ValueError("No source for %r" % self)
-        files = list()
 
-        if not (allow_unauthenticated or src.index.is_trusted):
-            raise UntrustedError(
-                "Could not fetch %s %s source package: "
-                "Source %r is not trusted"
-                % (self.package.name, self.version, src.index.describe)
-            )
-        for fil in src.files:
-            base = os.path.basename(fil.path)
-            destfile = os.path.join(destdir, base)
-            if fil.type == "dsc":
-                dsc = destfile
-            if _file_is_same(destfile, fil.size, fil.hashes):
-                logging.debug("Ignoring already existing file: %s" % destfile)
-                continue
+            while source_lookup and source_version != src.version:
+                source_lookup = src.lookup(source_name)
+            if not source_lookup:
+                raise ValueError("No source for %r" % self)
+            files = list()
 
-            if not (allow_unauthenticated or fil.hashes.usable):
+            if not (allow_unauthenticated or src.index.is_trusted):
                 raise UntrustedError(
-                    "The item %r could not be fetched: "
-                    "No trusted hash found." % destfile
+                    "Could not fetch %s %s source package: "
+                    "Source %r is not trusted"
+                    % (self.package.name, self.version, src.index.describe)
                 )
-            files.append(
-                apt_pkg.AcquireFile(
-                    acq,
-                    src.index.archive_uri(fil.path),
-                    fil.hashes,
-                    fil.size,
-                    base,
-                    destfile=destfile,
+            for fil in src.files:
+                base = os.path.basename(fil.path)
+                destfile = os.path.join(destdir, base)
+                if fil.type == "dsc":
+                    dsc = destfile
+                if _file_is_same(destfile, fil.size, fil.hashes):
+                    logging.debug("Ignoring already existing file: %s" % destfile)
+                    continue
+
+                if not (allow_unauthenticated or fil.hashes.usable):
+                    raise UntrustedError(
+                        "The item %r could not be fetched: "
+                        "No trusted hash found." % destfile
+                    )
+                files.append(
+                    apt_pkg.AcquireFile(
+                        acq,
+                        src.index.archive_uri(fil.path),
+                        fil.hashes,
+                        fil.size,
+                        base,
+                        destfile=destfile,
+                    )
                 )
-            )
-        acq.run()
+            acq.run()
 
         if dsc is None:
             raise ValueError("No source for %r" % self)
@@ -1007,6 +1077,8 @@ class Package:
         self._pkg = pkgiter
         self._pcache = pcache  # python cache in cache.py
         self._changelog = ""  # Cached changelog
+        if apt.stats.enabled:
+            apt.stats.counters["package_wrappers"] += 1
 
     def __str__(self) -> str:
         return self.name
@@ -1182,7 +1254,21 @@ class Package:
 
         Return a list of unicode names of the files which have
         been installed by this package
+
+        .. versionchanged:: 3.0
+            If the :attr:`apt.cache.Cache.file_index` of the cache has been
+            loaded, the files are looked up there, and returned sorted. The
+            list file of the package is checked for changes first.
         """
+        index = self._pcache._file_index
+        if index is not None and index.loaded:
+            index.refresh((self.name, self.fullname))
+            for name in self.name, self.fullname:
+                files = index.files(name)
+                if files is not None:
+                    return files
+            return []
+
         for name in self.name, self.fullname:
             path = "/var/lib/dpkg/info/%s.list" % name
             try:
@@ -1193,31 +1279,14 @@ class Package:
 
         return []
 
-    def get_changelog(
-        self, uri: str | None = None, cancel_lock: threading.Event | None = None
-    ) -> str:
-        """
-        Download the changelog of the package and return it as unicode
-        string.
-
-        The parameter *uri* refers to the uri of the changelog file. It may
-        contain multiple named variables which will be substitued. These
-        variables are (src_section, prefix, src_pkg, src_ver). An example is
-        the Ubuntu changelog::
+    def _changelog_location(self, uri: str | None) -> tuple[str, str, str] | None:
+        """Return the uri, source name and source version of the changelog.
 
-            "http://changelogs.ubuntu.com/changelogs/pool" \\
-                "/%(src_section)s/%(prefix)s/%(src_pkg)s" \\
-                "/%(src_pkg)s_%(src_ver)s/changelog"
-
-        The parameter *cancel_lock* refers to an instance of threading.Event,
-        which if set, prevents the download.
+        Return ``None`` if the location of the changelog of the candidate is
+        not known. See :meth:`get_changelog` for the parameter *uri*.
         """
-        # Return a cached changelog if available
-        if self._changelog != "":
-            return self._changelog
-
         if not self.candidate:
-            return _("The list of changes is not available")
+            return None
 
         if uri is None:
             if self.candidate.origins[0].origin == "Debian":
@@ -1233,11 +1302,7 @@ class Package:
                     "/%(src_pkg)s_%(src_ver)s/changelog"
                 )
             else:
-                res = _("The list of changes is not available")
-                if isinstance(res, str):
-                    return res
-                else:
-                    return res.decode("utf-8")
+                return None
 
         # get the src package name
         src_pkg = self.candidate.source_name
@@ -1294,92 +1359,109 @@ class Package:
             "src_pkg": src_pkg,
             "src_ver": src_ver,
         }
+        return uri, src_pkg, src_ver
 
-        timeout = socket.getdefaulttimeout()
+    def _changelog_result(
+        self,
+        src_pkg: str,
+        src_ver: str,
+        text: str | None,
+        error: Exception | None = None,
+    ) -> str:
+        """Return the message for a downloaded changelog or download error.
 
-        # FIXME: when python2.4 vanishes from the archive,
-        #        merge this into a single try..finally block (pep 341)
-        try:
-            try:
-                # Set a timeout for the changelog download
-                socket.setdefaulttimeout(2)
-
-                # Check if the download was canceled
-                if cancel_lock and cancel_lock.is_set():
-                    return ""
-                # FIXME: python3.2: Should be closed manually
-                changelog_file = urlopen(uri)
-                # do only get the lines that are new
-                changelog = ""
-                regexp = "^%s \\((.*)\\)(.*)$" % (re.escape(src_pkg))
-                while True:
-                    # Check if the download was canceled
-                    if cancel_lock and cancel_lock.is_set():
-                        return ""
-                    # Read changelog line by line
-                    line_raw = changelog_file.readline()
-                    if not line_raw:
-                        break
-                    # The changelog is encoded in utf-8, but since there isn't
-                    # any http header, urllib2 seems to treat it as ascii
-                    line = line_raw.decode("utf-8")
-
-                    # print line.encode('utf-8')
-                    match = re.match(regexp, line)
-                    if match:
-                        # strip epoch from installed version
-                        # and from changelog too
-                        installed = getattr(self.installed, "version", None)
-                        if installed and ":" in installed:
-                            installed = installed.split(":", 1)[1]
-                        changelog_ver = match.group(1)
-                        if changelog_ver and ":" in changelog_ver:
-                            changelog_ver = changelog_ver.split(":", 1)[1]
-
-                        if (
-                            installed
-                            and apt_pkg.version_compare(changelog_ver, installed) <= 0
-                        ):
-                            break
-                    # EOF (shouldn't really happen)
-                    changelog += line
-
-                # Print an error if we failed to extract a changelog
-                if len(changelog) == 0:
-                    changelog = _("The list of changes is not available")
-                    if not isinstance(changelog, str):
-                        changelog = changelog.decode("utf-8")
-                self._changelog = changelog
-
-            except HTTPError:
-                if self.candidate.origins[0].origin == "Ubuntu":
-                    res = _(
-                        "The list of changes is not available yet.\n\n"
-                        "Please use "
-                        "http://launchpad.net/ubuntu/+source/%s/"
-                        "%s/+changelog\n"
-                        "until the changes become available or try again "
-                        "later."
-                    ) % (src_pkg, src_ver)
-                else:
-                    res = _("The list of changes is not available")
-                if isinstance(res, str):
-                    return res
-                else:
-                    return res.decode("utf-8")
-            except (OSError, BadStatusLine):
+        A downloaded changelog *text* is cut at the installed version and
+        memoized. A *text* of ``None`` means the download was canceled.
+        """
+        if isinstance(error, HTTPError):
+            if self.candidate and self.candidate.origins[0].origin == "Ubuntu":
                 res = _(
-                    "Failed to download the list of changes. \nPlease "
-                    "check your Internet connection."
-                )
-                if isinstance(res, str):
-                    return res
-                else:
-                    return res.decode("utf-8")
-        finally:
-            socket.setdefaulttimeout(timeout)
+                    "The list of changes is not available yet.\n\n"
+                    "Please use "
+                    "http://launchpad.net/ubuntu/+source/%s/"
+                    "%s/+changelog\n"
+                    "until the changes become available or try again "
+                    "later."
+                ) % (src_pkg, src_ver)
+            else:
+                res = _("The list of changes is not available")
+            if isinstance(res, str):
+                return res
+            else:
+                return res.decode("utf-8")
+        elif error is not None:
+            res = _(
+                "Failed to download the list of changes. \nPlease "
+                "check your Internet connection."
+            )
+            if isinstance(res, str):
+                return res
+            else:
+                return res.decode("utf-8")
+
+        if text is None:
+            return ""
+
+        # do only get the entries that are new
+        installed = getattr(self.installed, "version", None)
+        changelog = truncate_changelog(text, src_pkg, installed)
+        # Print an error if we failed to extract a changelog
+        if len(changelog) == 0:
+            changelog = _("The list of changes is not available")
+            if not isinstance(changelog, str):
+                changelog = changelog.decode("utf-8")
+        self._changelog = changelog
         return self._changelog
 
+    def get_changelog(
+        self, uri: str | None = None, cancel_lock: threading.Event | None = None
+    ) -> str:
+        """
+        Download the changelog of the package and return it as unicode
+        string.
+
+        The parameter *uri* refers to the uri of the changelog file. It may
+        contain multiple named variables which will be substitued. These
+        variables are (src_section, prefix, src_pkg, src_ver). An example is
+        the Ubuntu changelog::
+
+            "http://changelogs.ubuntu.com/changelogs/pool" \\
+                "/%(src_section)s/%(prefix)s/%(src_pkg)s" \\
+                "/%(src_pkg)s_%(src_ver)s/changelog"
+
+        The parameter *cancel_lock* refers to an instance of threading.Event,
+        which if set, prevents the download.
+
+        To download the changelogs of many packages at once, use
+        :meth:`apt.Cache.get_changelogs`.
+
+        .. versionchanged:: 3.0
+            The download no longer changes the default socket timeout.
+        """
+        # Return a cached changelog if available
+        if self._changelog != "":
+            return self._changelog
+
+        location = self._changelog_location(uri)
+        if location is None:
+            res = _("The list of changes is not available")
+            if isinstance(res, str):
+                return res
+            else:
+                return res.decode("utf-8")
+        uri, src_pkg, src_ver = location
+
+        # Check if the download was canceled
+        if cancel_lock and cancel_lock.is_set():
+            return ""
+
+        with ChangelogFetcher() as fetcher:
+            try:
+                text = fetcher.fetch(uri, src_pkg, src_ver, cancel_lock)
+            except (OSError, HTTPException) as error:
+                return self._changelog_result(src_pkg, src_ver, None, error)
+        return self._changelog_result(src_pkg, src_ver, text)
+
     @property
     def versions(self) -> VersionList:
         """Return a VersionList() object for all available versions.
@@ -1408,7 +1490,8 @@ class Package:
     def mark_keep(self) -> None:
         """Mark a package for keep."""
         self._pcache.cache_pre_change()
-        self._pcache._depcache.mark_keep(self._pkg)
+        with self._pcache._use_config():
+            self._pcache._depcache.mark_keep(self._pkg)
         self._pcache.cache_post_change()
 
     def mark_delete(self, auto_fix: bool = True, purge: bool = False) -> None:
@@ -1421,14 +1504,15 @@ class Package:
         as well.  The default is to keep the configuration.
         """
         self._pcache.cache_pre_change()
-        self._pcache._depcache.mark_delete(self._pkg, purge)
-        # try to fix broken stuffsta
-        if auto_fix and self._pcache._depcache.broken_count > 0:
-            fix = apt_pkg.ProblemResolver(self._pcache._depcache)
-            fix.clear(self._pkg)
-            fix.protect(self._pkg)
-            fix.remove(self._pkg)
-            fix.resolve()
+        with self._pcache._use_config():
+            self._pcache._depcache.mark_delete(self._pkg, purge)
+            # try to fix broken stuffsta
+            if auto_fix and self._pcache._depcache.broken_count > 0:
+                fix = apt_pkg.ProblemResolver(self._pcache._depcache)
+                fix.clear(self._pkg)
+                fix.protect(self._pkg)
+                fix.remove(self._pkg)
+                fix.resolve()
         self._pcache.cache_post_change()
 
     def mark_install(
@@ -1448,13 +1532,14 @@ class Package:
         when no other package depends on it.
         """
         self._pcache.cache_pre_change()
-        self._pcache._depcache.mark_install(self._pkg, auto_inst, from_user)
-        # try to fix broken stuff
-        if auto_fix and self._pcache._depcache.broken_count > 0:
-            fixer = apt_pkg.ProblemResolver(self._pcache._depcache)
-            fixer.clear(self._pkg)
-            fixer.protect(self._pkg)
-            fixer.resolve(True)
+        with self._pcache._use_config():
+            self._pcache._depcache.mark_install(self._pkg, auto_inst, from_user)
+            # try to fix broken stuff
+            if auto_fix and self._pcache._depcache.broken_count > 0:
+                fixer = apt_pkg.ProblemResolver(self._pcache._depcache)
+                fixer.clear(self._pkg)
+                fixer.protect(self._pkg)
+                fixer.resolve(True)
         self._pcache.cache_post_change()
 
     def mark_upgrade(self, from_user: bool = True) -> None:
@@ -24,17 +24,28 @@ used as dummy progress classes which simply do nothing.
 """
 from __future__ import annotations
 
+import asyncio
 import errno
 import fcntl
 import io
+import json
 import os
 import re
 import select
 import sys
+import time
+from collections.abc import Callable
+from typing import Any
 
 import apt_pkg
 
-__all__ = ["AcquireProgress", "CdromProgress", "InstallProgress", "OpProgress"]
+__all__ = [
+    "AcquireProgress",
+    "CdromProgress",
+    "InstallProgress",
+    "InstallTelemetry",
+    "OpProgress",
+]
 
 
 class AcquireProgress:
@@ -138,10 +149,166 @@ class CdromProgress:
         """
 
 
+class InstallTelemetry:
+    """Measure the time spent on each package and stage of an installation.
+
+    Assign an instance to :attr:`InstallProgress.telemetry` to record when
+    each package enters and leaves the stages 'unpack', 'configure',
+    'trigproc', 'remove' and 'purge', as reported on the status descriptor
+    of APT or dpkg. The time spent per package and stage is available from
+    :meth:`report` and :meth:`to_json`.
+
+    Stages reported by APT are recognized by their untranslated status
+    messages; with translated messages, the message itself, without the
+    package name, is used as the name of the stage.
+
+    The parameter *clock* is the function returning the current time in
+    seconds; it defaults to :func:`time.monotonic`.
+
+    .. versionadded:: 3.0
+    """
+
+    # Status messages of APT, as prefixes, and the stage they start; a
+    # stage of None ends the current stage of the package.
+    _PM_STAGES = (
+        ("Preparing to configure", "configure"),
+        ("Preparing for removal of", "remove"),
+        ("Preparing to completely remove", "purge"),
+        ("Preparing", "unpack"),
+        ("Unpacking", "unpack"),
+        ("Configuring", "configure"),
+        ("Processing triggers for", "trigproc"),
+        ("Running post-installation trigger", "trigproc"),
+        ("Removing", "remove"),
+        ("Completely removing", "purge"),
+        ("Installed", None),
+        ("Removed", None),
+        ("Completely removed", None),
+    )
+    # Stages of dpkg --status-fd processing lines
+    _DPKG_STAGES = {
+        "install": "unpack",
+        "upgrade": "unpack",
+        "configure": "configure",
+        "trigproc": "trigproc",
+        "remove": "remove",
+        "purge": "purge",
+    }
+    # dpkg states in which a package is at rest
+    _DPKG_FINAL_STATES = frozenset(
+        (
+            "config-files",
+            "installed",
+            "not-installed",
+            "triggers-awaited",
+            "triggers-pending",
+            "unpacked",
+        )
+    )
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._running: dict[str, tuple[str, float]] = {}
+        self._durations: dict[tuple[str, str], list[float]] = {}
+        self.start_time: float | None = None
+        self.end_time: float | None = None
+
+    def start(self, package: str, stage: str) -> None:
+        """Record that *package* entered *stage*, ending its current stage."""
+        now = self._clock()
+        if self.start_time is None:
+            self.start_time = now
+        running = self._running.get(package)
+        if running is not None and running[0] == stage:
+            return
+        self.end(package, now)
+        self._running[package] = (stage, now)
+
+    def end(self, package: str, now: float | None = None) -> None:
+        """Record that *package* left its current stage."""
+        if now is None:
+            now = self._clock()
+        running = self._running.pop(package, None)
+        if running is not None:
+            stage, started = running
+            self._durations.setdefault((package, stage), []).append(now - started)
+            self.end_time = now
+
+    def finish(self) -> None:
+        """End the current stages of all packages."""
+        now = self._clock()
+        for package in list(self._running):
+            self.end(package, now)
+
+    def pm_status(self, package: str, message: str) -> None:
+        """Handle a pmstatus line of APT with the given status *message*."""
+        if package == "dpkg-exec":
+            return
+        for prefix, stage in self._PM_STAGES:
+            if message.startswith(prefix):
+                break
+        else:
+            stage = " ".join(word for word in message.split() if package not in word)
+        if stage is None:
+            self.end(package)
+        else:
+            self.start(package, stage)
+
+    def processing(self, package: str, stage: str) -> None:
+        """Handle a processing line of dpkg for *stage*."""
+        self.start(package, self._DPKG_STAGES.get(stage, stage))
+
+    def dpkg_status(self, package: str, status: str) -> None:
+        """Handle a status line of dpkg with the new *status*."""
+        if status in self._DPKG_FINAL_STATES:
+            self.end(package)
+
+    def report(self) -> list[dict[str, Any]]:
+        """Return the time spent per package and stage.
+
+        Return a list of dictionaries with the keys 'package', 'stage',
+        'seconds' (the total time spent) and 'count' (how often the package
+        entered the stage), sorted by decreasing time.
+        """
+        entries = [
+            {
+                "package": package,
+                "stage": stage,
+                "seconds": sum(times),
+                "count": len(times),
+            }
+            for (package, stage), times in self._durations.items()
+        ]
+        entries.sort(key=lambda entry: (-entry["seconds"], entry["package"]))
+        return entries
+
+    def to_json(self, **kwargs: Any) -> str:
+        """Return the report as a JSON document.
+
+        The document is an object with the total wall time of the
+        installation in 'seconds', the time spent per package and stage in
+        'packages' and the entries of :meth:`report` in 'stages'. Keyword
+        arguments are passed to :func:`json.dumps`.
+        """
+        report = self.report()
+        packages: dict[str, dict[str, float]] = {}
+        for entry in report:
+            stages = packages.setdefault(entry["package"], {})
+            stages[entry["stage"]] = entry["seconds"]
+        seconds = 0.0
+        if self.start_time is not None and self.end_time is not None:
+            seconds = self.end_time - self.start_time
+        return json.dumps(
+            {"seconds": seconds, "packages": packages, "stages": report}, **kwargs
+        )
+
+
 class InstallProgress:
     """Class to report the progress of installing packages."""
 
     child_pid, percent, select_timeout, status = 0, 0.0, 0.1, ""
+    #: An optional :class:`InstallTelemetry` object timing the stages
+    telemetry: InstallTelemetry | None = None
 
     def __init__(self) -> None:
         (self.statusfd, self.writefd) = os.pipe()
@@ -149,6 +316,8 @@ class InstallProgress:
         self.write_stream: io.TextIOBase = os.fdopen(self.writefd, "w")
         self.status_stream: io.TextIOBase = os.fdopen(self.statusfd, "r")  # noqa
         fcntl.fcntl(self.statusfd, fcntl.F_SETFL, os.O_NONBLOCK)
+        # Incomplete status line read from statusfd
+        self._status_buffer = b""
 
     def start_update(self) -> None:
         """(Abstract) Start update."""
@@ -195,6 +364,24 @@ class InstallProgress:
         the exit status of dpkg. In both cases, 0 means that there were no
         problems.
         """
+        self.child_pid = self._start_child(obj)
+        res = self.wait_child()
+        return os.WEXITSTATUS(res)
+
+    async def run_async(self, obj: apt_pkg.PackageManager | bytes | str) -> int:
+        """Install using the object 'obj', without blocking the event loop.
+
+        This is the same as run(), but waits for the child process with
+        wait_child_async() in the running asyncio event loop.
+
+        .. versionadded:: 3.0
+        """
+        self.child_pid = self._start_child(obj)
+        res = await self.wait_child_async()
+        return os.WEXITSTATUS(res)
+
+    def _start_child(self, obj: apt_pkg.PackageManager | bytes | str) -> int:
+        """Fork the child running the install actions and return its pid."""
         pid = self.fork()
         if pid == 0:
             try:
@@ -227,24 +414,40 @@ class InstallProgress:
                 sys.stderr.write("%s\n" % e)
                 os._exit(apt_pkg.PackageManager.RESULT_FAILED)
 
-        self.child_pid = pid
-        res = self.wait_child()
-        return os.WEXITSTATUS(res)
+        return pid
 
     def fork(self) -> int:
         """Fork."""
         return os.fork()
 
     def update_interface(self) -> None:
-        """Update the interface."""
-        try:
-            line = self.status_stream.readline()
-        except OSError as err:
-            # resource temporarly unavailable is ignored
-            if err.errno != errno.EAGAIN and err.errno != errno.EWOULDBLOCK:
-                print(err.strerror)
-            return
+        """Update the interface.
 
+        All status lines available on statusfd are read and parsed in one
+        go; an incomplete last line is kept for the next call.
+        """
+        chunks = [self._status_buffer]
+        while True:
+            try:
+                chunk = os.read(self.statusfd, 65536)
+            except OSError as err:
+                # resource temporarly unavailable is ignored
+                if err.errno != errno.EAGAIN and err.errno != errno.EWOULDBLOCK:
+                    print(err.strerror)
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+        data = b"".join(chunks)
+        end = data.rfind(b"\n") + 1
+        self._status_buffer = data[end:]
+        if end:
+            for line in data[:end].decode("utf-8", "replace").splitlines():
+                self._parse_status_line(line)
+
+    def _parse_status_line(self, line: str) -> None:
+        """Parse a status line from APT or dpkg and call the callbacks."""
         pkgname = status = status_str = percent = base = ""
 
         if line.startswith("pm"):
@@ -257,10 +460,18 @@ class InstallProgress:
             try:
                 (base, pkgname, status, status_str) = line.split(":", 3)
             except ValueError:
-                (base, pkgname, status) = line.split(":", 2)
+                try:
+                    (base, pkgname, status) = line.split(":", 2)
+                except ValueError:
+                    return
         elif line.startswith("processing"):
-            (status, status_str, pkgname) = line.split(":", 2)
+            try:
+                (status, status_str, pkgname) = line.split(":", 2)
+            except ValueError:
+                return
             self.processing(pkgname.strip(), status_str.strip())
+            if self.telemetry is not None:
+                self.telemetry.processing(pkgname.strip(), status_str.strip())
 
         # Always strip the status message
         pkgname = pkgname.strip()
@@ -274,6 +485,8 @@ class InstallProgress:
             if match:
                 self.conffile(match.group(1), match.group(2))
         elif status == "pmstatus":
+            if self.telemetry is not None:
+                self.telemetry.pm_status(pkgname, status_str)
             # FIXME: Float comparison
             if float(percent) != self.percent or status_str != self.status:
                 self.status_change(pkgname, float(percent), status_str.strip())
@@ -281,6 +494,23 @@ class InstallProgress:
                 self.status = status_str.strip()
         elif base == "status":
             self.dpkg_status_change(pkgname, status)
+            if self.telemetry is not None:
+                self.telemetry.dpkg_status(pkgname, status)
+
+    def _open_pidfd(self) -> int | None:
+        """Return a pidfd for the child, or None if not supported."""
+        try:
+            return os.pidfd_open(self.child_pid)
+        except (AttributeError, OSError):
+            return None
+
+    def _reap_child(self) -> tuple[bool, int]:
+        """Return whether the child exited, and its status."""
+        try:
+            (pid, res) = os.waitpid(self.child_pid, os.WNOHANG)
+        except ChildProcessError:
+            return True, 0
+        return pid == self.child_pid, res
 
     def wait_child(self) -> int:
         """Wait for child progress to exit.
@@ -288,27 +518,70 @@ class InstallProgress:
         This method is responsible for calling update_interface() from time to
         time. It exits once the child has exited. The return values is the
         full status returned from os.waitpid() (not only the return code).
+
+        It wakes up as soon as status lines are available or the child
+        exited, using a pidfd where supported, and at least every
+        select_timeout seconds.
         """
-        (pid, res) = (0, 0)
-        while True:
-            try:
-                select.select([self.status_stream], [], [], self.select_timeout)
-            except OSError as error:
-                (errno_, _errstr) = error.args
-                if errno_ != errno.EINTR:
-                    raise
+        pidfd = self._open_pidfd()
+        fds = [self.statusfd] if pidfd is None else [self.statusfd, pidfd]
+        try:
+            while True:
+                select.select(fds, [], [], self.select_timeout)
+                self.update_interface()
+                exited, res = self._reap_child()
+                if exited:
+                    break
+        finally:
+            if pidfd is not None:
+                os.close(pidfd)
+
+        # Read the status lines written just before the exit
+        self.update_interface()
+        if self.telemetry is not None:
+            self.telemetry.finish()
+        return res
+
+    async def wait_child_async(self) -> int:
+        """Wait for child progress to exit, without blocking the event loop.
+
+        This is the asyncio variant of wait_child(). Status lines are
+        handled as soon as they are available by calling update_interface()
+        from the running event loop, which also calls it at least every
+        select_timeout seconds.
+
+        .. versionadded:: 3.0
+        """
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
 
+        def on_status() -> None:
             self.update_interface()
-            try:
-                (pid, res) = os.waitpid(self.child_pid, os.WNOHANG)
-                if pid == self.child_pid:
-                    break
-            except OSError as err:
-                if err.errno == errno.ECHILD:
-                    break
-                if err.errno != errno.EINTR:
-                    raise
+            wakeup.set()
 
+        pidfd = self._open_pidfd()
+        try:
+            loop.add_reader(self.statusfd, on_status)
+            if pidfd is not None:
+                loop.add_reader(pidfd, wakeup.set)
+            while True:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.select_timeout)
+                except asyncio.TimeoutError:
+                    self.update_interface()
+                wakeup.clear()
+                exited, res = self._reap_child()
+                if exited:
+                    break
+        finally:
+            loop.remove_reader(self.statusfd)
+            if pidfd is not None:
+                loop.remove_reader(pidfd)
+                os.close(pidfd)
+
+        self.update_interface()
+        if self.telemetry is not None:
+            self.telemetry.finish()
         return res
 
 
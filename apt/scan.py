@@ -0,0 +1,268 @@
+# scan.py - analyze the package caches of many root directories
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+"""Analyze the package caches of many root directories in parallel.
+
+:func:`scan_roots` opens the cache of each root directory, like a chroot
+or the unpacked file system of a container image, in a pool of worker
+processes and yields the result of a query on it as soon as it is
+available::
+
+    for result in apt.scan_roots(rootdirs, workers=8, query="upgradable"):
+        print(result.rootdir, result.result or result.error)
+
+Root directories whose package lists have identical content share the
+caches built from them through an :class:`apt.indexstore.IndexStore`, so
+the lists are only parsed once.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import contextlib
+import os
+import tempfile
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from typing import Any
+
+import apt_pkg
+
+import apt.cache
+from apt.indexstore import IndexStore
+
+__all__ = ["QUERIES", "ScanResult", "scan_roots"]
+
+
+class ScanResult:
+    """The result of scanning one root directory.
+
+    The attribute :attr:`rootdir` is the root directory as passed to
+    :func:`scan_roots`. If the query succeeded, :attr:`result` is its return
+    value and :attr:`error` is ``None``; otherwise :attr:`error` is the
+    exception raised while opening the cache or running the query.
+
+    .. versionadded:: 3.0
+    """
+
+    __slots__ = ("rootdir", "result", "error")
+
+    def __init__(
+        self, rootdir: str, result: Any = None, error: BaseException | None = None
+    ) -> None:
+        self.rootdir = rootdir
+        self.result = result
+        self.error = error
+
+    def __repr__(self) -> str:
+        if self.error is not None:
+            return f"<ScanResult {self.rootdir!r} error={self.error!r}>"
+        return f"<ScanResult {self.rootdir!r} result={self.result!r}>"
+
+
+def _installed(cache: apt.cache.Cache) -> list[tuple[str, str, str]]:
+    """Return (name, architecture, version) of the installed packages."""
+    return [
+        (pkg.name, pkg.architecture, pkg.current_ver.ver_str)
+        for pkg in cache._cache.packages
+        if pkg.current_ver
+    ]
+
+
+def _upgrades(
+    cache: apt.cache.Cache, security_only: bool = False
+) -> list[tuple[str, str, str, str]]:
+    depcache = cache._depcache
+    upgrades = []
+    for pkg in cache._cache.packages:
+        if not pkg.current_ver or not depcache.is_upgradable(pkg):
+            continue
+        cand = depcache.get_candidate_ver(pkg)
+        if security_only and not cand.is_security_update:
+            continue
+        upgrades.append(
+            (pkg.name, pkg.architecture, pkg.current_ver.ver_str, cand.ver_str)
+        )
+    return upgrades
+
+
+def _upgradable(cache: apt.cache.Cache) -> list[tuple[str, str, str, str]]:
+    """Return (name, architecture, installed, candidate) of upgradable packages."""
+    return _upgrades(cache)
+
+
+def _security(cache: apt.cache.Cache) -> list[tuple[str, str, str, str]]:
+    """Return the upgradable packages whose candidate is a security update."""
+    return _upgrades(cache, security_only=True)
+
+
+#: The queries :func:`scan_roots` accepts by name.
+QUERIES: dict[str, Callable[[apt.cache.Cache], Any]] = {
+    "installed": _installed,
+    "security": _security,
+    "upgradable": _upgradable,
+}
+
+
+def _lists_signature(lists_dir: str) -> tuple[tuple[str, int], ...] | None:
+    """Return the names and sizes of the files in *lists_dir*.
+
+    Root directories with the same signature probably have identical lists;
+    it is only used to schedule them, the store compares the contents.
+    """
+    try:
+        with os.scandir(lists_dir) as entries:
+            return tuple(
+                sorted(
+                    (entry.name, entry.stat().st_size)
+                    for entry in entries
+                    if entry.name != "lock" and entry.is_file()
+                )
+            )
+    except OSError:
+        return None
+
+
+def _scan_root(
+    rootdir: str,
+    store: str,
+    query: str | Callable[[apt.cache.Cache], Any],
+    options: Mapping[str, str],
+) -> Any:
+    """Open the cache of *rootdir* from *store* and return the query result.
+
+    This runs in the worker processes.
+    """
+    config = apt_pkg.Configuration()
+    apt_pkg.init_config(config)
+    for key, value in options.items():
+        config.set(key, value)
+    cache = apt.cache.Cache(
+        rootdir=rootdir, memonly=True, config=config, index_store=IndexStore(store)
+    )
+    try:
+        func = QUERIES[query] if isinstance(query, str) else query
+        return func(cache)
+    finally:
+        cache.close()
+
+
+def scan_roots(
+    rootdirs: Iterable[str],
+    workers: int | None = None,
+    query: str | Callable[[apt.cache.Cache], Any] = "upgradable",
+    options: Mapping[str, str] | None = None,
+    executor: concurrent.futures.Executor | None = None,
+    cachedir: str | None = None,
+) -> Iterator[ScanResult]:
+    """Run *query* on the package caches of *rootdirs* in parallel.
+
+    Each root directory is opened as ``apt.Cache(rootdir=rootdir,
+    memonly=True)`` with a configuration of its own, in a pool of *workers*
+    processes (by default, one per CPU), or in the given *executor*. For
+    each root directory, a :class:`ScanResult` is yielded as soon as the
+    query finished, so the results do not come in the order of *rootdirs*.
+
+    The parameter *query* is the name of one of the built-in queries, or a
+    function taking an :class:`apt.Cache` and returning a picklable result.
+    The built-in queries are:
+
+    ``"installed"``
+        a list of (name, architecture, version) tuples of the installed
+        packages;
+
+    ``"upgradable"``
+        a list of (name, architecture, installed version, candidate
+        version) tuples of the upgradable packages;
+
+    ``"security"``
+        the same for the upgradable packages whose candidate is a security
+        update.
+
+    The configuration options in *options*, like ``APT::Architecture``,
+    are set for each root directory before its configuration files are
+    read.
+
+    The caches are generated in an :class:`apt.indexstore.IndexStore` in
+    *cachedir*, or in a temporary directory removed once the scan is
+    finished, so root directories with identical lists, and possibly
+    identical status files, reuse the caches generated for the first of
+    them. Root directories which seem to have the same lists are scanned
+    after the first of them finished, so that they can do so.
+
+    .. versionadded:: 3.0
+    """
+    rootdirs = list(rootdirs)
+    if isinstance(query, str) and query not in QUERIES:
+        raise ValueError(f"Unknown query: {query!r}")
+
+    # Group the root directories by their lists; the first root of a
+    # group is scanned before the others.
+    groups: list[list[str]] = []
+    by_signature: dict[tuple[tuple[str, int], ...], list[str]] = {}
+    for rootdir in rootdirs:
+        signature = _lists_signature(os.path.join(rootdir, "var/lib/apt/lists"))
+        if signature is None:
+            groups.append([rootdir])
+        elif signature in by_signature:
+            by_signature[signature].append(rootdir)
+        else:
+            by_signature[signature] = [rootdir]
+            groups.append(by_signature[signature])
+
+    return _scan(groups, workers, query, dict(options or {}), executor, cachedir)
+
+
+def _scan(
+    groups: list[list[str]],
+    workers: int | None,
+    query: str | Callable[[apt.cache.Cache], Any],
+    options: dict[str, str],
+    executor: concurrent.futures.Executor | None,
+    cachedir: str | None,
+) -> Iterator[ScanResult]:
+    pending: dict[concurrent.futures.Future[Any], tuple[str, list[str]]] = {}
+    with contextlib.ExitStack() as stack:
+        if cachedir is None:
+            cachedir = stack.enter_context(
+                tempfile.TemporaryDirectory(prefix="apt-scan-")
+            )
+        if executor is None:
+            executor = stack.enter_context(
+                concurrent.futures.ProcessPoolExecutor(workers)
+            )
+
+        def submit(rootdir: str, followers: list[str]) -> None:
+            future = executor.submit(_scan_root, rootdir, cachedir, query, options)
+            pending[future] = (rootdir, followers)
+
+        try:
+            for group in groups:
+                submit(group[0], group[1:])
+            while pending:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    rootdir, followers = pending.pop(future)
+                    # The caches of the group are in the store now
+                    for follower in followers:
+                        submit(follower, [])
+                    try:
+                        yield ScanResult(rootdir, future.result())
+                    except Exception as error:
+                        yield ScanResult(rootdir, error=error)
+        finally:
+            for future in pending:
+                future.cancel()
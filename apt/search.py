@@ -0,0 +1,330 @@
+# search.py - full-text search over package names and descriptions
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+"""Full-text search over the names and descriptions of packages.
+
+Searching the descriptions through :class:`apt.Cache` means looking up
+the record of every package. The :class:`SearchIndex` class instead reads
+the package lists, translation files and dpkg status file sequentially
+once, and keeps an inverted index from words to the packages whose name,
+summary or long description contain them. The index is stored on disk and
+only rebuilt when one of the files changed.
+"""
+from __future__ import annotations
+
+import math
+import os
+import re
+import tempfile
+from collections.abc import Iterable, Sequence
+
+import apt_pkg
+
+__all__ = ["FIELDS", "SearchIndex", "tokenize"]
+
+_MAGIC = "python-apt search index 1\n"
+
+#: The fields :meth:`SearchIndex.search` can search, with their bits in
+#: the index.
+FIELDS = {"name": 1, "summary": 2, "description": 4}
+
+# The weight of a match in each field for the ranking
+_WEIGHTS = {1: 4.0, 2: 2.0, 4: 1.0}
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9+.-]*")
+_SEPARATORS = re.compile(r"[+.-]+")
+
+
+def tokenize(text: str) -> set[str]:
+    """Return the words of *text* as they are indexed.
+
+    Words are lowercased. Words joined by '-', '.' or '+' are indexed both
+    as a whole and as their parts, so that 'python3-apt' is found by
+    'python3-apt', 'python3' and 'apt'.
+    """
+    tokens = set()
+    for word in _WORD.findall(text.lower()):
+        word = word.rstrip(".-")
+        tokens.add(word)
+        parts = _SEPARATORS.split(word)
+        if len(parts) > 1:
+            tokens.update(part for part in parts if part)
+    return tokens
+
+
+class SearchIndex:
+    """An inverted index of the names, summaries and descriptions of packages.
+
+    The parameter *files* lists the index files to read: package lists,
+    translation files, and the dpkg status file. Descriptions only given
+    by their MD5 sum in a package list are taken from the translation
+    files, from the first of them that has them. Packages of other
+    architectures than *architecture*, by default ``APT::Architecture``,
+    are indexed with an architecture qualifier, like ``libc6:i386``.
+
+    The parameter *path* is the file the index is stored in. It defaults
+    to the file set in ``Dir::Cache::searchindex``, or ``searchindex.bin``
+    in ``Dir::Cache``. If the file cannot be written, the index is only kept
+    in memory.
+
+    The index is loaded on first use, and rebuilt if the modification time
+    or size of one of the files differs from the time it was built.
+
+    .. versionadded:: 3.0
+    """
+
+    def __init__(
+        self,
+        files: Iterable[str],
+        path: str | None = None,
+        architecture: str | None = None,
+    ) -> None:
+        if path is None:
+            path = apt_pkg.config.find_file("Dir::Cache::searchindex") or (
+                os.path.join(apt_pkg.config.find_dir("Dir::Cache"), "searchindex.bin")
+            )
+        if architecture is None:
+            architecture = apt_pkg.config.find("APT::Architecture")
+        # Keep the order, which chooses between translations
+        self.files = list(dict.fromkeys(files))
+        self.path = path
+        self.architecture = architecture
+        self._loaded = False
+        self._stamps: list[tuple[int, int, str]] = []
+        self._names: list[str] = []
+        # The postings of each token, as (package id, field bits) pairs; they
+        # are only parsed from their stored form when they are looked up.
+        self._postings: dict[str, str | list[tuple[int, int]]] = {}
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._names)
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self._load()
+            self._loaded = True
+            if self.refresh():
+                self.save()
+
+    def _current_stamps(self) -> list[tuple[int, int, str]]:
+        stamps = []
+        for path in self.files:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stamps.append((st.st_mtime_ns, st.st_size, path))
+        return stamps
+
+    def _load(self) -> None:
+        """Read the index from disk, leaving it empty on errors."""
+        try:
+            with open(self.path, encoding="utf-8", errors="surrogateescape") as fobj:
+                if fobj.readline() != _MAGIC:
+                    return
+                stamps = []
+                for _ in range(int(fobj.readline())):
+                    mtime, size, path = fobj.readline().rstrip("\n").split(" ", 2)
+                    stamps.append((int(mtime), int(size), path))
+                names = [
+                    fobj.readline().rstrip("\n") for _ in range(int(fobj.readline()))
+                ]
+                postings: dict[str, str | list[tuple[int, int]]] = {}
+                for line in fobj:
+                    token, _, ids = line.rstrip("\n").partition("\t")
+                    postings[token] = ids
+        except (OSError, ValueError):
+            return
+
+        self._stamps = stamps
+        self._names = names
+        self._postings = postings
+
+    def save(self) -> bool:
+        """Write the index to disk.
+
+        Return ``False`` if the index file could not be written.
+        """
+        self._ensure_loaded()
+        directory = os.path.dirname(self.path) or "."
+        try:
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".searchindex")
+        except OSError:
+            return False
+        try:
+            with open(fd, "w", encoding="utf-8", errors="surrogateescape") as fobj:
+                fobj.write(_MAGIC)
+                fobj.write("%d\n" % len(self._stamps))
+                for mtime, size, path in self._stamps:
+                    fobj.write(f"{mtime} {size} {path}\n")
+                fobj.write("%d\n" % len(self._names))
+                for name in self._names:
+                    fobj.write(name + "\n")
+                for token in sorted(self._postings):
+                    fobj.write(f"{token}\t{self._stored(token)}\n")
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.path)
+        except OSError:
+            os.unlink(tmp)
+            return False
+        return True
+
+    def _stored(self, token: str) -> str:
+        postings = self._postings[token]
+        if isinstance(postings, str):
+            return postings
+        return ",".join(f"{pkg}:{bits}" for pkg, bits in postings)
+
+    def _get(self, token: str) -> list[tuple[int, int]]:
+        postings = self._postings.get(token, [])
+        if isinstance(postings, str):
+            items = (item.partition(":") for item in postings.split(","))
+            postings = [(int(pkg), int(bits)) for pkg, _, bits in items]
+            self._postings[token] = postings
+        return postings
+
+    def refresh(self) -> bool:
+        """Rebuild the index if the files changed since it was built.
+
+        Return ``True`` if the index was rebuilt. Call :meth:`save` to
+        store the rebuilt index on disk.
+        """
+        if not self._loaded:
+            self._load()
+            self._loaded = True
+        stamps = self._current_stamps()
+        if stamps == self._stamps:
+            return False
+        self._build(stamps)
+        return True
+
+    def _build(self, stamps: list[tuple[int, int, str]]) -> None:
+        descriptions: dict[str, set[str]] = {}
+        md5sums: dict[str, set[str]] = {}
+        translations: dict[str, str] = {}
+        for _mtime, _size, path in stamps:
+            try:
+                with apt_pkg.TagFile(path) as tagfile:
+                    for section in tagfile:
+                        self._read_section(section, descriptions, md5sums, translations)
+            except (OSError, SystemError):
+                continue
+
+        for name, sums in md5sums.items():
+            for md5 in sums:
+                if md5 in translations:
+                    descriptions[name].add(translations[md5])
+
+        names = sorted(descriptions)
+        index: dict[str, dict[int, int]] = {}
+        for pkg, name in enumerate(names):
+            bits: dict[str, int] = {}
+            for token in tokenize(name):
+                bits[token] = FIELDS["name"]
+            for description in descriptions[name]:
+                summary, _, long_description = description.partition("\n")
+                for token in tokenize(summary):
+                    bits[token] = bits.get(token, 0) | FIELDS["summary"]
+                for token in tokenize(long_description):
+                    bits[token] = bits.get(token, 0) | FIELDS["description"]
+            for token, value in bits.items():
+                index.setdefault(token, {})[pkg] = value
+
+        self._stamps = stamps
+        self._names = names
+        self._postings = {
+            token: sorted(postings.items()) for token, postings in index.items()
+        }
+
+    def _read_section(
+        self,
+        section: apt_pkg.TagSection[str],
+        descriptions: dict[str, set[str]],
+        md5sums: dict[str, set[str]],
+        translations: dict[str, str],
+    ) -> None:
+        name = section.get("Package")
+        if not name:
+            return
+        description = section.get("Description")
+        if description is None:
+            for key in section.keys():
+                if key.startswith("Description-") and key != "Description-md5":
+                    description = section[key]
+                    break
+        md5 = section.get("Description-md5")
+        if "Version" not in section:
+            # A stanza of a translation file
+            if md5 and description is not None:
+                translations.setdefault(md5, description)
+            return
+
+        arch = section.get("Architecture", "all")
+        if arch not in ("all", self.architecture):
+            name = f"{name}:{arch}"
+        descriptions.setdefault(name, set())
+        if description is not None:
+            descriptions[name].add(description)
+        elif md5:
+            md5sums.setdefault(name, set()).add(md5)
+
+    def search(
+        self, query: str, fields: Sequence[str] = ("name", "summary", "description")
+    ) -> list[tuple[str, float]]:
+        """Return the packages matching all words of *query*.
+
+        Return a list of (name, score) pairs of the packages whose *fields*
+        contain all words of *query*, best matches first. Matches in the
+        name weigh more than in the summary, which weigh more than in the
+        long description, and rare words more than common ones; packages
+        named like one of the words come first.
+
+        Raise :class:`ValueError` for unknown fields.
+        """
+        mask = 0
+        for field in fields:
+            if field not in FIELDS:
+                raise ValueError("Unknown search field: %r" % field)
+            mask |= FIELDS[field]
+
+        self._ensure_loaded()
+        scores: dict[int, float] | None = None
+        for token in sorted(tokenize(query)):
+            postings = self._get(token)
+            if not postings:
+                return []
+            idf = math.log(1 + len(self._names) / len(postings))
+            matches = {}
+            for pkg, bits in postings:
+                bits &= mask
+                if bits and (scores is None or pkg in scores):
+                    weight = sum(w for bit, w in _WEIGHTS.items() if bits & bit)
+                    matches[pkg] = weight * idf + (scores or {}).get(pkg, 0.0)
+            if not matches:
+                return []
+            scores = matches
+        if scores is None:
+            return []
+
+        # Exact name matches come first
+        words = query.lower().split()
+        for pkg in scores:
+            if self._names[pkg].split(":")[0] in words:
+                scores[pkg] += 100.0
+        names = self._names
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], names[item[0]]))
+        return [(names[pkg], score) for pkg, score in ranked]
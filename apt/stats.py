@@ -0,0 +1,85 @@
+# stats.py - counters of the work done by apt and apt_pkg
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+#  USA
+"""Counters of the work done by apt and apt_pkg.
+
+The counters of :func:`apt_pkg.stats` tell where the time of a slow
+program goes: looking up package records, parsing tag files, creating
+objects, running progress callbacks or marking packages. This module adds
+the :class:`apt.package.Package` and :class:`apt.package.Version`
+wrappers created by the apt package::
+
+    apt.stats.enable()
+    cache = apt.Cache()
+    cache.upgrade()
+    print(apt.stats.stats())
+
+Collecting the counters is disabled by default, and costs little when
+enabled.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import apt_pkg
+
+__all__ = ["enable", "reset", "stats"]
+
+#: Whether the counters are collected, see :func:`enable`.
+enabled = False
+
+#: The counters of the apt package; use :func:`stats` to read them.
+counters = {"package_wrappers": 0, "version_wrappers": 0}
+
+
+def enable(enable: bool = True) -> bool:
+    """Start collecting the counters, or stop if *enable* is ``False``.
+
+    This also enables the counters of :func:`apt_pkg.stats`. Return whether
+    the counters were collected before.
+
+    .. versionadded:: 3.0
+    """
+    global enabled
+    previous = enabled
+    apt_pkg.enable_stats(enable)
+    enabled = enable
+    return previous
+
+
+def reset() -> None:
+    """Set all counters to zero, including those of :func:`apt_pkg.stats`.
+
+    .. versionadded:: 3.0
+    """
+    apt_pkg.reset_stats()
+    for key in counters:
+        counters[key] = 0
+
+
+def stats() -> dict[str, Any]:
+    """Return the counters of :func:`apt_pkg.stats` and of the apt package.
+
+    Besides the keys documented for :func:`apt_pkg.stats`, the dictionary
+    has the keys ``package_wrappers`` and ``version_wrappers``, the numbers
+    of :class:`apt.package.Package` and :class:`apt.package.Version`
+    objects created.
+
+    .. versionadded:: 3.0
+    """
+    result = apt_pkg.stats()
+    result.update(counters)
+    return result
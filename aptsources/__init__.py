@@ -1,6 +1,25 @@
+"""Work with the sources.list files of APT.
+
+The configuration and the package system are initialized when they are
+first needed, by :class:`aptsources.sourceslist.SourcesList`,
+:class:`aptsources.sourceslist.SourceEntry` or
+:class:`aptsources.distinfo.DistInfo`, instead of when the package is
+imported.
+"""
 import apt_pkg
 
-# init the package system, but do not re-initialize config
-if "APT" not in apt_pkg.config:
-    apt_pkg.init_config()
-apt_pkg.init_system()
+_initialized = False
+
+
+def _init() -> None:
+    """Initialize the configuration and the package system once.
+
+    The configuration is not re-initialized if it has already been.
+    """
+    global _initialized
+    if _initialized:
+        return
+    if "APT" not in apt_pkg.config:
+        apt_pkg.init_config()
+    apt_pkg.init_system()
+    _initialized = True
@@ -32,6 +32,8 @@ from typing import cast
 import apt_pkg
 from apt_pkg import gettext as _
 
+from . import _init
+
 
 def _expand_template(template: str, csv_path: str) -> Iterator[str]:
     """Expand the given template.
@@ -249,6 +251,7 @@ class DistInfo:
     ):
         self.metarelease_uri = ""
         self.templates: list[Template] = []
+        _init()
         self.arch = apt_pkg.config.find("APT::Architecture")
 
         location = None
@@ -37,7 +37,7 @@ from typing import Any, Generic, Optional, TypeVar, Union
 
 import apt_pkg
 
-from . import _deb822
+from . import _deb822, _init
 from .distinfo import DistInfo, Template
 
 # from apt_pkg import gettext as _
@@ -504,6 +504,7 @@ class SourceEntry:
         self.comment = ""  # (optional) comment
         self.line = line  # the original sources.list line
         if file is None:
+            _init()
             file = apt_pkg.config.find_file("Dir::Etc::sourcelist")
         if file.endswith(".sources"):
             raise ValueError("Classic SourceEntry cannot be written to .sources file")
@@ -712,6 +713,7 @@ class SourcesList:
         else:
             self.matcher = NullMatcher()
         self.deb822 = deb822
+        _init()
         self.refresh()
 
     def refresh(self) -> None:
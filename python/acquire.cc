@@ -344,11 +344,10 @@ static PyObject *PkgAcquireNew(PyTypeObject *type,PyObject *Args,PyObject *kwds)
     if (PyArg_ParseTupleAndKeywords(Args,kwds,"|O",kwlist,&pyFetchProgressInst) == 0)
         return 0;
 
-    PyFetchProgress *progress = 0;
+    pkgAcquireStatus *progress = 0;
     if (pyFetchProgressInst != NULL) {
         // FIXME: memleak?
-        progress = new PyFetchProgress();
-        progress->setCallbackInst(pyFetchProgressInst);
+        progress = PyFetchProgress_New(pyFetchProgressInst);
     }
 
     fetcher = new pkgAcquire();
@@ -356,8 +355,9 @@ static PyObject *PkgAcquireNew(PyTypeObject *type,PyObject *Args,PyObject *kwds)
 
     PyObject *FetcherObj = CppPyObject_NEW<pkgAcquire*>(NULL, type, fetcher);
 
-    if (progress != 0)
-        progress->setPyAcquire(FetcherObj);
+    PyFetchProgress *pyProgress = dynamic_cast<PyFetchProgress*>(progress);
+    if (pyProgress != 0)
+        pyProgress->setPyAcquire(FetcherObj);
     // prepare our map of items.
     return HandleErrors(FetcherObj);
 }
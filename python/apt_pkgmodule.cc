@@ -26,6 +26,7 @@
 #include <apt-pkg/aptconfiguration.h>
 #include <apt-pkg/fileutl.h>
 #include <apt-pkg/gpgv.h>
+#include <apt-pkg/error.h>
 
 #include <sys/stat.h>
 #include <libintl.h>
@@ -472,11 +473,47 @@ static PyObject *GetArchitectures(PyObject *Self,PyObject *Args)
       PyList_Append(List, CppPyString(*I));
    }
 
+   return List;
+}
+									/*}}}*/
+// get_languages - return the list of languages				/*{{{*/
+// ---------------------------------------------------------------------
+static const char *doc_GetLanguages =
+    "get_languages() -> list\n\n"
+    "Return the codes of the languages translations are used for, as\n"
+    "configured in Acquire::Languages or taken from the environment, in\n"
+    "the order of preference. The list is computed for the current\n"
+    "configuration on each call.";
+static PyObject *GetLanguages(PyObject *Self,PyObject *Args)
+{
+   if (PyArg_ParseTuple(Args,"") == 0)
+      return 0;
+
+   std::vector<std::string> Langs = APT::Configuration::getLanguages(false, false);
+   PyObject *List = PyList_New(Langs.size());
+   if (List == 0)
+      return 0;
+   for (size_t I = 0; I < Langs.size(); I++)
+   {
+      PyObject *Lang = CppPyString(Langs[I]);
+      if (Lang == 0)
+      {
+	 Py_DECREF(List);
+	 return 0;
+      }
+      PyList_SET_ITEM(List, I, Lang);
+   }
    return List;
 }
 									/*}}}*/
 // init - 3 init functions						/*{{{*/
 // ---------------------------------------------------------------------
+// The Configuration object _config currently points to.
+static PyObject *ActiveConfig;
+// The configuration the package system and the architecture and language
+// lists of libapt were last initialized for by swap_config().
+static Configuration *SystemConfig;
+
 static char *doc_Init =
 "init()\n\n"
 "Shorthand for doing init_config() and init_system(). When working\n"
@@ -489,20 +526,23 @@ static PyObject *Init(PyObject *Self,PyObject *Args)
 
    pkgInitConfig(*_config);
    pkgInitSystem(*_config,_system);
+   SystemConfig = 0;
 
    Py_INCREF(Py_None);
    return HandleErrors(Py_None);
 }
 
 static char *doc_InitConfig =
-"init_config()\n\n"
-"Load the default configuration and the config file.";
+"init_config([configuration: apt_pkg.Configuration])\n\n"
+"Load the default configuration and the config file into the given\n"
+"configuration, or into apt_pkg.config.";
 static PyObject *InitConfig(PyObject *Self,PyObject *Args)
 {
-   if (PyArg_ParseTuple(Args,"") == 0)
+   PyObject *Cnf = 0;
+   if (PyArg_ParseTuple(Args,"|O!",&PyConfiguration_Type,&Cnf) == 0)
       return 0;
 
-   pkgInitConfig(*_config);
+   pkgInitConfig(Cnf ? *GetCpp<Configuration*>(Cnf) : *_config);
 
    Py_INCREF(Py_None);
    return HandleErrors(Py_None);
@@ -517,10 +557,58 @@ static PyObject *InitSystem(PyObject *Self,PyObject *Args)
       return 0;
 
    pkgInitSystem(*_config,_system);
+   // The lists are not refreshed here, leave that to swap_config()
+   SystemConfig = 0;
 
    Py_INCREF(Py_None);
    return HandleErrors(Py_None);
 }
+
+static char *doc_SwapConfig =
+"swap_config(configuration: apt_pkg.Configuration[, init_system: bool = False])"
+" -> apt_pkg.Configuration\n\n"
+"Make the given configuration the one used by all functions of apt_pkg\n"
+"and return the configuration used before. The object apt_pkg.config\n"
+"keeps referring to the initial configuration.\n\n"
+"If 'init_system' is True, also initialize the system for the\n"
+"configuration like init_system() and refresh the architectures and\n"
+"languages, unless that was the last configuration they were initialized\n"
+"for. This is needed before building caches or fetching files.\n\n"
+"The configuration is process-wide state; callers must ensure that no\n"
+"other thread uses apt_pkg until the previous configuration has been\n"
+"restored by passing the return value to swap_config() again.";
+static PyObject *SwapConfig(PyObject *Self,PyObject *Args,PyObject *kwds)
+{
+   PyObject *Obj;
+   char Init = 0;
+   char *kwlist[] = {"configuration", "init_system", 0};
+   if (PyArg_ParseTupleAndKeywords(Args,kwds,"O!|b",kwlist,
+				   &PyConfiguration_Type,&Obj,&Init) == 0)
+      return 0;
+
+   Configuration *Old = _config;
+   _config = GetCpp<Configuration*>(Obj);
+   if (Init && SystemConfig != _config) {
+      pkgInitSystem(*_config,_system);
+      // Refresh the lists libapt caches across calls
+      APT::Configuration::getArchitectures(false);
+      APT::Configuration::getLanguages(false,false);
+      APT::Configuration::getLanguages(true,false);
+      SystemConfig = _config;
+      if (_error->PendingError() == true) {
+	 // Keep using the old configuration, and initialize the system
+	 // again when it is needed next
+	 _config = Old;
+	 SystemConfig = 0;
+	 return HandleErrors();
+      }
+   }
+
+   PyObject *OldObj = ActiveConfig;
+   Py_INCREF(Obj);
+   ActiveConfig = Obj;
+   return OldObj;
+}
 									/*}}}*/
 // gpgv.cc:OpenMaybeClearSignedFile					/*{{{*/
 // ---------------------------------------------------------------------
@@ -646,6 +734,88 @@ static PyObject *PkgSystemIsLocked(PyObject *Self,PyObject *Args)
 }
 
 									/*}}}*/
+// Statistics								/*{{{*/
+// ---------------------------------------------------------------------
+static char *doc_Stats =
+"stats() -> dict\n\n"
+"Return the counters collected since they were last reset, while enabled\n"
+"by enable_stats(). The dictionary has the keys:\n\n"
+"- 'record_lookups' and 'record_bytes': the calls of\n"
+"  PackageRecords.lookup() and the size of the records looked up;\n"
+"- 'tag_sections' and 'tag_bytes': the sections read from TagFile\n"
+"  objects and their size;\n"
+"- 'progress_calls' and 'progress_time': the calls of the methods of\n"
+"  Python progress objects and the seconds spent in them;\n"
+"- 'marks': a dictionary of the calls of the DepCache methods\n"
+"  mark_install(), mark_delete(), mark_keep() and mark_auto(), with the\n"
+"  keys 'install', 'delete', 'keep' and 'auto';\n"
+"- 'allocations': a dictionary of the apt_pkg objects created, by type\n"
+"  name.\n\n"
+".. versionadded:: 3.0";
+static PyObject *Stats(PyObject *Self,PyObject *Args)
+{
+   if (PyArg_ParseTuple(Args,"") == 0)
+      return 0;
+
+   PyObject *Allocations = PyDict_New();
+   if (Allocations == 0)
+      return 0;
+   for (auto const &Count : PyAptStats.Allocations) {
+      PyObject *Value = PyLong_FromUnsignedLongLong(Count.second);
+      if (Value == 0 ||
+	  PyDict_SetItemString(Allocations, Count.first->tp_name, Value) == -1) {
+	 Py_XDECREF(Value);
+	 Py_DECREF(Allocations);
+	 return 0;
+      }
+      Py_DECREF(Value);
+   }
+
+   return Py_BuildValue("{s:K,s:K,s:K,s:K,s:K,s:d,s:{s:K,s:K,s:K,s:K},s:N}",
+			"record_lookups", PyAptStats.RecordLookups,
+			"record_bytes", PyAptStats.RecordBytes,
+			"tag_sections", PyAptStats.TagSections,
+			"tag_bytes", PyAptStats.TagBytes,
+			"progress_calls", PyAptStats.ProgressCalls,
+			"progress_time", PyAptStats.ProgressNanoseconds / 1e9,
+			"marks",
+			"install", PyAptStats.MarkInstall,
+			"delete", PyAptStats.MarkDelete,
+			"keep", PyAptStats.MarkKeep,
+			"auto", PyAptStats.MarkAuto,
+			"allocations", Allocations);
+}
+
+static char *doc_EnableStats =
+"enable_stats([enable: bool = True]) -> bool\n\n"
+"Start collecting the counters returned by stats(), or stop if 'enable'\n"
+"is False. Collecting them is disabled by default. Return whether they\n"
+"were collected before.\n\n"
+".. versionadded:: 3.0";
+static PyObject *EnableStats(PyObject *Self,PyObject *Args)
+{
+   char Enable = 1;
+   if (PyArg_ParseTuple(Args,"|b",&Enable) == 0)
+      return 0;
+
+   bool Previous = PyAptStats.Enabled;
+   PyAptStats.Enabled = Enable;
+   return PyBool_FromLong(Previous);
+}
+
+static char *doc_ResetStats =
+"reset_stats()\n\n"
+"Set all counters returned by stats() to zero.\n\n"
+".. versionadded:: 3.0";
+static PyObject *ResetStats(PyObject *Self,PyObject *Args)
+{
+   if (PyArg_ParseTuple(Args,"") == 0)
+      return 0;
+
+   PyAptStats.Reset();
+   Py_RETURN_NONE;
+}
+									/*}}}*/
 
 // initapt_pkg - Core Module Initialization				/*{{{*/
 // ---------------------------------------------------------------------
@@ -656,6 +826,7 @@ static PyMethodDef methods[] =
    {"init",Init,METH_VARARGS,doc_Init},
    {"init_config",InitConfig,METH_VARARGS,doc_InitConfig},
    {"init_system",InitSystem,METH_VARARGS,doc_InitSystem},
+   {"swap_config",(PyCFunction)SwapConfig,METH_VARARGS|METH_KEYWORDS,doc_SwapConfig},
 
    // Internationalization.
    {"gettext",py_gettext,METH_VARARGS,
@@ -699,6 +870,15 @@ static PyMethodDef methods[] =
 
    // multiarch
    {"get_architectures", GetArchitectures, METH_VARARGS, doc_GetArchitectures},
+   {"get_languages", GetLanguages, METH_VARARGS, doc_GetLanguages},
+
+   // Cache
+   {"cache_fingerprint",CacheFingerprintFile,METH_VARARGS,doc_CacheFingerprint},
+
+   // Statistics
+   {"stats",Stats,METH_VARARGS,doc_Stats},
+   {"enable_stats",EnableStats,METH_VARARGS,doc_EnableStats},
+   {"reset_stats",ResetStats,METH_VARARGS,doc_ResetStats},
 
    // Strings
    {"check_domain_list",StrCheckDomainList,METH_VARARGS,
@@ -914,6 +1094,8 @@ extern "C" void initapt_pkg()
    Config->Object = _config;
    // Global configuration, should never be deleted.
    Config->NoDelete = true;
+   Py_INCREF(Config);
+   ActiveConfig = Config;
    PyModule_AddObject(Module,"config",Config);
    PyModule_AddObject(Module,"Error",PyAptError);
    PyModule_AddObject(Module,"Warning",PyAptWarning);
@@ -931,6 +1113,7 @@ extern "C" void initapt_pkg()
    ADDTYPE(Module,"TagRemove",&PyTagRemove_Type);
    /* ============================ acquire.cc ============================ */
    ADDTYPE(Module,"Acquire",&PyAcquire_Type);
+   ADDTYPE(Module,"AcquireEventSink",&PyAcquireEventSink_Type);
    ADDTYPE(Module,"AcquireFile",&PyAcquireFile_Type);
    ADDTYPE(Module,"AcquireItem",&PyAcquireItem_Type); // NO __new__()
    ADDTYPE(Module,"AcquireWorker",&PyAcquireWorker_Type); // NO __new__()
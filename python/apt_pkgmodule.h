@@ -80,6 +80,8 @@ extern PyTypeObject PyPackageFile_Type;
 extern PyTypeObject PyDependency_Type;
 extern PyTypeObject PyDependencyList_Type;
 PyObject *TmpGetCache(PyObject *Self,PyObject *Args);
+extern char *doc_CacheFingerprint;
+PyObject *CacheFingerprintFile(PyObject *Self,PyObject *Args);
 
 // DepCache
 extern PyTypeObject PyDepCache_Type;
@@ -98,6 +100,7 @@ PyObject *GetCdrom(PyObject *Self,PyObject *Args);
 // acquire
 extern PyTypeObject PyAcquireItem_Type;
 extern PyTypeObject PyAcquire_Type;
+extern PyTypeObject PyAcquireEventSink_Type;
 extern PyTypeObject PyAcquireFile_Type;
 extern char *doc_GetPkgAcqFile;
 PyObject *GetAcquire(PyObject *Self,PyObject *Args);
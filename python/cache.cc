@@ -21,8 +21,17 @@
 #include <apt-pkg/sourcelist.h>
 #include <apt-pkg/algorithms.h>
 #include <apt-pkg/update.h>
+#include <apt-pkg/fileutl.h>
+#include <apt-pkg/mmap.h>
+#include <apt-pkg/policy.h>
 
 #include <Python.h>
+#include <algorithm>
+#include <map>
+#include <memory>
+#include <string>
+#include <unordered_map>
+#include <vector>
 #include "progress.h"
 
 class pkgSourceList;
@@ -152,19 +161,567 @@ static PyObject *PkgCacheUpdate(PyObject *Self,PyObject *Args)
             &PySourceList_Type, &pySourcesList, &pulseInterval) == 0)
       return 0;
 
-   PyFetchProgress progress;
-   progress.setCallbackInst(pyFetchProgressInst);
+   std::unique_ptr<pkgAcquireStatus> progress(
+      PyFetchProgress_New(pyFetchProgressInst));
    pkgSourceList *source = GetCpp<pkgSourceList*>(pySourcesList);
-   bool res = ListUpdate(progress, *source, pulseInterval);
+   bool res = ListUpdate(*progress, *source, pulseInterval);
 
    PyObject *PyRes = PyBool_FromLong(res);
    return HandleErrors(PyRes);
 }
 
 
+// Copy Vec into a bytearray and return a memoryview of unsigned ints on it.
+static PyObject *MakeUIntArray(const std::vector<unsigned int> &Vec)
+{
+   PyObject *Bytes = PyByteArray_FromStringAndSize((const char *)Vec.data(),
+						   Vec.size() * sizeof(unsigned int));
+   if (Bytes == 0)
+      return 0;
+   PyObject *View = PyMemoryView_FromObject(Bytes);
+   Py_DECREF(Bytes);
+   if (View == 0)
+      return 0;
+   PyObject *Res = PyObject_CallMethod(View, "cast", "s", "I");
+   Py_DECREF(View);
+   return Res;
+}
+
+// The versions of each package dependency_graph() and closure() look at
+enum VersionSelection { SelectCandidate, SelectInstalled, SelectAll };
+
+static bool ParseVersionSelection(const char *Which, VersionSelection &Mode)
+{
+   if (strcmp(Which, "candidate") == 0)
+      Mode = SelectCandidate;
+   else if (strcmp(Which, "installed") == 0)
+      Mode = SelectInstalled;
+   else if (strcmp(Which, "all") == 0)
+      Mode = SelectAll;
+   else {
+      PyErr_Format(PyExc_ValueError, "Unknown value for which: '%s'", Which);
+      return false;
+   }
+   return true;
+}
+
+// Return the (first) version of Pkg selected by Mode.
+static pkgCache::VerIterator FirstSelected(pkgDepCache *DepCache,
+					   pkgCache::PkgIterator const &Pkg,
+					   VersionSelection Mode)
+{
+   if (Mode == SelectCandidate)
+      return (*DepCache)[Pkg].CandidateVerIter(*DepCache);
+   else if (Mode == SelectInstalled)
+      return Pkg.CurrentVer();
+   return Pkg.VersionList();
+}
+
+static bool IsSelected(pkgDepCache *DepCache, pkgCache::VerIterator const &Ver,
+		       VersionSelection Mode)
+{
+   return Mode == SelectAll || FirstSelected(DepCache, Ver.ParentPkg(), Mode) == Ver;
+}
+
+static const unsigned NumDepTypes = sizeof(UntranslatedDepTypes) / sizeof(*UntranslatedDepTypes);
+
+// Set Types[T] for each name of a dependency type in PyTypes, or for
+// Depends and PreDepends if PyTypes is NULL.
+static bool ParseDepTypes(PyObject *PyTypes, std::vector<bool> &Types)
+{
+   Types.assign(NumDepTypes, false);
+   if (PyTypes == 0) {
+      Types[pkgCache::Dep::Depends] = true;
+      Types[pkgCache::Dep::PreDepends] = true;
+      return true;
+   }
+   PyObject *Seq = PySequence_Fast(PyTypes, "types must be a sequence of strings");
+   if (Seq == 0)
+      return false;
+   for (Py_ssize_t I = 0; I < PySequence_Fast_GET_SIZE(Seq); I++) {
+      const char *Name = PyObject_AsString(PySequence_Fast_GET_ITEM(Seq, I));
+      if (Name == 0) {
+	 Py_DECREF(Seq);
+	 return false;
+      }
+      unsigned T = 1;
+      while (T < NumDepTypes && strcmp(UntranslatedDepTypes[T], Name) != 0)
+	 T++;
+      if (T == NumDepTypes) {
+	 PyErr_Format(PyExc_ValueError, "Unknown dependency type: '%s'", Name);
+	 Py_DECREF(Seq);
+	 return false;
+      }
+      Types[T] = true;
+   }
+   Py_DECREF(Seq);
+   return true;
+}
+
+static const char *cache_dependency_graph_doc =
+    "dependency_graph(types: list[str] = ['Depends', 'PreDepends'],\n"
+    "                 which: str = 'candidate') -> dict\n\n"
+    "Return the dependency graph of the cache in compressed sparse row\n"
+    "form, built in a single pass over the cache. The rows are the\n"
+    "packages, indexed by their IDs; the edges of package P are those of\n"
+    "its candidate version in the DepCache if 'which' is 'candidate', of\n"
+    "its installed version if 'which' is 'installed', or of all its\n"
+    "versions if it is 'all'. Only dependencies whose type is in 'types'\n"
+    "are included.\n\n"
+    "The result is a dict. 'offsets' has package_count + 1 entries; the\n"
+    "edges of package P are the entries offsets[P] to offsets[P + 1] - 1\n"
+    "of the other arrays, which are:\n\n"
+    "  'targets': the ID of the target package;\n"
+    "  'or_groups': the number of the or-group of the edge; the\n"
+    "     alternatives of a dependency share it;\n"
+    "  'comp_types': the comparison operator, as stored in the cache\n"
+    "     (0: none, 1: '<=', 2: '>=', 3: '<<', 4: '>>', 5: '=', 6: '!=');\n"
+    "  'dep_types': the type of the dependency, like dep_type_enum;\n"
+    "  'versions': an index into 'version_strings', the list of required\n"
+    "     versions, whose first entry is '' for unversioned edges;\n"
+    "  'parent_versions': the ID of the version declaring the edge.\n\n"
+    "The arrays are memoryviews of unsigned ints over bytearrays, which\n"
+    "can be used without copying, e.g. by numpy.frombuffer().";
+static PyObject *PkgCacheDependencyGraph(PyObject *Self,PyObject *Args,PyObject *kwds)
+{
+   PyObject *PyTypes = 0;
+   const char *Which = "candidate";
+   char *kwlist[] = {"types", "which", 0};
+   if (PyArg_ParseTupleAndKeywords(Args, kwds, "|Os", kwlist,
+				   &PyTypes, &Which) == 0)
+      return 0;
+
+   VersionSelection Mode;
+   std::vector<bool> Types;
+   if (ParseVersionSelection(Which, Mode) == false ||
+       ParseDepTypes(PyTypes, Types) == false)
+      return 0;
+
+   pkgCache *Cache = GetCpp<pkgCache *>(Self);
+   PyObject *CacheFilePy = GetOwner<pkgCache*>(Self);
+   pkgCacheFile *CacheF = GetCpp<pkgCacheFile*>(CacheFilePy);
+   pkgDepCache *DepCache = (pkgDepCache *)(*CacheF);
+
+   std::vector<unsigned int> Offsets, Targets, OrGroups, CompTypes, DepTypes,
+			     Versions, ParentVersions;
+   std::vector<std::string> VersionStrings(1);
+
+   Py_BEGIN_ALLOW_THREADS
+   std::unordered_map<std::string, unsigned int> VersionIds;
+   std::vector<pkgCache::PkgIterator> Pkgs(Cache->HeaderP->PackageCount);
+   for (pkgCache::PkgIterator P = Cache->PkgBegin(); P.end() == false; ++P)
+      Pkgs[P->ID] = P;
+
+   unsigned int Groups = 0;
+   Offsets.reserve(Pkgs.size() + 1);
+   Offsets.push_back(0);
+   for (pkgCache::PkgIterator &P : Pkgs) {
+      for (pkgCache::VerIterator V = FirstSelected(DepCache, P, Mode);
+	   V.end() == false; ++V) {
+	 bool InGroup = false;
+	 for (pkgCache::DepIterator D = V.DependsList(); D.end() == false; ++D) {
+	    bool NewGroup = !InGroup;
+	    InGroup = (D->CompareOp & pkgCache::Dep::Or) != 0;
+	    if (D->Type >= NumDepTypes || Types[D->Type] == false)
+	       continue;
+	    if (NewGroup)
+	       Groups++;
+
+	    unsigned int Version = 0;
+	    if (D->Version != 0) {
+	       auto Inserted = VersionIds.emplace(D.TargetVer(), VersionStrings.size());
+	       if (Inserted.second)
+		  VersionStrings.push_back(D.TargetVer());
+	       Version = Inserted.first->second;
+	    }
+	    Targets.push_back(D.TargetPkg()->ID);
+	    OrGroups.push_back(Groups - 1);
+	    CompTypes.push_back(D->CompareOp & ~pkgCache::Dep::Or);
+	    DepTypes.push_back(D->Type);
+	    Versions.push_back(Version);
+	    ParentVersions.push_back(V->ID);
+	 }
+	 if (Mode != SelectAll)
+	    break;
+      }
+      Offsets.push_back(Targets.size());
+   }
+   Py_END_ALLOW_THREADS
+
+   const char *Names[] = {"offsets", "targets", "or_groups", "comp_types",
+			  "dep_types", "versions", "parent_versions"};
+   const std::vector<unsigned int> *Arrays[] = {&Offsets, &Targets, &OrGroups,
+						&CompTypes, &DepTypes, &Versions,
+						&ParentVersions};
+   PyObject *Result = PyDict_New();
+   if (Result == 0)
+      return 0;
+   for (size_t I = 0; I < sizeof(Arrays) / sizeof(*Arrays); I++) {
+      PyObject *Array = MakeUIntArray(*Arrays[I]);
+      if (Array == 0 || PyDict_SetItemString(Result, Names[I], Array) == -1) {
+	 Py_XDECREF(Array);
+	 Py_DECREF(Result);
+	 return 0;
+      }
+      Py_DECREF(Array);
+   }
+
+   PyObject *Strings = PyList_New(VersionStrings.size());
+   if (Strings == 0) {
+      Py_DECREF(Result);
+      return 0;
+   }
+   for (size_t I = 0; I < VersionStrings.size(); I++) {
+      PyObject *String = CppPyString(VersionStrings[I]);
+      if (String == 0) {
+	 Py_DECREF(Strings);
+	 Py_DECREF(Result);
+	 return 0;
+      }
+      PyList_SET_ITEM(Strings, I, String);
+   }
+   int Res = PyDict_SetItemString(Result, "version_strings", Strings);
+   Py_DECREF(Strings);
+   if (Res == -1) {
+      Py_DECREF(Result);
+      return 0;
+   }
+   return Result;
+}
+
+// The adjacency of the packages closure() follows, in compressed sparse row
+// form: the edges of package P are Targets[Offsets[P]] to
+// Targets[Offsets[P + 1] - 1].
+struct ClosureGraph {
+   std::vector<unsigned int> Offsets;
+   std::vector<unsigned int> Targets;
+};
+
+// The graphs built by closure() for each cache object, by the options they
+// were built for. They are kept until the cache object is deallocated, so a
+// graph is built once per cache open, not on every call.
+static std::unordered_map<PyObject *,
+			  std::map<unsigned long, std::shared_ptr<const ClosureGraph>>>
+   ClosureGraphs;
+
+static void PkgCacheDealloc(PyObject *Self)
+{
+   ClosureGraphs.erase(Self);
+   CppDeallocPtr<pkgCache *>(Self);
+}
+
+static std::shared_ptr<const ClosureGraph> BuildClosureGraph(
+   pkgCache *Cache, pkgDepCache *DepCache, std::vector<bool> const &Types,
+   VersionSelection Mode, bool FirstOnly, bool Reverse)
+{
+   std::vector<std::pair<unsigned int, unsigned int>> Edges;
+   auto AddEdge = [&](unsigned int From, unsigned int To) {
+      if (Reverse)
+	 Edges.emplace_back(To, From);
+      else
+	 Edges.emplace_back(From, To);
+   };
+   for (pkgCache::PkgIterator P = Cache->PkgBegin(); P.end() == false; ++P) {
+      for (pkgCache::VerIterator V = FirstSelected(DepCache, P, Mode);
+	   V.end() == false; ++V) {
+	 bool InGroup = false;
+	 for (pkgCache::DepIterator D = V.DependsList(); D.end() == false; ++D) {
+	    bool First = !InGroup;
+	    InGroup = (D->CompareOp & pkgCache::Dep::Or) != 0;
+	    if (D->Type >= NumDepTypes || Types[D->Type] == false ||
+		(FirstOnly && First == false))
+	       continue;
+
+	    pkgCache::PkgIterator Target = D.TargetPkg();
+	    AddEdge(P->ID, Target->ID);
+	    for (pkgCache::PrvIterator Prv = Target.ProvidesList();
+		 Prv.end() == false; ++Prv) {
+	       if (IsSelected(DepCache, Prv.OwnerVer(), Mode))
+		  AddEdge(P->ID, Prv.OwnerPkg()->ID);
+	    }
+	 }
+	 if (Mode != SelectAll)
+	    break;
+      }
+   }
+
+   // Sort the edges into rows by counting them per package
+   auto Graph = std::make_shared<ClosureGraph>();
+   const unsigned long PackageCount = Cache->HeaderP->PackageCount;
+   Graph->Offsets.assign(PackageCount + 1, 0);
+   for (auto const &Edge : Edges)
+      Graph->Offsets[Edge.first + 1]++;
+   for (unsigned long I = 0; I < PackageCount; I++)
+      Graph->Offsets[I + 1] += Graph->Offsets[I];
+   std::vector<unsigned int> Fill(Graph->Offsets.begin(), Graph->Offsets.end() - 1);
+   Graph->Targets.resize(Edges.size());
+   for (auto const &Edge : Edges)
+      Graph->Targets[Fill[Edge.first]++] = Edge.second;
+   return Graph;
+}
+
+static const char *cache_closure_doc =
+    "closure(packages: list[Package | int],\n"
+    "        types: list[str] = ['Depends', 'PreDepends'],\n"
+    "        which: str = 'candidate', or_policy: str = 'all',\n"
+    "        reverse: bool = False) -> set[int]\n\n"
+    "Return the IDs of the packages reachable from 'packages', given as\n"
+    "Package objects or IDs, including themselves, following the\n"
+    "dependencies whose type is in 'types' of the versions selected by\n"
+    "'which', as in dependency_graph(). A dependency on a virtual package\n"
+    "reaches the package and its providers whose provided version is\n"
+    "selected as well.\n\n"
+    "If 'or_policy' is 'all', all alternatives of a dependency are\n"
+    "followed; if it is 'first', only the first one is. If 'reverse' is\n"
+    "True, the dependencies are followed backwards, returning the\n"
+    "packages depending on 'packages' directly or indirectly.\n\n"
+    "The dependency graph for the given options is built on the first\n"
+    "call and reused by later calls on the same cache, until it is\n"
+    "dropped by clear_closures().";
+static PyObject *PkgCacheClosure(PyObject *Self,PyObject *Args,PyObject *kwds)
+{
+   PyObject *PyPackages;
+   PyObject *PyTypes = 0;
+   const char *Which = "candidate";
+   const char *OrPolicy = "all";
+   char Reverse = 0;
+   char *kwlist[] = {"packages", "types", "which", "or_policy", "reverse", 0};
+   if (PyArg_ParseTupleAndKeywords(Args, kwds, "O|Ossb", kwlist, &PyPackages,
+				   &PyTypes, &Which, &OrPolicy, &Reverse) == 0)
+      return 0;
+
+   VersionSelection Mode;
+   std::vector<bool> Types;
+   if (ParseVersionSelection(Which, Mode) == false ||
+       ParseDepTypes(PyTypes, Types) == false)
+      return 0;
+   bool FirstOnly;
+   if (strcmp(OrPolicy, "all") == 0)
+      FirstOnly = false;
+   else if (strcmp(OrPolicy, "first") == 0)
+      FirstOnly = true;
+   else {
+      PyErr_Format(PyExc_ValueError, "Unknown value for or_policy: '%s'", OrPolicy);
+      return 0;
+   }
+
+   pkgCache *Cache = GetCpp<pkgCache *>(Self);
+   PyObject *CacheFilePy = GetOwner<pkgCache*>(Self);
+   pkgCacheFile *CacheF = GetCpp<pkgCacheFile*>(CacheFilePy);
+   pkgDepCache *DepCache = (pkgDepCache *)(*CacheF);
+   const unsigned long PackageCount = Cache->HeaderP->PackageCount;
+
+   std::vector<unsigned int> Frontier;
+   PyObject *Seq = PySequence_Fast(PyPackages, "packages must be a sequence");
+   if (Seq == 0)
+      return 0;
+   for (Py_ssize_t I = 0; I < PySequence_Fast_GET_SIZE(Seq); I++) {
+      PyObject *Item = PySequence_Fast_GET_ITEM(Seq, I);
+      unsigned long Id;
+      if (PyObject_TypeCheck(Item, &PyPackage_Type))
+	 Id = GetCpp<pkgCache::PkgIterator>(Item)->ID;
+      else if ((Id = PyLong_AsUnsignedLong(Item)) == (unsigned long)-1 &&
+	       PyErr_Occurred()) {
+	 Py_DECREF(Seq);
+	 return 0;
+      }
+      if (Id >= PackageCount) {
+	 PyErr_Format(PyExc_IndexError, "Invalid package ID: %lu", Id);
+	 Py_DECREF(Seq);
+	 return 0;
+      }
+      Frontier.push_back(Id);
+   }
+   Py_DECREF(Seq);
+
+   unsigned long Key = 0;
+   for (unsigned T = 0; T < NumDepTypes; T++)
+      Key |= (unsigned long)Types[T] << T;
+   Key |= ((unsigned long)Mode << NumDepTypes) |
+	  ((unsigned long)FirstOnly << (NumDepTypes + 2)) |
+	  ((unsigned long)(Reverse != 0) << (NumDepTypes + 3));
+   std::shared_ptr<const ClosureGraph> Graph;
+   auto Graphs = ClosureGraphs.find(Self);
+   if (Graphs != ClosureGraphs.end()) {
+      auto Found = Graphs->second.find(Key);
+      if (Found != Graphs->second.end())
+	 Graph = Found->second;
+   }
+
+   std::vector<bool> Seen(PackageCount, false);
+   Py_BEGIN_ALLOW_THREADS
+   if (Graph == nullptr)
+      Graph = BuildClosureGraph(Cache, DepCache, Types, Mode, FirstOnly, Reverse);
+
+   // Breadth-first search, one frontier at a time
+   for (unsigned int Id : Frontier)
+      Seen[Id] = true;
+   std::vector<unsigned int> Next;
+   while (Frontier.empty() == false) {
+      Next.clear();
+      for (unsigned int Id : Frontier) {
+	 for (unsigned int E = Graph->Offsets[Id]; E < Graph->Offsets[Id + 1]; E++) {
+	    unsigned int To = Graph->Targets[E];
+	    if (Seen[To] == false) {
+	       Seen[To] = true;
+	       Next.push_back(To);
+	    }
+	 }
+      }
+      Frontier.swap(Next);
+   }
+   Py_END_ALLOW_THREADS
+   ClosureGraphs[Self].emplace(Key, Graph);
+
+   PyObject *Result = PySet_New(0);
+   if (Result == 0)
+      return 0;
+   for (unsigned long Id = 0; Id < PackageCount; Id++) {
+      if (Seen[Id] == false)
+	 continue;
+      PyObject *Obj = MkPyNumber(Id);
+      if (Obj == 0 || PySet_Add(Result, Obj) == -1) {
+	 Py_XDECREF(Obj);
+	 Py_DECREF(Result);
+	 return 0;
+      }
+      Py_DECREF(Obj);
+   }
+   return Result;
+}
+
+static const char *cache_clear_closures_doc =
+    "clear_closures([which: str])\n\n"
+    "Drop the dependency graphs built by closure(), or only those for the\n"
+    "versions selected by 'which', so the next call builds them again.\n"
+    "Call it after changing the candidates of the DepCache.";
+static PyObject *PkgCacheClearClosures(PyObject *Self,PyObject *Args,PyObject *kwds)
+{
+   const char *Which = 0;
+   char *kwlist[] = {"which", 0};
+   if (PyArg_ParseTupleAndKeywords(Args, kwds, "|s", kwlist, &Which) == 0)
+      return 0;
+
+   auto Graphs = ClosureGraphs.find(Self);
+   if (Which == 0) {
+      if (Graphs != ClosureGraphs.end())
+	 ClosureGraphs.erase(Graphs);
+      Py_RETURN_NONE;
+   }
+   VersionSelection Mode;
+   if (ParseVersionSelection(Which, Mode) == false)
+      return 0;
+   if (Graphs != ClosureGraphs.end()) {
+      auto &Map = Graphs->second;
+      for (auto I = Map.begin(); I != Map.end();) {
+	 // The selection is stored in the two bits after the types, see closure()
+	 if (((I->first >> NumDepTypes) & 3) == (unsigned long)Mode)
+	    I = Map.erase(I);
+	 else
+	    ++I;
+      }
+   }
+   Py_RETURN_NONE;
+}
+
+// Describe each real package of Cache on a line, sorted by name:
+// "name:arch\tcandidate\thash\tpriority\tinstalled", where hash is the
+// Hash of the candidate, which changes with its control data.
+static std::string CacheFingerprint(pkgCache &Cache, pkgPolicy &Policy)
+{
+   std::vector<std::string> Lines;
+   Lines.reserve(Cache.HeaderP->PackageCount);
+   for (pkgCache::PkgIterator P = Cache.PkgBegin(); P.end() == false; ++P) {
+      if (P.VersionList().end() == true)
+	 continue;
+      std::string Line = std::string(P.Name()) + ":" + P.Arch() + "\t";
+      pkgCache::VerIterator Cand = Policy.GetCandidateVer(P);
+      if (Cand.end() == false) {
+	 char Hash[16];
+	 snprintf(Hash, sizeof(Hash), "%x", (unsigned int)Cand->Hash);
+	 Line += std::string(Cand.VerStr()) + "\t" + Hash + "\t" +
+		 std::to_string(Policy.GetPriority(Cand));
+      } else {
+	 Line += "\t\t";
+      }
+      Line += "\t";
+      if (P.CurrentVer().end() == false)
+	 Line += P.CurrentVer().VerStr();
+      Lines.push_back(std::move(Line));
+   }
+   std::sort(Lines.begin(), Lines.end());
+
+   std::string Result = "apt-fingerprint 1\n";
+   for (const std::string &Line : Lines)
+      Result += Line + "\n";
+   return Result;
+}
+
+static const char *cache_fingerprint_doc =
+    "fingerprint() -> bytes\n\n"
+    "Return a fingerprint of the packages in the cache: for each package\n"
+    "with versions, sorted by name and architecture, a line with its\n"
+    "candidate version, the hash of the candidate, the pin priority of the\n"
+    "candidate and the installed version. Fingerprints can be saved and\n"
+    "compared with apt.cache_diff(). See also cache_fingerprint().";
+static PyObject *PkgCacheFingerprint(PyObject *Self,PyObject *Args)
+{
+   if (PyArg_ParseTuple(Args, "") == 0)
+      return 0;
+   pkgCache *Cache = GetCpp<pkgCache *>(Self);
+   PyObject *CacheFilePy = GetOwner<pkgCache*>(Self);
+   pkgCacheFile *CacheF = GetCpp<pkgCacheFile*>(CacheFilePy);
+   pkgDepCache *DepCache = (pkgDepCache *)(*CacheF);
+   pkgPolicy *Policy = (pkgPolicy *)&DepCache->GetPolicy();
+
+   std::string Result;
+   Py_BEGIN_ALLOW_THREADS
+   Result = CacheFingerprint(*Cache, *Policy);
+   Py_END_ALLOW_THREADS
+   return HandleErrors(PyBytes_FromStringAndSize(Result.data(), Result.size()));
+}
+
+char *doc_CacheFingerprint =
+    "cache_fingerprint(filename: str) -> bytes\n\n"
+    "Return the fingerprint of the package cache file 'filename', like\n"
+    "a pkgcache.bin saved before an update, as Cache.fingerprint() does.\n"
+    "The file is mapped as it is, without checking it against the package\n"
+    "lists; the candidates are chosen with the preferences configured\n"
+    "now. The file must have been written by the same version of APT.";
+PyObject *CacheFingerprintFile(PyObject *Self,PyObject *Args)
+{
+   PyApt_Filename Name;
+   if (PyArg_ParseTuple(Args, "O&", PyApt_Filename::Converter, &Name) == 0)
+      return 0;
+
+   std::string Result;
+   Py_BEGIN_ALLOW_THREADS
+   FileFd Fd(Name, FileFd::ReadOnly);
+   if (Fd.IsOpen() == true && _error->PendingError() == false) {
+      MMap Map(Fd, MMap::Public | MMap::ReadOnly);
+      pkgCache Cache(&Map);
+      if (_error->PendingError() == false) {
+	 pkgPolicy Policy(&Cache);
+	 if (ReadPinFile(Policy) == true && ReadPinDir(Policy) == true)
+	    Result = CacheFingerprint(Cache, Policy);
+      }
+   }
+   Py_END_ALLOW_THREADS
+   if (_error->PendingError() == true)
+      return HandleErrors();
+   return HandleErrors(PyBytes_FromStringAndSize(Result.data(), Result.size()));
+}
+
 static PyMethodDef PkgCacheMethods[] =
 {
    {"update",PkgCacheUpdate,METH_VARARGS,cache_update_doc},
+   {"closure",(PyCFunction)PkgCacheClosure,
+    METH_VARARGS|METH_KEYWORDS,cache_closure_doc},
+   {"clear_closures",(PyCFunction)PkgCacheClearClosures,
+    METH_VARARGS|METH_KEYWORDS,cache_clear_closures_doc},
+   {"dependency_graph",(PyCFunction)PkgCacheDependencyGraph,
+    METH_VARARGS|METH_KEYWORDS,cache_dependency_graph_doc},
+   {"fingerprint",PkgCacheFingerprint,METH_VARARGS,cache_fingerprint_doc},
    {}
 };
 
@@ -401,7 +958,7 @@ PyTypeObject PyCache_Type =
    sizeof(CppPyObject<pkgCache *>),   // tp_basicsize
    0,                                   // tp_itemsize
    // Methods
-   CppDeallocPtr<pkgCache *>,      // tp_dealloc
+   PkgCacheDealloc,                     // tp_dealloc
    0,                                   // tp_print
    0,                                   // tp_getattr
    0,                                   // tp_setattr
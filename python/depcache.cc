@@ -26,6 +26,7 @@
 #include <Python.h>
 
 #include <iostream>
+#include <memory>
 #include "progress.h"
 
 #ifndef _
@@ -93,13 +94,13 @@ static PyObject *PkgDepCacheCommit(PyObject *Self,PyObject *Args)
    if(!List.ReadMainList())
       return HandleErrors(Py_None);
 
-   PyFetchProgress progress;
-   progress.setCallbackInst(pyFetchProgressInst);
+   std::unique_ptr<pkgAcquireStatus> progress(
+      PyFetchProgress_New(pyFetchProgressInst));
 
    pkgPackageManager *PM;
    PM = _system->CreatePM(depcache);
 
-   Fetcher.SetLog(&progress);
+   Fetcher.SetLog(progress.get());
 
    if(PM->GetArchives(&Fetcher, &List, &Recs) == false ||
       _error->PendingError() == true) {
@@ -342,6 +343,8 @@ static PyObject *PkgDepCacheMarkKeep(PyObject *Self,PyObject *Args)
    pkgCache::PkgIterator &Pkg = GetCpp<pkgCache::PkgIterator>(PackageObj);
    VALIDATE_ITERATOR(Pkg);
    depcache->MarkKeep(Pkg);
+   if (PyAptStats.Enabled)
+      PyAptStats.MarkKeep++;
 
    Py_INCREF(Py_None);
    return HandleErrors(Py_None);
@@ -377,6 +380,8 @@ static PyObject *PkgDepCacheMarkDelete(PyObject *Self,PyObject *Args)
    pkgCache::PkgIterator &Pkg = GetCpp<pkgCache::PkgIterator>(PackageObj);
    VALIDATE_ITERATOR(Pkg);
    depcache->MarkDelete(Pkg,purge);
+   if (PyAptStats.Enabled)
+      PyAptStats.MarkDelete++;
 
    Py_INCREF(Py_None);
    return HandleErrors(Py_None);
@@ -400,6 +405,8 @@ static PyObject *PkgDepCacheMarkInstall(PyObject *Self,PyObject *Args)
    Py_BEGIN_ALLOW_THREADS
    depcache->MarkInstall(Pkg, autoInst, 0, fromUser);
    Py_END_ALLOW_THREADS
+   if (PyAptStats.Enabled)
+      PyAptStats.MarkInstall++;
 
    Py_INCREF(Py_None);
    return HandleErrors(Py_None);
@@ -417,6 +424,8 @@ static PyObject *PkgDepCacheMarkAuto(PyObject *Self,PyObject *Args)
    pkgCache::PkgIterator &Pkg = GetCpp<pkgCache::PkgIterator>(PackageObj);
    VALIDATE_ITERATOR(Pkg);
    depcache->MarkAuto(Pkg,value);
+   if (PyAptStats.Enabled)
+      PyAptStats.MarkAuto++;
 
    Py_INCREF(Py_None);
    return HandleErrors(Py_None);
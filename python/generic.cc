@@ -15,6 +15,19 @@ using namespace std;
 #include <apt-pkg/error.h>
 									/*}}}*/
 
+// PyAptStats - Counters for apt_pkg.stats()				/*{{{*/
+// ---------------------------------------------------------------------
+PyAptStatistics PyAptStats;
+
+void PyAptStatistics::Reset()
+{
+   RecordLookups = RecordBytes = 0;
+   TagSections = TagBytes = 0;
+   ProgressCalls = ProgressNanoseconds = 0;
+   MarkKeep = MarkDelete = MarkInstall = MarkAuto = 0;
+   Allocations.clear();
+}
+									/*}}}*/
 // HandleErrors - This moves errors from _error to Python Exceptions	/*{{{*/
 // ---------------------------------------------------------------------
 /* We throw away all warnings and only propogate the first error. */
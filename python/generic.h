@@ -31,6 +31,7 @@
 #include <string>
 #include <iostream>
 #include <new>
+#include <unordered_map>
 #include <langinfo.h>
 
 /**
@@ -129,6 +130,31 @@ template <class T> struct CppPyObject : public PyObject
    T Object;
 };
 
+/**
+ * Counters of the work done on the hot paths, exposed as apt_pkg.stats().
+ *
+ * Collecting them is disabled by default; all counters are only updated
+ * while the GIL is held.
+ */
+struct PyAptStatistics
+{
+   bool Enabled;
+   unsigned long long RecordLookups;
+   unsigned long long RecordBytes;
+   unsigned long long TagSections;
+   unsigned long long TagBytes;
+   unsigned long long ProgressCalls;
+   unsigned long long ProgressNanoseconds;
+   unsigned long long MarkKeep;
+   unsigned long long MarkDelete;
+   unsigned long long MarkInstall;
+   unsigned long long MarkAuto;
+   std::unordered_map<PyTypeObject *, unsigned long long> Allocations;
+
+   void Reset();
+};
+extern PyAptStatistics PyAptStats;
+
 template <class T>
 inline T &GetCpp(PyObject *Obj)
 {
@@ -148,6 +174,8 @@ inline CppPyObject<T> *CppPyObject_NEW(PyObject *Owner,PyTypeObject *Type)
    #ifdef ALLOC_DEBUG
    std::cerr << "=== ALLOCATING " << Type->tp_name << "+ ===\n";
    #endif
+   if (PyAptStats.Enabled)
+      ++PyAptStats.Allocations[Type];
    CppPyObject<T> *New = (CppPyObject<T>*)Type->tp_alloc(Type, 0);
    new (&New->Object) T;
    New->Owner = Owner;
@@ -161,6 +189,8 @@ inline CppPyObject<T> *CppPyObject_NEW(PyObject *Owner, PyTypeObject *Type,A con
    #ifdef ALLOC_DEBUG
    std::cerr << "=== ALLOCATING " << Type->tp_name << "+ ===\n";
    #endif
+   if (PyAptStats.Enabled)
+      ++PyAptStats.Allocations[Type];
    CppPyObject<T> *New = (CppPyObject<T>*)Type->tp_alloc(Type, 0);
    new (&New->Object) T(Arg);
    New->Owner = Owner;
@@ -19,12 +19,183 @@
  * MA 02110-1301, USA.
  */
 #include <Python.h>
+#include <apt-pkg/configuration.h>
 #include <apt-pkg/init.h>
 #include <apt-pkg/error.h>
 #include <apt-pkg/fileutl.h>
 #include <apt-pkg/pkgsystem.h>
 #include "generic.h"
 
+#include <algorithm>
+#include <errno.h>
+#include <fcntl.h>
+#include <string>
+#include <time.h>
+#include <unistd.h>
+#include <vector>
+
+/**
+ * Return whether another process holds a lock on the file, and store the
+ * process ID of the holder in Pid (which is -1 if it is not known).
+ */
+static bool LockHolder(const std::string &File, pid_t &Pid)
+{
+    int fd = open(File.c_str(), O_RDONLY | O_CLOEXEC);
+    if (fd == -1)
+        return false;
+
+    struct flock fl;
+    fl.l_type = F_WRLCK;
+    fl.l_whence = SEEK_SET;
+    fl.l_start = 0;
+    fl.l_len = 0;
+    fl.l_pid = -1;
+    bool held = fcntl(fd, F_GETLK, &fl) == 0 && fl.l_type != F_UNLCK;
+    close(fd);
+    Pid = held && fl.l_pid > 0 ? fl.l_pid : -1;
+    return held;
+}
+
+/** Return the PID of the first holder of one of the files, or None. */
+static PyObject *LockHolderObject(const std::vector<std::string> &Files)
+{
+    for (auto const &File : Files) {
+        pid_t pid;
+        if (LockHolder(File, pid) && pid > 0)
+            return MkPyNumber(pid);
+    }
+    Py_RETURN_NONE;
+}
+
+/**
+ * Return whether an attempt to lock the files that failed with errno Err
+ * may have failed because another process held the lock, rather than for
+ * lack of permissions or another lasting reason.
+ */
+static bool MaybeContended(int Err, const std::vector<std::string> &Files)
+{
+    if (Err == EAGAIN || Err == EWOULDBLOCK)
+        return true;
+    if (Err != EACCES)
+        return false;
+    // fcntl() may report a held lock as EACCES, but so does open() for a
+    // lock file we may not write to.
+    for (auto const &File : Files) {
+        int fd = open(File.c_str(), O_RDWR | O_CLOEXEC);
+        if (fd != -1)
+            close(fd);
+        else if (errno == EACCES || errno == EPERM)
+            return false;
+    }
+    return true;
+}
+
+static double MonotonicTime()
+{
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec + ts.tv_nsec / 1e9;
+}
+
+/**
+ * Call TryLock until it succeeds, until it fails for another reason than
+ * another process holding one of the files, or until Timeout seconds have
+ * passed. Between the attempts, sleep with the GIL released, starting
+ * with a short interval and doubling it up to Poll seconds.
+ *
+ * Return 1 if the lock was acquired, 0 if it failed with the errors of
+ * the last attempt on the error stack, and -1 if a Python exception was
+ * raised while waiting.
+ */
+template <typename Func>
+static int WaitForLock(Func TryLock, const std::vector<std::string> &Files,
+                       double Timeout, double Poll)
+{
+    double deadline = MonotonicTime() + Timeout;
+    double interval = std::min(0.01, Poll);
+
+    while (true) {
+        errno = 0;
+        if (TryLock())
+            return 1;
+        int err = errno;
+
+        double remaining = deadline - MonotonicTime();
+        if (remaining <= 0)
+            return 0;
+        // The holder may have released the lock since the attempt, so only
+        // give up early if the attempt did not fail because of contention.
+        pid_t pid;
+        if (MaybeContended(err, Files) == false &&
+            std::none_of(Files.begin(), Files.end(),
+                         [&](const std::string &File) {
+                             return LockHolder(File, pid);
+                         }))
+            return 0;
+
+        _error->Discard();
+        double delay = std::min(interval, remaining);
+        struct timespec ts;
+        ts.tv_sec = (time_t)delay;
+        ts.tv_nsec = (long)((delay - ts.tv_sec) * 1e9);
+        Py_BEGIN_ALLOW_THREADS
+        nanosleep(&ts, NULL);
+        Py_END_ALLOW_THREADS
+        if (PyErr_CheckSignals() == -1)
+            return -1;
+        interval = std::min(interval * 2, Poll);
+    }
+}
+
+/** Check the poll interval passed to the lock constructors. */
+static bool CheckPoll(double poll)
+{
+    if (poll <= 0) {
+        PyErr_SetString(PyExc_ValueError, "poll must be positive");
+        return false;
+    }
+    return true;
+}
+
+static int lock_setdouble(double &Value, PyObject *Arg, const char *Name,
+                          bool Positive)
+{
+    if (Arg == NULL) {
+        PyErr_Format(PyExc_TypeError, "cannot delete %s", Name);
+        return -1;
+    }
+    double value = PyFloat_AsDouble(Arg);
+    if (value == -1 && PyErr_Occurred())
+        return -1;
+    if (Positive && value <= 0) {
+        PyErr_Format(PyExc_ValueError, "%s must be positive", Name);
+        return -1;
+    }
+    Value = value;
+    return 0;
+}
+
+/**
+ * The package system lock.
+ *
+ * Members:
+ * @member double timeout  How long to wait for the lock, or a negative
+ *                         value to use DPkg::Lock::Timeout.
+ * @member double poll     The maximum interval between two attempts.
+ */
+struct systemlock_object {
+    PyObject_HEAD
+    double timeout;
+    double poll;
+};
+
+/** Return the lock files of the package system. */
+static std::vector<std::string> systemlock_files()
+{
+    std::string admindir = flNotFile(_config->FindFile("Dir::State::status"));
+    return {admindir + "lock-frontend", admindir + "lock"};
+}
+
 static PyObject *systemlock_exit(PyObject *self, PyObject *args)
 {
 
@@ -50,36 +221,105 @@ static PyObject *systemlock_exit(PyObject *self, PyObject *args)
     Py_RETURN_FALSE;
 }
 
-static PyObject *systemlock_enter(PyObject *self, PyObject *args)
+static PyObject *systemlock_enter(systemlock_object *self, PyObject *args)
 {
     if (!PyArg_ParseTuple(args, ""))
         return NULL;
-    if (!_system->Lock())
+
+    double timeout = self->timeout;
+    if (timeout < 0)
+        timeout = _config->FindI("DPkg::Lock::Timeout", 0);
+
+    // Wait here, with the GIL released, instead of inside Lock().
+    std::string old_timeout = _config->Find("DPkg::Lock::Timeout");
+    _config->Set("DPkg::Lock::Timeout", 0);
+    int res = WaitForLock([] { return _system->Lock(); }, systemlock_files(),
+                          timeout, self->poll);
+    _config->Set("DPkg::Lock::Timeout", old_timeout);
+
+    if (res == -1)
+        return NULL;
+    if (res == 0)
         return HandleErrors();
     Py_INCREF(self);
-    return self;
+    return (PyObject *)self;
 }
 
 static PyObject *systemlock_new(PyTypeObject *type, PyObject *args,
                                 PyObject *kwds)
 {
+    double timeout = -1;
+    double poll = 1;
+    char *kwlist[] = {"timeout", "poll", NULL};
     if (_system == 0) {
         PyErr_SetString(PyExc_ValueError,"_system not initialized");
         return 0;
     }
-    return PyType_GenericNew(type,args,kwds);
+    if (PyArg_ParseTupleAndKeywords(args, kwds, "|dd:__init__", kwlist,
+                                    &timeout, &poll) == 0 ||
+        !CheckPoll(poll))
+        return NULL;
+    systemlock_object *self = (systemlock_object *)type->tp_alloc(type, 0);
+    if (self == NULL)
+        return NULL;
+    self->timeout = timeout;
+    self->poll = poll;
+    return (PyObject *)self;
+}
+
+static PyObject *systemlock_get_holder(systemlock_object *self, void *closure)
+{
+    return LockHolderObject(systemlock_files());
+}
+
+static PyObject *systemlock_get_timeout(systemlock_object *self, void *closure)
+{
+    return PyFloat_FromDouble(self->timeout);
+}
+
+static int systemlock_set_timeout(systemlock_object *self, PyObject *arg,
+                                  void *closure)
+{
+    return lock_setdouble(self->timeout, arg, "timeout", false);
+}
+
+static PyObject *systemlock_get_poll(systemlock_object *self, void *closure)
+{
+    return PyFloat_FromDouble(self->poll);
+}
+
+static int systemlock_set_poll(systemlock_object *self, PyObject *arg,
+                               void *closure)
+{
+    return lock_setdouble(self->poll, arg, "poll", true);
 }
 
 static PyMethodDef systemlock_methods[] = {
-    {"__enter__",systemlock_enter,METH_VARARGS,"Lock the system."},
+    {"__enter__",(PyCFunction)systemlock_enter,METH_VARARGS,"Lock the system."},
     {"__exit__",systemlock_exit,METH_VARARGS,"Unlock the system."},
     {NULL}
 };
 
-static char *systemlock_doc = "SystemLock()\n\n"
+static PyGetSetDef systemlock_getset[] = {
+    {"holder",(getter)systemlock_get_holder,0,
+     "The PID of the process holding the lock, or None."},
+    {"poll",(getter)systemlock_get_poll,(setter)systemlock_set_poll,
+     "The maximum interval between two attempts to get the lock."},
+    {"timeout",(getter)systemlock_get_timeout,(setter)systemlock_set_timeout,
+     "How many seconds to wait for the lock; negative values use the\n"
+     "option DPkg::Lock::Timeout."},
+    {NULL}
+};
+
+static char *systemlock_doc = "SystemLock(timeout: float = -1, poll: float = 1)\n\n"
     "Context manager for locking the package system. The lock is established\n"
     "as soon as the method __enter__() is called. It is released when\n"
     "__exit__() is called.\n\n"
+    "If another process holds the lock, wait up to 'timeout' seconds for\n"
+    "it to be released, trying again at intervals growing up to 'poll'\n"
+    "seconds. A negative timeout means the value of the option\n"
+    "DPkg::Lock::Timeout, which defaults to 0. The attribute 'holder' is\n"
+    "the PID of the process holding the lock.\n\n"
     "This should be used via the 'with' statement, for example:\n\n"
     "   with apt_pkg.SystemLock():\n"
     "       ...\n\n"
@@ -94,7 +334,7 @@ static char *systemlock_doc = "SystemLock()\n\n"
 PyTypeObject PySystemLock_Type = {
     PyVarObject_HEAD_INIT(&PyType_Type, 0)
     "apt_pkg.SystemLock",                // tp_name
-    0,                                   // tp_basicsize
+    sizeof(systemlock_object),           // tp_basicsize
     0,                                   // tp_itemsize
     // Methods
     0,                                   // tp_dealloc
@@ -123,7 +363,7 @@ PyTypeObject PySystemLock_Type = {
     0,                                   // tp_iternext
     systemlock_methods,                  // tp_methods
     0,                                   // tp_members
-    0,                                   // tp_getset
+    systemlock_getset,                   // tp_getset
     0,                                   // tp_base
     0,                                   // tp_dict
     0,                                   // tp_descr_get
@@ -146,12 +386,16 @@ PyTypeObject PySystemLock_Type = {
  * @member char* filename   The name of the file
  * @member int   lock_count How many times we have locked it.
  * @member int   fd         The filedescriptor returned by GetLock() or 0.
+ * @member double timeout   How long to wait for the lock.
+ * @member double poll      The maximum interval between two attempts.
  */
 struct filelock_object {
     PyObject_HEAD
     char *filename;
     int lock_count;
     int fd;
+    double timeout;
+    double poll;
 };
 
 static PyObject *filelock_enter(filelock_object *self, PyObject *args)
@@ -159,10 +403,13 @@ static PyObject *filelock_enter(filelock_object *self, PyObject *args)
     self->lock_count++;
     // If we have no lock yet, get a lock.
     if (self->lock_count == 1) {
-        self->fd = GetLock(self->filename, true);
-        if (self->fd == -1) {
+        int res = WaitForLock([self] {
+            self->fd = GetLock(self->filename, true);
+            return self->fd != -1;
+        }, {self->filename}, self->timeout, self->poll);
+        if (res != 1) {
             self->lock_count--;
-            return HandleErrors();
+            return res == -1 ? NULL : HandleErrors();
         }
     }
     Py_INCREF(self);
@@ -184,19 +431,51 @@ static PyObject *filelock_exit(filelock_object *self, PyObject *args)
 static PyObject *filelock_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
 {
     PyApt_Filename filename;
-    char *kwlist[] = {"filename",  NULL};
-    if (PyArg_ParseTupleAndKeywords(args, kwds, "O&:__init__", kwlist,
+    double timeout = 0;
+    double poll = 1;
+    char *kwlist[] = {"filename", "timeout", "poll", NULL};
+    if (PyArg_ParseTupleAndKeywords(args, kwds, "O&|dd:__init__", kwlist,
                                     PyApt_Filename::Converter,
-                                    &filename) == 0) {
+                                    &filename, &timeout, &poll) == 0 ||
+        !CheckPoll(poll)) {
         return NULL;
     }
     filelock_object *self = (filelock_object *)type->tp_alloc(type, 0);
     // Copy the string into the object.
     self->filename = new char[strlen(filename) + 1];
     strcpy(self->filename, filename);
+    self->timeout = timeout;
+    self->poll = poll;
     return (PyObject *)self;
 }
 
+static PyObject *filelock_get_holder(filelock_object *self, void *closure)
+{
+    return LockHolderObject({self->filename});
+}
+
+static PyObject *filelock_get_timeout(filelock_object *self, void *closure)
+{
+    return PyFloat_FromDouble(self->timeout);
+}
+
+static int filelock_set_timeout(filelock_object *self, PyObject *arg,
+                                void *closure)
+{
+    return lock_setdouble(self->timeout, arg, "timeout", false);
+}
+
+static PyObject *filelock_get_poll(filelock_object *self, void *closure)
+{
+    return PyFloat_FromDouble(self->poll);
+}
+
+static int filelock_set_poll(filelock_object *self, PyObject *arg,
+                             void *closure)
+{
+    return lock_setdouble(self->poll, arg, "poll", true);
+}
+
 static void filelock_dealloc(filelock_object *self)
 {
     delete[] self->filename;
@@ -209,10 +488,24 @@ static PyMethodDef filelock_methods[] = {
     {NULL}
 };
 
-static char *filelock_doc = "FileLock(filename: str)\n\n"
+static PyGetSetDef filelock_getset[] = {
+    {"holder",(getter)filelock_get_holder,0,
+     "The PID of the process holding the lock, or None."},
+    {"poll",(getter)filelock_get_poll,(setter)filelock_set_poll,
+     "The maximum interval between two attempts to get the lock."},
+    {"timeout",(getter)filelock_get_timeout,(setter)filelock_set_timeout,
+     "How many seconds to wait for the lock."},
+    {NULL}
+};
+
+static char *filelock_doc = "FileLock(filename: str, timeout: float = 0, poll: float = 1)\n\n"
     "Context manager for locking using a file. The lock is established\n"
     "as soon as the method __enter__() is called. It is released when\n"
     "__exit__() is called.\n\n"
+    "If another process holds the lock, wait up to 'timeout' seconds for\n"
+    "it to be released, trying again at intervals growing up to 'poll'\n"
+    "seconds. The attribute 'holder' is the PID of the process holding\n"
+    "the lock.\n\n"
     "This should be used via the 'with' statement, for example:\n\n"
     "   with apt_pkg.FileLock(filename):\n"
     "       ...\n\n"
@@ -256,7 +549,7 @@ PyTypeObject PyFileLock_Type = {
     0,                                   // tp_iternext
     filelock_methods,                    // tp_methods
     0,                                   // tp_members
-    0,                                   // tp_getset
+    filelock_getset,                     // tp_getset
     0,                                   // tp_base
     0,                                   // tp_dict
     0,                                   // tp_descr_get
@@ -22,8 +22,15 @@
 #include <Python.h>
 #include "apt_pkgmodule.h"
 #include "generic.h"
+#include <apt-pkg/depcache.h>
 #include <apt-pkg/orderlist.h>
 
+#include <algorithm>
+#include <memory>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
 struct PyOrderList : CppPyObject<pkgOrderList*> {
     pkgCache::PkgIterator current;
     int nextIndex;
@@ -222,6 +229,226 @@ static PyObject *order_list_is_missing(PyObject *self,PyObject *args)
     return PyBool_FromLong(list->IsMissing(PyPackage_ToCpp(pyPkg)));
 }
 
+// The dependencies between the packages in an order list. Each package is
+// identified by its position in the list, and has the positions of the
+// packages it depends on, with whether the dependency is a Pre-Depends.
+struct OrderGraph {
+    std::vector<pkgCache::Package *> pkgs;
+    std::vector<std::vector<std::pair<unsigned, bool>>> before;
+};
+
+static void order_graph_build(pkgOrderList *list, pkgDepCache *depcache,
+                              OrderGraph &graph)
+{
+    pkgCache &cache = depcache->GetCache();
+    std::unordered_map<unsigned int, unsigned> position;
+    for (pkgOrderList::iterator it = list->begin(); it != list->end(); ++it) {
+        position.emplace((*it)->ID, graph.pkgs.size());
+        graph.pkgs.push_back(*it);
+    }
+    graph.before.resize(graph.pkgs.size());
+
+    for (unsigned i = 0; i < graph.pkgs.size(); i++) {
+        pkgCache::PkgIterator pkg(cache, graph.pkgs[i]);
+        pkgCache::VerIterator ver = (*depcache)[pkg].InstVerIter(cache);
+        if (ver.end())
+            continue;
+        auto &before = graph.before[i];
+        for (pkgCache::DepIterator dep = ver.DependsList(); !dep.end(); ++dep) {
+            if (dep->Type != pkgCache::Dep::Depends &&
+                dep->Type != pkgCache::Dep::PreDepends)
+                continue;
+            bool hard = dep->Type == pkgCache::Dep::PreDepends;
+            // Each alternative which gets installed in the list counts
+            std::unique_ptr<pkgCache::Version *[]> targets(dep.AllTargets());
+            for (pkgCache::Version **target = targets.get(); *target != 0;
+                 target++) {
+                pkgCache::VerIterator tver(cache, *target);
+                pkgCache::PkgIterator tpkg = tver.ParentPkg();
+                auto found = position.find(tpkg->ID);
+                if (found == position.end() || found->second == i ||
+                    (*depcache)[tpkg].InstallVer != *target)
+                    continue;
+                before.emplace_back(found->second, hard);
+            }
+        }
+        // Keep one edge per package, a Pre-Depends one if there is one
+        std::sort(before.begin(), before.end(),
+                  [](const std::pair<unsigned, bool> &a,
+                     const std::pair<unsigned, bool> &b) {
+                      return a.first < b.first ||
+                             (a.first == b.first && a.second > b.second);
+                  });
+        before.erase(std::unique(before.begin(), before.end(),
+                                 [](const std::pair<unsigned, bool> &a,
+                                    const std::pair<unsigned, bool> &b) {
+                                     return a.first == b.first;
+                                 }),
+                     before.end());
+    }
+}
+
+// Assign each package of the graph to a level, such that all packages it
+// depends on are on lower levels, except for those in a dependency loop
+// with it, which share its level. This finds the strongly connected
+// components of the graph with Tarjan's algorithm, without recursion;
+// they are completed after all components they depend on.
+static std::vector<unsigned> order_graph_levels(const OrderGraph &graph)
+{
+    const unsigned n = graph.pkgs.size();
+    std::vector<int> index(n, -1), low(n, 0), component(n, -1);
+    std::vector<unsigned> levels(n, 0), component_level;
+    std::vector<bool> on_stack(n, false);
+    std::vector<unsigned> stack;
+    std::vector<std::pair<unsigned, size_t>> calls;
+    int counter = 0;
+
+    auto visit = [&](unsigned v) {
+        index[v] = low[v] = counter++;
+        stack.push_back(v);
+        on_stack[v] = true;
+        calls.emplace_back(v, 0);
+    };
+
+    for (unsigned root = 0; root < n; root++) {
+        if (index[root] != -1)
+            continue;
+        visit(root);
+        while (!calls.empty()) {
+            unsigned v = calls.back().first;
+            if (calls.back().second < graph.before[v].size()) {
+                unsigned w = graph.before[v][calls.back().second++].first;
+                if (index[w] == -1)
+                    visit(w);
+                else if (on_stack[w])
+                    low[v] = std::min(low[v], index[w]);
+                continue;
+            }
+            calls.pop_back();
+            if (!calls.empty()) {
+                unsigned u = calls.back().first;
+                low[u] = std::min(low[u], low[v]);
+            }
+            if (low[v] != index[v])
+                continue;
+
+            // v is the root of a component: pop its members and put them
+            // on the level above the highest component they depend on.
+            int c = component_level.size();
+            size_t start = stack.size();
+            do {
+                start--;
+                component[stack[start]] = c;
+                on_stack[stack[start]] = false;
+            } while (stack[start] != v);
+            unsigned level = 0;
+            for (size_t i = start; i < stack.size(); i++)
+                for (auto &edge : graph.before[stack[i]])
+                    if (component[edge.first] != c)
+                        level = std::max(
+                            level, component_level[component[edge.first]] + 1);
+            component_level.push_back(level);
+            for (size_t i = start; i < stack.size(); i++)
+                levels[stack[i]] = level;
+            stack.resize(start);
+        }
+    }
+    return levels;
+}
+
+static const char order_list_levels_doc[] =
+    "levels() -> list[list[Package]]\n\n"
+    "Return the packages in the list as waves, in dependency order. The\n"
+    "packages of a wave only depend on packages of earlier waves through\n"
+    "the Depends and Pre-Depends of the versions to be installed, except\n"
+    "for packages in a dependency loop, which share a wave.";
+static PyObject *order_list_levels(PyObject *self,PyObject *args)
+{
+    pkgOrderList *list = GetCpp<pkgOrderList*>(self);
+    PyObject *owner = GetOwner<pkgOrderList*>(self);
+    pkgDepCache *depcache = PyDepCache_ToCpp(owner);
+    if (PyArg_ParseTuple(args, "") == 0)
+        return 0;
+
+    OrderGraph graph;
+    std::vector<std::vector<unsigned>> waves;
+    Py_BEGIN_ALLOW_THREADS
+    order_graph_build(list, depcache, graph);
+    std::vector<unsigned> levels = order_graph_levels(graph);
+    for (unsigned i = 0; i < levels.size(); i++) {
+        if (levels[i] >= waves.size())
+            waves.resize(levels[i] + 1);
+        waves[levels[i]].push_back(i);
+    }
+    Py_END_ALLOW_THREADS
+
+    pkgCache &cache = depcache->GetCache();
+    PyObject *result = PyList_New(waves.size());
+    if (result == 0)
+        return 0;
+    for (size_t level = 0; level < waves.size(); level++) {
+        PyObject *wave = PyList_New(waves[level].size());
+        if (wave == 0) {
+            Py_DECREF(result);
+            return 0;
+        }
+        PyList_SET_ITEM(result, level, wave);
+        for (size_t i = 0; i < waves[level].size(); i++) {
+            pkgCache::PkgIterator pkg(cache, graph.pkgs[waves[level][i]]);
+            PyObject *obj = PyPackage_FromCpp(pkg, true, owner);
+            if (obj == 0) {
+                Py_DECREF(result);
+                return 0;
+            }
+            PyList_SET_ITEM(wave, i, obj);
+        }
+    }
+    return HandleErrors(result);
+}
+
+static const char order_list_edges_doc[] =
+    "edges() -> list[tuple[Package, Package, str]]\n\n"
+    "Return the dependencies between the packages in the list, as tuples\n"
+    "(before, after, type), where the version of 'after' to be installed\n"
+    "depends on the one of 'before', and 'type' is 'PreDepends' or\n"
+    "'Depends'. Pre-Depends are hard barriers: 'before' must be configured\n"
+    "before 'after' is unpacked.";
+static PyObject *order_list_edges(PyObject *self,PyObject *args)
+{
+    pkgOrderList *list = GetCpp<pkgOrderList*>(self);
+    PyObject *owner = GetOwner<pkgOrderList*>(self);
+    pkgDepCache *depcache = PyDepCache_ToCpp(owner);
+    if (PyArg_ParseTuple(args, "") == 0)
+        return 0;
+
+    OrderGraph graph;
+    Py_BEGIN_ALLOW_THREADS
+    order_graph_build(list, depcache, graph);
+    Py_END_ALLOW_THREADS
+
+    pkgCache &cache = depcache->GetCache();
+    PyObject *result = PyList_New(0);
+    if (result == 0)
+        return 0;
+    for (unsigned i = 0; i < graph.pkgs.size(); i++) {
+        for (auto &edge : graph.before[i]) {
+            pkgCache::PkgIterator before(cache, graph.pkgs[edge.first]);
+            pkgCache::PkgIterator after(cache, graph.pkgs[i]);
+            PyObject *item = Py_BuildValue("(NNs)",
+                                           PyPackage_FromCpp(before, true, owner),
+                                           PyPackage_FromCpp(after, true, owner),
+                                           edge.second ? "PreDepends" : "Depends");
+            if (item == 0 || PyList_Append(result, item) != 0) {
+                Py_XDECREF(item);
+                Py_DECREF(result);
+                return 0;
+            }
+            Py_DECREF(item);
+        }
+    }
+    return HandleErrors(result);
+}
+
 
 #define METHOD(name) {#name, order_list_##name, METH_VARARGS,\
                       order_list_##name##_doc}
@@ -237,6 +464,8 @@ static PyMethodDef order_list_methods[] = {
 	METHOD(is_now),
 	METHOD(is_missing),
 	METHOD(wipe_flags),
+	METHOD(levels),
+	METHOD(edges),
 	{}
 };
 
@@ -40,8 +40,26 @@ static PyObject *PkgRecordsLookup(PyObject *Self,PyObject *Args)
       return 0;
    }
 
-   // Do the lookup
-   Struct.Last = &Struct.Records.Lookup(pkgCache::VerFileIterator(*Cache,Cache->VerFileP+Index));
+   // Do the lookup. Reading and decompressing the index file happens
+   // without the GIL, so other threads (using other PackageRecords objects)
+   // can run meanwhile. The lock must be released before the GIL is taken
+   // again, as the getters take the lock while holding the GIL.
+   pkgCache::VerFileIterator VerFile(*Cache,Cache->VerFileP+Index);
+   const char *Start = 0;
+   const char *Stop = 0;
+   bool Count = PyAptStats.Enabled;
+   Py_BEGIN_ALLOW_THREADS
+   {
+      std::lock_guard<std::mutex> Guard(Struct.Lock);
+      Struct.Last = &Struct.Records.Lookup(VerFile);
+      if (Count)
+         Struct.Last->GetRec(Start, Stop);
+   }
+   Py_END_ALLOW_THREADS
+   if (Count) {
+      PyAptStats.RecordLookups++;
+      PyAptStats.RecordBytes += Stop - Start;
+   }
 
    // always return true (to make it consistent with the pkgsrcrecords object
    return PyBool_FromLong(1);
@@ -51,7 +69,9 @@ static PyMethodDef PkgRecordsMethods[] =
 {
    {"lookup",PkgRecordsLookup,METH_VARARGS,
     "lookup((packagefile: apt_pkg.PackageFile, index: int)) -> bool\n\n"
-    "Changes to a new package"},
+    "Changes to a new package. The index file is read without holding\n"
+    "the global interpreter lock, so lookups in different PackageRecords\n"
+    "objects can run in parallel threads."},
    {}
 };
 
@@ -68,10 +88,12 @@ static inline PkgRecordsStruct &GetStruct(PyObject *Self,char *name) {
 
 static PyObject *PkgRecordsGetFileName(PyObject *Self,void*) {
    PkgRecordsStruct &Struct = GetStruct(Self,"FileName");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    return (Struct.Last != 0) ? CppPyPath(Struct.Last->FileName()) : 0;
 }
 static PyObject *PkgRecordsGetHashes(PyObject *Self,void*) {
    PkgRecordsStruct &Struct = GetStruct(Self,"Hashes");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    if (Struct.Last == 0)
       return 0;
 
@@ -81,6 +103,7 @@ static PyObject *PkgRecordsGetHashes(PyObject *Self,void*) {
 }
 static PyObject *PkgRecordsGetMD5Hash(PyObject *Self,void*) {
    PkgRecordsStruct &Struct = GetStruct(Self,"MD5Hash");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    if (Struct.Last == NULL)
       return 0;
    auto hashes = Struct.Last->Hashes();
@@ -91,6 +114,7 @@ static PyObject *PkgRecordsGetMD5Hash(PyObject *Self,void*) {
 }
 static PyObject *PkgRecordsGetSHA1Hash(PyObject *Self,void*) {
    PkgRecordsStruct &Struct = GetStruct(Self,"SHA1Hash");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    if (Struct.Last == NULL)
       return 0;
    auto hashes = Struct.Last->Hashes();
@@ -101,6 +125,7 @@ static PyObject *PkgRecordsGetSHA1Hash(PyObject *Self,void*) {
 }
 static PyObject *PkgRecordsGetSHA256Hash(PyObject *Self,void*) {
    PkgRecordsStruct &Struct = GetStruct(Self,"SHA256Hash");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    if (Struct.Last == NULL)
       return 0;
    auto hashes = Struct.Last->Hashes();
@@ -111,35 +136,43 @@ static PyObject *PkgRecordsGetSHA256Hash(PyObject *Self,void*) {
 }
 static PyObject *PkgRecordsGetSourcePkg(PyObject *Self,void*) {
    PkgRecordsStruct &Struct = GetStruct(Self,"SourcePkg");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    return (Struct.Last != 0) ? CppPyString(Struct.Last->SourcePkg()) : 0;
 }
 static PyObject *PkgRecordsGetSourceVer(PyObject *Self,void*) {
    PkgRecordsStruct &Struct = GetStruct(Self,"SourceVer");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    return (Struct.Last != 0) ? CppPyString(Struct.Last->SourceVer()) : 0;
 }
 static PyObject *PkgRecordsGetMaintainer(PyObject *Self,void*) {
    PkgRecordsStruct &Struct = GetStruct(Self,"Maintainer");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    return (Struct.Last != 0) ? CppPyString(Struct.Last->Maintainer()) : 0;
 }
 static PyObject *PkgRecordsGetShortDesc(PyObject *Self,void*) {
    PkgRecordsStruct &Struct = GetStruct(Self,"ShortDesc");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    return (Struct.Last != 0) ? CppPyLocaleString(Struct.Last->ShortDesc()) : 0;
 }
 static PyObject *PkgRecordsGetLongDesc(PyObject *Self,void*) {
    PkgRecordsStruct &Struct = GetStruct(Self,"LongDesc");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    return (Struct.Last != 0) ? CppPyLocaleString(Struct.Last->LongDesc()) : 0;
 }
 static PyObject *PkgRecordsGetName(PyObject *Self,void*) {
    PkgRecordsStruct &Struct = GetStruct(Self,"Name");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    return (Struct.Last != 0) ? CppPyString(Struct.Last->Name()) : 0;
 }
 static PyObject *PkgRecordsGetHomepage(PyObject *Self,void*) {
    PkgRecordsStruct &Struct = GetStruct(Self,"Homepage");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    return (Struct.Last != 0) ? CppPyString(Struct.Last->Homepage()) : 0;
 }
 static PyObject *PkgRecordsGetRecord(PyObject *Self,void*) {
    const char *start, *stop;
    PkgRecordsStruct &Struct = GetStruct(Self,"Record");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    if (Struct.Last == 0)
       return 0;
    Struct.Last->GetRec(start, stop);
@@ -183,6 +216,7 @@ static PyGetSetDef PkgRecordsGetSet[] = {
 static int PkgRecordsContains(PyObject *Self,PyObject *Arg)
 {
    PkgRecordsStruct &Struct = GetStruct(Self,"__contains__");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    if (Struct.Last == nullptr)
       return -1;
    const char *Name = PyObject_AsString(Arg);
@@ -196,6 +230,7 @@ static int PkgRecordsContains(PyObject *Self,PyObject *Arg)
 static PyObject *PkgRecordsMap(PyObject *Self,PyObject *Arg)
 {
    PkgRecordsStruct &Struct = GetStruct(Self,"__contains__");
+   std::lock_guard<std::mutex> Guard(Struct.Lock);
    if (Struct.Last == nullptr)
       return nullptr;
 
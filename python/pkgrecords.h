@@ -1,9 +1,12 @@
 #include <apt-pkg/pkgrecords.h>
+#include <mutex>
 
 struct PkgRecordsStruct
 {
    pkgRecords Records;
    pkgRecords::Parser *Last;
+   // Lookups run without the GIL, so the parser state is guarded by this.
+   std::mutex Lock;
 
    PkgRecordsStruct(pkgCache *Cache) : Records(*Cache), Last(0) {};
    PkgRecordsStruct() : Records(*(pkgCache *)0) {abort();};  // G++ Bug..
@@ -23,6 +23,8 @@
 #include "generic.h"
 #include <apt-pkg/policy.h>
 
+#include <vector>
+
 static PyObject *policy_new(PyTypeObject *type,PyObject *Args,
                                   PyObject *kwds) {
     PyObject *cache;
@@ -174,6 +176,71 @@ static PyObject *policy_init_defaults(PyObject *self, PyObject *args) {
     Py_RETURN_NONE;
 }
 
+// Copy Vec into a bytearray and return a memoryview of signed ints on it.
+static PyObject *MakeIntArray(const std::vector<int> &Vec) {
+    PyObject *Bytes = PyByteArray_FromStringAndSize((const char *)Vec.data(),
+                                                    Vec.size() * sizeof(int));
+    if (Bytes == 0)
+        return 0;
+    PyObject *View = PyMemoryView_FromObject(Bytes);
+    Py_DECREF(Bytes);
+    if (View == 0)
+        return 0;
+    PyObject *Res = PyObject_CallMethod(View, "cast", "s", "i");
+    Py_DECREF(View);
+    return Res;
+}
+
+// The policy belongs to the apt_pkg.Cache object owning it.
+static pkgCache *PolicyGetCache(PyObject *self) {
+    return GetCpp<pkgCache *>(GetOwner<pkgPolicy *>(self));
+}
+
+static char *policy_priorities_array_doc =
+    "priorities_array() -> memoryview\n\n"
+    "Return the priorities of all versions, as get_priority() would return\n"
+    "them, as a memoryview of signed ints indexed by Version.id.\n"
+    "This evaluates the policy in one pass instead of one call per version.";
+static PyObject *policy_priorities_array(PyObject *self, PyObject *args) {
+    if (PyArg_ParseTuple(args, "") == 0)
+        return 0;
+    pkgPolicy *policy = GetCpp<pkgPolicy *>(self);
+    pkgCache *cache = PolicyGetCache(self);
+    std::vector<int> priorities(cache->HeaderP->VersionCount, 0);
+
+    Py_BEGIN_ALLOW_THREADS
+    for (pkgCache::PkgIterator pkg = cache->PkgBegin(); !pkg.end(); ++pkg)
+        for (pkgCache::VerIterator ver = pkg.VersionList(); !ver.end(); ++ver)
+            priorities[ver->ID] = policy->GetPriority(ver);
+    Py_END_ALLOW_THREADS
+
+    return HandleErrors(MakeIntArray(priorities));
+}
+
+static char *policy_candidates_array_doc =
+    "candidates_array() -> memoryview\n\n"
+    "Return the candidates of all packages, as get_candidate_ver() would\n"
+    "return them, as a memoryview of signed ints indexed by Package.id.\n"
+    "Each item is the Version.id of the candidate, or -1 if the package has\n"
+    "no candidate.";
+static PyObject *policy_candidates_array(PyObject *self, PyObject *args) {
+    if (PyArg_ParseTuple(args, "") == 0)
+        return 0;
+    pkgPolicy *policy = GetCpp<pkgPolicy *>(self);
+    pkgCache *cache = PolicyGetCache(self);
+    std::vector<int> candidates(cache->HeaderP->PackageCount, -1);
+
+    Py_BEGIN_ALLOW_THREADS
+    for (pkgCache::PkgIterator pkg = cache->PkgBegin(); !pkg.end(); ++pkg) {
+        pkgCache::VerIterator ver = policy->GetCandidateVer(pkg);
+        if (!ver.end())
+            candidates[pkg->ID] = ver->ID;
+    }
+    Py_END_ALLOW_THREADS
+
+    return HandleErrors(MakeIntArray(candidates));
+}
+
 static PyMethodDef policy_methods[] = {
     {"get_priority",(PyCFunction)policy_get_priority,METH_O,
      policy_get_priority_doc},
@@ -188,6 +255,10 @@ static PyMethodDef policy_methods[] = {
 #endif
     {"create_pin",policy_create_pin,METH_VARARGS,policy_create_pin_doc},
     {"init_defaults",policy_init_defaults,METH_VARARGS,policy_init_defaults_doc},
+    {"priorities_array",policy_priorities_array,METH_VARARGS,
+     policy_priorities_array_doc},
+    {"candidates_array",policy_candidates_array,METH_VARARGS,
+     policy_candidates_array_doc},
     {}
 };
 
@@ -9,6 +9,7 @@
 #include <iostream>
 #include <sys/types.h>
 #include <sys/wait.h>
+#include <chrono>
 #include <map>
 #include <utility>
 #include <apt-pkg/acquire-item.h>
@@ -63,7 +64,17 @@ bool PyCallbackObj::RunSimpleCallback(const char* method_name,
       return false;
    }
 
-   PyObject *result = PyObject_CallObject(method, arglist);
+   PyObject *result;
+   if (PyAptStats.Enabled) {
+      auto Start = std::chrono::steady_clock::now();
+      result = PyObject_CallObject(method, arglist);
+      auto Spent = std::chrono::steady_clock::now() - Start;
+      PyAptStats.ProgressCalls++;
+      PyAptStats.ProgressNanoseconds +=
+	 std::chrono::duration_cast<std::chrono::nanoseconds>(Spent).count();
+   } else {
+      result = PyObject_CallObject(method, arglist);
+   }
    Py_XDECREF(arglist);
 
    if(result == NULL) {
@@ -299,6 +310,397 @@ bool PyFetchProgress::Pulse(pkgAcquire * Owner)
 
 
 
+// acquire event sink
+
+void AcquireEventSink::Push(Event &&E)
+{
+   // The caller holds the lock. A full buffer drops its oldest event.
+   if (Count == Capacity) {
+      First = (First + 1) % Capacity;
+      Count--;
+      Dropped++;
+   }
+   size_t Index = (First + Count) % Capacity;
+   if (Index == Events.size())
+      Events.push_back(std::move(E));
+   else
+      Events[Index] = std::move(E);
+   Count++;
+}
+
+AcquireEventSink &PySinkFetchProgress::Sink()
+{
+   return GetCpp<AcquireEventSink>(sinkObj);
+}
+
+void PySinkFetchProgress::Record(AcquireEventSink::EventKind Kind,
+                                 pkgAcquire::ItemDesc &Itm)
+{
+   AcquireEventSink::Event E = {};
+   E.Kind = Kind;
+   E.URI = Itm.URI;
+   E.Description = Itm.Description;
+   E.ShortDesc = Itm.ShortDesc;
+   if (Itm.Owner != 0) {
+      E.FileSize = Itm.Owner->FileSize;
+      E.PartialSize = Itm.Owner->PartialSize;
+      if (Kind == AcquireEventSink::EventFail)
+         E.ErrorText = Itm.Owner->ErrorText;
+   }
+   std::lock_guard<std::mutex> Guard(Sink().Lock);
+   Sink().Push(std::move(E));
+}
+
+bool PySinkFetchProgress::MediaChange(std::string Media, std::string Drive)
+{
+   // Nobody can be asked to change the media
+   return false;
+}
+
+void PySinkFetchProgress::IMSHit(pkgAcquire::ItemDesc &Itm)
+{
+   Record(AcquireEventSink::EventHit, Itm);
+}
+
+void PySinkFetchProgress::Fetch(pkgAcquire::ItemDesc &Itm)
+{
+   Record(AcquireEventSink::EventFetch, Itm);
+}
+
+void PySinkFetchProgress::Done(pkgAcquire::ItemDesc &Itm)
+{
+   Record(AcquireEventSink::EventDone, Itm);
+}
+
+void PySinkFetchProgress::Fail(pkgAcquire::ItemDesc &Itm)
+{
+   Record(AcquireEventSink::EventFail, Itm);
+}
+
+void PySinkFetchProgress::Start()
+{
+   pkgAcquireStatus::Start();
+   {
+      AcquireEventSink &S = Sink();
+      std::lock_guard<std::mutex> Guard(S.Lock);
+      AcquireEventSink::Event E = {};
+      E.Kind = AcquireEventSink::EventStart;
+      S.Push(std::move(E));
+      S.Running = true;
+   }
+   /* Python code polling the sink runs while the fetcher is running; the
+    * GIL is only taken back in Stop().
+    */
+   PyCbObj_BEGIN_ALLOW_THREADS
+}
+
+void PySinkFetchProgress::Stop()
+{
+   pkgAcquireStatus::Stop();
+   {
+      AcquireEventSink &S = Sink();
+      std::lock_guard<std::mutex> Guard(S.Lock);
+      AcquireEventSink::Event E = {};
+      E.Kind = AcquireEventSink::EventStop;
+      S.Push(std::move(E));
+      S.FetchedBytes = FetchedBytes;
+      S.ElapsedTime = ElapsedTime;
+      S.Running = false;
+      S.Workers.clear();
+   }
+   PyCbObj_END_ALLOW_THREADS
+}
+
+bool PySinkFetchProgress::Pulse(pkgAcquire * Owner)
+{
+   pkgAcquireStatus::Pulse(Owner);
+
+   AcquireEventSink &S = Sink();
+   std::lock_guard<std::mutex> Guard(S.Lock);
+   S.CurrentBytes = CurrentBytes;
+   S.TotalBytes = TotalBytes;
+   S.FetchedBytes = FetchedBytes;
+   S.CurrentCPS = CurrentCPS;
+   S.ElapsedTime = ElapsedTime;
+   S.CurrentItems = CurrentItems;
+   S.TotalItems = TotalItems;
+   S.Pulses++;
+
+   S.Workers.clear();
+   for (pkgAcquire::Worker *I = Owner->WorkersBegin(); I != 0;
+        I = Owner->WorkerStep(I)) {
+      AcquireEventSink::WorkerState W = {};
+      W.Status = I->Status;
+      if (I->CurrentItem != nullptr) {
+         W.URI = I->CurrentItem->URI;
+         W.ShortDesc = I->CurrentItem->ShortDesc;
+         W.CurrentSize = I->CurrentItem->CurrentSize;
+         W.TotalSize = I->CurrentItem->TotalSize;
+      }
+      S.Workers.push_back(std::move(W));
+   }
+   return S.Cancelled == false;
+}
+
+pkgAcquireStatus *PyFetchProgress_New(PyObject *progress)
+{
+   if (PyObject_TypeCheck(progress, &PyAcquireEventSink_Type))
+      return new PySinkFetchProgress(progress);
+
+   PyFetchProgress *res = new PyFetchProgress();
+   res->setCallbackInst(progress);
+   return res;
+}
+
+static const char *EventKindName(AcquireEventSink::EventKind Kind)
+{
+   switch (Kind) {
+   case AcquireEventSink::EventStart:
+      return "start";
+   case AcquireEventSink::EventStop:
+      return "stop";
+   case AcquireEventSink::EventFetch:
+      return "fetch";
+   case AcquireEventSink::EventDone:
+      return "done";
+   case AcquireEventSink::EventFail:
+      return "fail";
+   case AcquireEventSink::EventHit:
+      return "ims_hit";
+   }
+   return "unknown";
+}
+
+static PyObject *acquireeventsink_new(PyTypeObject *type, PyObject *args,
+                                      PyObject *kwds)
+{
+   int capacity = 4096;
+   char *kwlist[] = {"capacity", NULL};
+   if (PyArg_ParseTupleAndKeywords(args, kwds, "|i", kwlist, &capacity) == 0)
+      return 0;
+   if (capacity <= 0) {
+      PyErr_SetString(PyExc_ValueError, "capacity must be positive");
+      return 0;
+   }
+
+   CppPyObject<AcquireEventSink> *self = CppPyObject_NEW<AcquireEventSink>(NULL, type);
+   self->Object.Capacity = capacity;
+   return self;
+}
+
+static PyObject *acquireeventsink_drain(PyObject *self, PyObject *args)
+{
+   Py_ssize_t max_events = -1;
+   if (PyArg_ParseTuple(args, "|n", &max_events) == 0)
+      return 0;
+
+   AcquireEventSink &Sink = GetCpp<AcquireEventSink>(self);
+   std::vector<AcquireEventSink::Event> Drained;
+   {
+      std::lock_guard<std::mutex> Guard(Sink.Lock);
+      size_t N = Sink.Count;
+      if (max_events >= 0 && (size_t) max_events < N)
+         N = max_events;
+      Drained.reserve(N);
+      for (size_t I = 0; I < N; I++) {
+         Drained.push_back(std::move(Sink.Events[Sink.First]));
+         Sink.First = (Sink.First + 1) % Sink.Capacity;
+      }
+      Sink.Count -= N;
+      if (Sink.Count == 0) {
+         Sink.Events.clear();
+         Sink.First = 0;
+      }
+   }
+
+   PyObject *List = PyList_New(Drained.size());
+   if (List == NULL)
+      return NULL;
+   for (size_t I = 0; I < Drained.size(); I++) {
+      AcquireEventSink::Event &E = Drained[I];
+      PyObject *Tuple = Py_BuildValue("(sNNNNNN)", EventKindName(E.Kind),
+                                      CppPyString(E.URI),
+                                      CppPyString(E.Description),
+                                      CppPyString(E.ShortDesc),
+                                      MkPyNumber(E.FileSize),
+                                      MkPyNumber(E.PartialSize),
+                                      CppPyString(E.ErrorText));
+      if (Tuple == NULL) {
+         Py_DECREF(List);
+         return NULL;
+      }
+      PyList_SET_ITEM(List, I, Tuple);
+   }
+   return List;
+}
+
+static PyObject *acquireeventsink_snapshot(PyObject *self, PyObject *args)
+{
+   if (PyArg_ParseTuple(args, "") == 0)
+      return 0;
+
+   // Copy the state, so no Python code runs while the lock is held
+   AcquireEventSink &Sink = GetCpp<AcquireEventSink>(self);
+   std::unique_lock<std::mutex> Guard(Sink.Lock);
+   unsigned long long CurrentBytes = Sink.CurrentBytes;
+   unsigned long long TotalBytes = Sink.TotalBytes;
+   unsigned long long FetchedBytes = Sink.FetchedBytes;
+   unsigned long long CurrentCPS = Sink.CurrentCPS;
+   unsigned long long ElapsedTime = Sink.ElapsedTime;
+   unsigned long long CurrentItems = Sink.CurrentItems;
+   unsigned long long TotalItems = Sink.TotalItems;
+   unsigned long long Pulses = Sink.Pulses;
+   unsigned long long Dropped = Sink.Dropped;
+   bool Running = Sink.Running;
+   std::vector<AcquireEventSink::WorkerState> Workers = Sink.Workers;
+   Guard.unlock();
+
+   PyObject *List = PyList_New(Workers.size());
+   for (size_t I = 0; List != NULL && I < Workers.size(); I++) {
+      AcquireEventSink::WorkerState &W = Workers[I];
+      PyObject *Worker = Py_BuildValue(
+         "{sNsNsNsNsN}",
+         "status", CppPyString(W.Status),
+         "uri", CppPyString(W.URI),
+         "short_desc", CppPyString(W.ShortDesc),
+         "current_size", MkPyNumber(W.CurrentSize),
+         "total_size", MkPyNumber(W.TotalSize));
+      if (Worker == NULL)
+         Py_CLEAR(List);
+      else
+         PyList_SET_ITEM(List, I, Worker);
+   }
+   if (List == NULL)
+      return NULL;
+
+   return Py_BuildValue(
+      "{sNsNsNsNsNsNsNsNsNsNsN}",
+      "current_bytes", MkPyNumber(CurrentBytes),
+      "total_bytes", MkPyNumber(TotalBytes),
+      "fetched_bytes", MkPyNumber(FetchedBytes),
+      "current_cps", MkPyNumber(CurrentCPS),
+      "elapsed_time", MkPyNumber(ElapsedTime),
+      "current_items", MkPyNumber(CurrentItems),
+      "total_items", MkPyNumber(TotalItems),
+      "pulses", MkPyNumber(Pulses),
+      "running", PyBool_FromLong(Running),
+      "dropped", MkPyNumber(Dropped),
+      "workers", List);
+}
+
+static PyObject *acquireeventsink_cancel(PyObject *self, PyObject *args)
+{
+   if (PyArg_ParseTuple(args, "") == 0)
+      return 0;
+   GetCpp<AcquireEventSink>(self).Cancelled = true;
+   Py_RETURN_NONE;
+}
+
+static PyObject *acquireeventsink_get_cancelled(PyObject *self, void *)
+{
+   return PyBool_FromLong(GetCpp<AcquireEventSink>(self).Cancelled);
+}
+
+static PyObject *acquireeventsink_get_capacity(PyObject *self, void *)
+{
+   return MkPyNumber(GetCpp<AcquireEventSink>(self).Capacity);
+}
+
+static PyObject *acquireeventsink_get_pending(PyObject *self, void *)
+{
+   AcquireEventSink &Sink = GetCpp<AcquireEventSink>(self);
+   std::lock_guard<std::mutex> Guard(Sink.Lock);
+   return MkPyNumber(Sink.Count);
+}
+
+static PyMethodDef acquireeventsink_methods[] = {
+   {"drain", acquireeventsink_drain, METH_VARARGS,
+    "drain([max_events: int]) -> list\n\n"
+    "Remove up to *max_events* events from the buffer, or all of them,\n"
+    "and return them as a list of tuples (kind, uri, description,\n"
+    "short_desc, file_size, partial_size, error_text), oldest first.\n"
+    "The kind is one of 'start', 'stop', 'fetch', 'done', 'fail' and\n"
+    "'ims_hit'; error_text is only set for 'fail' events."},
+   {"snapshot", acquireeventsink_snapshot, METH_VARARGS,
+    "snapshot() -> dict\n\n"
+    "Return the state of the download as of the last pulse, as a dict\n"
+    "with the keys current_bytes, total_bytes, fetched_bytes,\n"
+    "current_cps, elapsed_time, current_items, total_items, pulses,\n"
+    "running, dropped and workers. The value of workers is a list with\n"
+    "a dict for each worker, with the keys status, uri, short_desc,\n"
+    "current_size and total_size."},
+   {"cancel", acquireeventsink_cancel, METH_VARARGS,
+    "cancel()\n\n"
+    "Cancel the download at the next pulse."},
+   {}
+};
+
+static PyGetSetDef acquireeventsink_getset[] = {
+   {"cancelled", acquireeventsink_get_cancelled, 0,
+    "Whether cancel() has been called."},
+   {"capacity", acquireeventsink_get_capacity, 0,
+    "The maximum number of events kept in the buffer."},
+   {"pending", acquireeventsink_get_pending, 0,
+    "The number of events in the buffer."},
+   {}
+};
+
+static const char *acquireeventsink_doc =
+    "AcquireEventSink([capacity: int = 4096])\n\n"
+    "A progress object recording the progress of downloads natively.\n\n"
+    "It can be passed as the progress object to Acquire() and\n"
+    "Cache.update(). Instead of calling into Python for each event, the\n"
+    "events of items are stored in a ring buffer holding up to *capacity*\n"
+    "events, dropping the oldest ones when it is full, and the state of\n"
+    "the download is stored on each pulse. Another thread can read them\n"
+    "with drain() and snapshot() at its own rate while the download runs\n"
+    "without holding the global interpreter lock.\n\n"
+    "Media changes are always refused.\n\n"
+    ".. versionadded:: 3.0";
+
+PyTypeObject PyAcquireEventSink_Type = {
+    PyVarObject_HEAD_INIT(&PyType_Type, 0)
+    "apt_pkg.AcquireEventSink",           // tp_name
+    sizeof(CppPyObject<AcquireEventSink>), // tp_basicsize
+    0,                                    // tp_itemsize
+    // Methods
+    CppDealloc<AcquireEventSink>,         // tp_dealloc
+    0,                                    // tp_print
+    0,                                    // tp_getattr
+    0,                                    // tp_setattr
+    0,                                    // tp_compare
+    0,                                    // tp_repr
+    0,                                    // tp_as_number
+    0,                                    // tp_as_sequence
+    0,                                    // tp_as_mapping
+    0,                                    // tp_hash
+    0,                                    // tp_call
+    0,                                    // tp_str
+    0,                                    // tp_getattro
+    0,                                    // tp_setattro
+    0,                                    // tp_as_buffer
+    Py_TPFLAGS_DEFAULT,                   // tp_flags
+    acquireeventsink_doc,                 // tp_doc
+    0,                                    // tp_traverse
+    0,                                    // tp_clear
+    0,                                    // tp_richcompare
+    0,                                    // tp_weaklistoffset
+    0,                                    // tp_iter
+    0,                                    // tp_iternext
+    acquireeventsink_methods,             // tp_methods
+    0,                                    // tp_members
+    acquireeventsink_getset,              // tp_getset
+    0,                                    // tp_base
+    0,                                    // tp_dict
+    0,                                    // tp_descr_get
+    0,                                    // tp_descr_set
+    0,                                    // tp_dictoffset
+    0,                                    // tp_init
+    0,                                    // tp_alloc
+    acquireeventsink_new,                 // tp_new
+};
+
+
 // install progress
 
 void PyInstallProgress::StartUpdate()
@@ -14,6 +14,10 @@
 #include <apt-pkg/packagemanager.h>
 #include <apt-pkg/cdrom.h>
 #include <Python.h>
+#include <atomic>
+#include <mutex>
+#include <string>
+#include <vector>
 
 /* PyCbObj_BEGIN_ALLOW_THREADS and PyCbObj_END_ALLOW_THREADS are sligthly
  * modified versions of Py_BEGIN_ALLOW_THREADS and Py_END_ALLOW_THREADS.
@@ -93,6 +97,95 @@ struct PyFetchProgress : public pkgAcquireStatus, public PyCallbackObj
    ~PyFetchProgress()  { Py_XDECREF(pyAcquire); };
 };
 
+/* AcquireEventSink is the data of an apt_pkg.AcquireEventSink object. The
+ * fetcher records item events into a ring buffer and updates a coalesced
+ * snapshot of the download on each pulse, without calling into Python;
+ * Python code polls the snapshot and drains the events from another thread.
+ */
+struct AcquireEventSink
+{
+   enum EventKind {
+      EventStart, EventStop, EventFetch, EventDone, EventFail, EventHit
+   };
+   struct Event {
+      EventKind Kind;
+      std::string URI;
+      std::string Description;
+      std::string ShortDesc;
+      std::string ErrorText;
+      unsigned long long FileSize;
+      unsigned long long PartialSize;
+   };
+   struct WorkerState {
+      std::string Status;
+      std::string URI;
+      std::string ShortDesc;
+      unsigned long long CurrentSize;
+      unsigned long long TotalSize;
+   };
+
+   std::mutex Lock;
+   // Ring buffer of events, the oldest one at First
+   std::vector<Event> Events;
+   size_t Capacity;
+   size_t First;
+   size_t Count;
+   unsigned long long Dropped;
+   // Snapshot of the download, updated on each pulse
+   unsigned long long CurrentBytes;
+   unsigned long long TotalBytes;
+   unsigned long long FetchedBytes;
+   unsigned long long CurrentCPS;
+   unsigned long long ElapsedTime;
+   unsigned long long CurrentItems;
+   unsigned long long TotalItems;
+   unsigned long long Pulses;
+   bool Running;
+   std::vector<WorkerState> Workers;
+   std::atomic<bool> Cancelled;
+
+   void Push(Event &&E);
+
+   AcquireEventSink() : Capacity(4096), First(0), Count(0), Dropped(0),
+      CurrentBytes(0), TotalBytes(0), FetchedBytes(0), CurrentCPS(0),
+      ElapsedTime(0), CurrentItems(0), TotalItems(0), Pulses(0),
+      Running(false), Cancelled(false) {};
+};
+
+/* Acquire status writing into an AcquireEventSink. Like PyFetchProgress,
+ * it releases the GIL between Start() and Stop(), but never takes it back
+ * in between.
+ */
+struct PySinkFetchProgress : public pkgAcquireStatus
+{
+   protected:
+   PyObject *sinkObj;
+   PyThreadState *_save;
+   AcquireEventSink &Sink();
+   void Record(AcquireEventSink::EventKind Kind, pkgAcquire::ItemDesc &Itm);
+   public:
+
+   virtual bool MediaChange(std::string Media, std::string Drive);
+   virtual void IMSHit(pkgAcquire::ItemDesc &Itm);
+   virtual void Fetch(pkgAcquire::ItemDesc &Itm);
+   virtual void Done(pkgAcquire::ItemDesc &Itm);
+   virtual void Fail(pkgAcquire::ItemDesc &Itm);
+   virtual void Start();
+   virtual void Stop();
+
+   bool Pulse(pkgAcquire * Owner);
+   PySinkFetchProgress(PyObject *sink) : sinkObj(sink), _save(0) {
+      Py_INCREF(sinkObj);
+   };
+   ~PySinkFetchProgress()  { Py_DECREF(sinkObj); };
+};
+
+/* Create the acquire status for the progress object passed from Python,
+ * which is either an apt_pkg.AcquireEventSink or an object implementing
+ * the interface of apt.progress.base.AcquireProgress.
+ */
+pkgAcquireStatus *PyFetchProgress_New(PyObject *progress);
+
 struct PyInstallProgress : public PyCallbackObj
 {
    void StartUpdate();
@@ -346,6 +346,10 @@ static PyObject *TagFileStep(PyObject *Self,PyObject *Args)
    TagFileData &Obj = *(TagFileData *)Self;
    if (Obj.Object.Step(Obj.Section->Object) == false)
       return HandleErrors(PyBool_FromLong(0));
+   if (PyAptStats.Enabled) {
+      PyAptStats.TagSections++;
+      PyAptStats.TagBytes += Obj.Section->Object.size();
+   }
 
    return HandleErrors(PyBool_FromLong(1));
 }
@@ -379,6 +383,10 @@ static PyObject *TagFileNext(PyObject *Self)
    const char *Start;
    const char *Stop;
    Obj.Section->Object.GetSection(Start,Stop);
+   if (PyAptStats.Enabled) {
+      PyAptStats.TagSections++;
+      PyAptStats.TagBytes += Stop - Start;
+   }
    // Duplicate the data and
    //  append a \n because GetSection() will only give us a single \n
    //  but Scan() needs \n\n to work
@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Benchmark apt.Cache.closure() and reverse_closure().
+
+The closures of every package of the test root directories are computed,
+and those of a generated status file in which every package depends on
+the following ones, with or-groups, and on a hub package like libc6.
+The native closures are compared to walking Version.dependencies in
+Python, which is what callers had to do before.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from test_all import get_library_dir  # noqa: E402
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import apt_pkg  # noqa: E402
+
+import apt  # noqa: E402
+from suite import write_installed  # noqa: E402
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data")
+
+
+def write_status_file(path, count):
+    with open(path, "w") as fobj:
+        write_installed(fobj, "hub", "1")
+        for i in range(count):
+            depends = "hub, pkg%d | pkg%d, pkg%d (>= 1)" % (
+                (i + 1) % count, (i + 2) % count, (i * 7 + 3) % count
+            )
+            write_installed(fobj, "pkg%d" % i, "1.%d" % i, depends=depends)
+
+
+def python_closure(cache, pkg):
+    """Walk the dependencies of the candidates in Python."""
+    seen = {pkg.id}
+    todo = [pkg]
+    while todo:
+        cand = todo.pop().candidate
+        if cand is None:
+            continue
+        for dep in cand.dependencies:
+            for base in dep:
+                for ver in base.target_versions:
+                    if ver.package.id not in seen:
+                        seen.add(ver.package.id)
+                        todo.append(ver.package)
+    return seen
+
+
+def measure(label, func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    print("%-40s min %.4fs, max %.4fs" % (label, min(timings), max(timings)))
+
+
+def bench_cache(name, cache, repeat):
+    pkgs = list(cache)
+    print("%s: %d packages" % (name, len(pkgs)))
+
+    def native():
+        cache._closures.clear()
+        for pkg in pkgs:
+            cache.closure([pkg])
+
+    def memoized():
+        for pkg in pkgs:
+            cache.closure([pkg])
+
+    def reverse():
+        cache._closures.clear()
+        for pkg in pkgs:
+            cache.reverse_closure([pkg])
+
+    measure("  closure() of each package", native, repeat)
+    measure("  closure() of each package, memoized", memoized, repeat)
+    measure("  reverse_closure() of each package", reverse, repeat)
+    if len(pkgs) <= 1000:
+        measure(
+            "  Python walk of each package",
+            lambda: [python_closure(cache, pkg) for pkg in pkgs],
+            repeat,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--packages", type=int, default=20000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for root in ["test_debs", "test-provides"]:
+        config = apt_pkg.Configuration()
+        apt_pkg.init_config(config)
+        cache = apt.Cache(rootdir=os.path.join(DATA, root), memonly=True, config=config)
+        bench_cache(root, cache, args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        status = os.path.join(tmpdir, "status")
+        write_status_file(status, args.packages)
+        apt_pkg.init_config()
+        apt_pkg.config["Dir::Etc::SourceList"] = "/dev/null"
+        apt_pkg.config["Dir::Etc::SourceParts"] = "/dev/null"
+        apt_pkg.config["Dir::State::Status"] = status
+        apt_pkg.init_system()
+        cache = apt.Cache(memonly=True)
+
+        hub = cache["hub"]
+        first = cache["pkg0"]
+        print("generated: %d packages" % len(cache))
+        measure(
+            "  closure() of one package",
+            lambda: (cache._closures.clear(), cache.closure([first])),
+            args.repeat,
+        )
+        measure(
+            "  reverse_closure() of the hub",
+            lambda: (cache._closures.clear(), cache.reverse_closure([hub])),
+            args.repeat,
+        )
+        measure(
+            "  Python walk of one package",
+            lambda: python_closure(cache, first),
+            args.repeat,
+        )
+
+
+if __name__ == "__main__":
+    main()
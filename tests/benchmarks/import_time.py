@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Benchmark the time it takes to import apt in a new interpreter.
+
+The statement is run in a fresh interpreter each time, and the best time
+is compared to the budget; the exit status is 1 if it is exceeded.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from test_all import get_library_dir  # noqa: E402
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-r", "--repeat", type=int, default=10)
+    parser.add_argument(
+        "-b", "--budget", type=float, default=0.05, help="seconds (default: 0.05)"
+    )
+    parser.add_argument("statement", nargs="?", default="import apt")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    baseline = []
+    timings = []
+    for _ in range(args.repeat):
+        for statement, results in (("pass", baseline), (args.statement, timings)):
+            start = time.perf_counter()
+            subprocess.check_call([sys.executable, "-c", statement], env=env)
+            results.append(time.perf_counter() - start)
+
+    elapsed = min(timings) - min(baseline)
+    print(
+        "%s: %.3fs (interpreter: %.3fs, budget: %.3fs)"
+        % (args.statement, elapsed, min(baseline), args.budget)
+    )
+    if elapsed > args.budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Benchmark the latency of apt.Cache.open() with many live wrappers.
+
+A status file with the requested number of installed packages is
+generated, and a Package and a Version wrapper is kept alive for each
+of them while the cache is reopened. This is the situation of a long
+running daemon that holds on to wrappers across update() + open().
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from test_all import get_library_dir  # noqa: E402
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import apt_pkg  # noqa: E402
+
+import apt  # noqa: E402
+from suite import write_installed  # noqa: E402
+
+
+def write_status_file(path, count):
+    with open(path, "w") as fobj:
+        for i in range(count):
+            write_installed(
+                fobj,
+                "pkg%d" % i,
+                "1.%d" % i,
+                depends="pkg%d" % ((i + 1) % count),
+                description="benchmark package %d" % i,
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--packages", type=int, default=100000)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        status = os.path.join(tmpdir, "status")
+        write_status_file(status, args.packages)
+        apt_pkg.init_config()
+        apt_pkg.config["Dir::Etc::SourceList"] = "/dev/null"
+        apt_pkg.config["Dir::Etc::SourceParts"] = "/dev/null"
+        apt_pkg.config["Dir::State::Status"] = status
+        apt_pkg.init_system()
+
+        cache = apt.Cache(memonly=True)
+        start = time.perf_counter()
+        wrappers = [(pkg, pkg.installed) for pkg in cache]
+        elapsed = time.perf_counter() - start
+        print("create %d wrappers: %.3fs" % (len(wrappers), elapsed))
+
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            cache.open()
+            timings.append(time.perf_counter() - start)
+
+        for pkg, ver in wrappers:
+            assert ver is not None and ver._cand.parent_pkg.id == pkg.id
+        print("reopen: min %.3fs, max %.3fs" % (min(timings), max(timings)))
+
+
+if __name__ == "__main__":
+    main()
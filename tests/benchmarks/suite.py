@@ -0,0 +1,306 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Benchmark the hot paths of apt and apt_pkg on a synthetic repository.
+
+A flat repository laid out like tests/data/test-repo is generated with the
+requested number of packages, dependencies per package and share of
+packages built for a foreign architecture too, and fetched into a root
+directory with the copy method, so everything runs offline. A part of the
+packages is installed in older versions, so that there is something to
+upgrade. The generation is seeded, so runs with the same options use the
+same repository.
+
+The results are printed, and written as JSON with --output. With
+--baseline, the best time of each benchmark is compared to the one in a
+stored result file, and the exit status is 1 if any of them is slower by
+more than the tolerance.
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from test_all import get_library_dir  # noqa: E402
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import apt_pkg  # noqa: E402
+
+import apt  # noqa: E402
+import apt.debfile  # noqa: E402
+import aptsources.sourceslist  # noqa: E402
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+NATIVE = "amd64"
+FOREIGN = "i386"
+
+
+def write_installed(fobj, name, version, arch="all", depends=None, description=None):
+    """Write the status file stanza of an installed package to *fobj*."""
+    print("Package:", name, file=fobj)
+    print("Status: install ok installed", file=fobj)
+    print("Architecture:", arch, file=fobj)
+    print("Version:", version, file=fobj)
+    if depends:
+        print("Depends:", depends, file=fobj)
+    if description:
+        print("Description:", description, file=fobj)
+    print("", file=fobj)
+
+
+def write_repository(repo, status, args):
+    """Write the Packages files of *repo* and the status file *status*."""
+    rng = random.Random(args.seed)
+    count = args.packages
+    names = ["pkg%d" % i for i in range(count)]
+    os.makedirs(repo)
+    packages = open(os.path.join(repo, "Packages"), "w")
+    installed = open(status, "w")
+    with packages, installed:
+        for i, name in enumerate(names):
+            # Depend on packages with higher numbers only, so that the
+            # dependencies can always be satisfied
+            relations = []
+            later = count - i - 1
+            for _ in range(min(later, int(rng.expovariate(1 / args.density)))):
+                target = names[i + 1 + rng.randrange(later)]
+                if rng.random() < 0.2 and i + 2 < count:
+                    relations.append("%s | %s" % (target, names[-1]))
+                elif rng.random() < 0.3:
+                    relations.append("%s (>= 1)" % target)
+                else:
+                    relations.append(target)
+            archs = ["all"]
+            if rng.random() < args.multiarch:
+                archs = [NATIVE, FOREIGN]
+            for arch in archs:
+                print("Package:", name, file=packages)
+                print("Priority: optional", file=packages)
+                print("Section: misc", file=packages)
+                print("Installed-Size: %d" % rng.randrange(10000), file=packages)
+                print("Maintainer: Bench <bench@example.invalid>", file=packages)
+                print("Architecture:", arch, file=packages)
+                if arch != "all":
+                    print("Multi-Arch: same", file=packages)
+                print("Version: 2.%d" % i, file=packages)
+                if relations:
+                    print("Depends:", ", ".join(relations), file=packages)
+                print("Filename: pool/%s_2.%d_%s.deb" % (name, i, arch), file=packages)
+                print("Size: %d" % rng.randrange(1000, 1000000), file=packages)
+                print("SHA256:", "%064x" % rng.getrandbits(256), file=packages)
+                print("Description: benchmark package number %d" % i, file=packages)
+                print(" A package generated by the benchmark suite.", file=packages)
+                print("Homepage: https://example.invalid/%s" % name, file=packages)
+                print("", file=packages)
+            if rng.random() < args.installed:
+                write_installed(
+                    installed,
+                    name,
+                    "1.%d" % i,
+                    archs[0],
+                    description="benchmark package number %d" % i,
+                )
+
+    with open(os.path.join(repo, "Packages"), "rb") as plain:
+        with gzip.open(os.path.join(repo, "Packages.gz"), "wb") as compressed:
+            compressed.write(plain.read())
+
+
+def setup_root(tmpdir, args):
+    """Create the root directory and return a cache opened on it."""
+    rootdir = os.path.join(tmpdir, "root")
+    repo = os.path.join(tmpdir, "repo")
+    os.makedirs(os.path.join(rootdir, "etc/apt"))
+    os.makedirs(os.path.join(rootdir, "var/lib/dpkg"))
+    write_repository(repo, os.path.join(rootdir, "var/lib/dpkg/status"), args)
+    with open(os.path.join(rootdir, "etc/apt/sources.list"), "w") as fobj:
+        print("deb [allow-insecure=yes] copy:%s /" % repo, file=fobj)
+
+    apt_pkg.init_config()
+    apt_pkg.config.set("APT::Architecture", NATIVE)
+    apt_pkg.config.clear("APT::Architectures")
+    apt_pkg.config.set("APT::Architectures::", NATIVE)
+    apt_pkg.config.set("APT::Architectures::", FOREIGN)
+    apt_pkg.config.clear("APT::Update::Post-Invoke")
+    apt_pkg.config.clear("APT::Update::Post-Invoke-Success")
+    cache = apt.Cache(rootdir=rootdir)
+    cache.update()
+    cache.open()
+    return cache, repo
+
+
+def measure(results, name, func, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    results[name] = {"min": min(timings), "median": median, "repeat": repeat}
+    print("%-28s min %.4fs, median %.4fs" % (name, min(timings), median))
+
+
+def run(cache, repo, tmpdir, args):
+    results = {}
+    repeat = args.repeat
+    rng = random.Random(args.seed)
+    sample = rng.sample(sorted(cache.keys()), min(args.sample, len(cache)))
+
+    measure(results, "Cache.open", cache.open, repeat)
+    measure(results, "Cache.__iter__", lambda: [pkg for pkg in cache], repeat)
+    measure(results, "Cache.keys", cache.keys, repeat)
+
+    def records():
+        fields = []
+        for name in sample:
+            cand = cache[name].candidate
+            if cand is not None:
+                fields.append(
+                    (cand.summary, cand.description, cand.homepage, cand.record)
+                )
+        return fields
+
+    # Drop the wrappers, which cache some of the record fields
+    measure(results, "record properties", records, repeat, setup=cache.open)
+
+    measure(
+        results,
+        "Cache.upgrade(dist_upgrade)",
+        lambda: cache.upgrade(dist_upgrade=True),
+        repeat,
+        setup=cache.clear,
+    )
+    changes = cache.get_changes()
+    print("  %d changes" % len(changes))
+    measure(results, "Cache.get_changes", cache.get_changes, repeat)
+    cache.clear()
+
+    def tagfile():
+        with apt_pkg.TagFile(os.path.join(repo, "Packages")) as tagfile:
+            return [section["Package"] for section in tagfile]
+
+    measure(results, "TagFile iteration", tagfile, repeat)
+
+    parts = os.path.join(tmpdir, "sources.list.d")
+    os.mkdir(parts)
+    for i in range(args.sources):
+        with open(os.path.join(parts, "source%d.list" % i), "w") as fobj:
+            print("deb http://example.invalid/%d stable main contrib" % i, file=fobj)
+            print("deb-src http://example.invalid/%d stable main" % i, file=fobj)
+    old_parts = apt_pkg.config.find("Dir::Etc::sourceparts")
+    apt_pkg.config.set("Dir::Etc::sourceparts", parts)
+    try:
+        measure(
+            results,
+            "SourcesList()",
+            lambda: aptsources.sourceslist.SourcesList(withMatcher=False),
+            repeat,
+        )
+    finally:
+        apt_pkg.config.set("Dir::Etc::sourceparts", old_parts)
+
+    deb = apt.debfile.DebPackage(
+        os.path.join(DATA, "test_debs", "gdebi-test1.deb"), cache
+    )
+    measure(results, "DebPackage.check", deb.check, repeat)
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Print the regressions of *results* against *baseline*."""
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        old = baseline[name]["min"]
+        new = result["min"]
+        if new > old * (1 + tolerance) and new - old > min_delta:
+            regressions.append(name)
+            print(
+                "REGRESSION %-28s %.4fs -> %.4fs (%+.0f%%)"
+                % (name, old, new, (new / old - 1) * 100)
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--packages", type=int, default=10000)
+    parser.add_argument(
+        "-d", "--density", type=float, default=3.0, help="dependencies per package"
+    )
+    parser.add_argument(
+        "-m",
+        "--multiarch",
+        type=float,
+        default=0.2,
+        help="share of packages built for %s and %s too" % (NATIVE, FOREIGN),
+    )
+    parser.add_argument(
+        "-i", "--installed", type=float, default=0.3, help="share of packages installed"
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument(
+        "--sample", type=int, default=2000, help="packages whose records are read"
+    )
+    parser.add_argument(
+        "--sources", type=int, default=200, help="sources.list files to parse"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    parser.add_argument("-b", "--baseline", help="compare to a stored result")
+    parser.add_argument(
+        "-t", "--tolerance", type=float, default=0.25, help="allowed slowdown"
+    )
+    parser.add_argument(
+        "--min-delta", type=float, default=0.002, help="ignored slowdown in seconds"
+    )
+    args = parser.parse_args()
+
+    params = {
+        key: getattr(args, key)
+        for key in ["packages", "density", "multiarch", "installed", "sample"]
+    }
+    params.update(sources=args.sources, seed=args.seed)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache, repo = setup_root(tmpdir, args)
+        print("%d packages, %d versions" % (len(cache), cache._cache.version_count))
+        results = run(cache, repo, tmpdir, args)
+
+    document = {
+        "params": params,
+        "python": platform.python_version(),
+        "apt": apt_pkg.VERSION,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as fobj:
+            json.dump(document, fobj, indent=2, sort_keys=True)
+            fobj.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as fobj:
+            baseline = json.load(fobj)
+        if baseline.get("params") != params:
+            print("warning: the baseline was run with %s" % baseline.get("params"))
+        if compare(results, baseline["results"], args.tolerance, args.min_delta):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
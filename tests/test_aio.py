@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Unit tests for apt.aio."""
+import asyncio
+import os
+import sys
+import threading
+import unittest
+
+from test_all import get_library_dir
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import apt_pkg
+import testcommon
+
+import apt
+import apt.aio
+
+
+class TestOperation(testcommon.TestCase):
+    def test_events_and_result(self):
+        def run(operation):
+            for i in range(3):
+                operation._emit(apt.aio.ProgressEvent("pulse", percent=i * 50.0))
+            return 42
+
+        async def main():
+            operation = apt.aio.Operation(run)
+            events = [event async for event in operation]
+            self.assertEqual([event.percent for event in events], [0.0, 50.0, 100.0])
+            self.assertEqual(await operation, 42)
+            # The iteration stays finished
+            self.assertEqual([event async for event in operation], [])
+
+        asyncio.run(main())
+
+    def test_exception(self):
+        def run(operation):
+            raise apt.cache.FetchFailedException("failed")
+
+        async def main():
+            with self.assertRaises(apt.cache.FetchFailedException):
+                await apt.aio.Operation(run)
+
+        asyncio.run(main())
+
+    def test_cancel(self):
+        started = threading.Event()
+
+        def run(operation):
+            started.set()
+            while not operation.cancelled:
+                operation._cancel.wait(0.01)
+            return "cancelled"
+
+        async def main():
+            operation = apt.aio.Operation(run)
+            task = asyncio.ensure_future(operation.wait())
+            await asyncio.get_running_loop().run_in_executor(None, started.wait)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertTrue(operation.cancelled)
+            self.assertEqual(await operation, "cancelled")
+
+        asyncio.run(main())
+
+
+class TestUpdateAsync(testcommon.TestCase):
+    def setUp(self):
+        testcommon.TestCase.setUp(self)
+        basedir = os.path.abspath(os.path.dirname(__file__))
+        apt_pkg.config.set("APT::Architecture", "amd64")
+        apt_pkg.config.set("Dir::Etc", basedir)
+        apt_pkg.config.set("Dir::Etc::sourceparts", "/dev/null")
+        apt_pkg.config.set("Dir::Etc::preferencesparts", "/dev/null")
+        if not os.path.exists("./tmp/partial"):
+            os.makedirs("./tmp/partial")
+        apt_pkg.config.set("Dir::state::lists", "./tmp")
+        deb_line = "deb [allow-insecure=yes] file:%s/data/fake-packages/ /\n" % basedir
+        with open("fetch_sources.list", "w") as fobj:
+            fobj.write(deb_line)
+        apt_pkg.config.set("Dir::Etc::sourcelist", "fetch_sources.list")
+        apt_pkg.config.clear("APT::Update::Post-Invoke")
+        apt_pkg.config.clear("APT::Update::Post-Invoke-Success")
+
+    def test_update_async(self):
+        cache = apt.Cache()
+
+        async def main():
+            operation = cache.update_async()
+            kinds = [event.kind async for event in operation]
+            self.assertTrue(await operation)
+            return kinds
+
+        kinds = asyncio.run(main())
+        self.assertEqual(kinds[0], "start")
+        self.assertEqual(kinds[-1], "stop")
+
+
+if __name__ == "__main__":
+    unittest.main()
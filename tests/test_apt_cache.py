@@ -14,6 +14,7 @@ import os
 import shutil
 import sys
 import tempfile
+import threading
 import unittest
 
 from test_all import get_library_dir
@@ -120,6 +121,20 @@ class TestAptCache(testcommon.TestCase):
         self.assertTrue("postfix" in [p.name for p in li])
         self.assertTrue("mail-transport-agent" in cache["postfix"].candidate.provides)
 
+        # The providers are kept until the next change
+        self.assertIs(li[0], cache.get_providing_packages("mail-transport-agent")[0])
+        self.assertIn("mail-transport-agent", cache._candidate_providers)
+        self.assertTrue(cache.is_virtual_package("mail-transport-agent"))
+        self.assertFalse(cache.is_virtual_package("postfix"))
+        self.assertFalse(cache.is_virtual_package("no-such-package"))
+        self.assertEqual(cache.get_providing_packages("no-such-package"), [])
+        cache["postfix"].mark_install()
+        self.assertNotIn("mail-transport-agent", cache._candidate_providers)
+        self.assertEqual(
+            {p.name for p in cache.get_providing_packages("mail-transport-agent")},
+            {p.name for p in li},
+        )
+
     def test_low_level_pkg_provides(self):
         apt.apt_pkg.config.set("Apt::architecture", "i386")
         # create highlevel cache and get the lowlevel one from it
@@ -139,6 +154,65 @@ class TestAptCache(testcommon.TestCase):
         else:
             self.assertNotReached()
 
+    def test_cache_config(self):
+        """cache: caches with their own configuration leave apt_pkg.config alone"""
+        old_dir = apt_pkg.config.find_dir("Dir")
+        caches = {}
+
+        def open_cache(rootdir):
+            config = apt_pkg.Configuration()
+            apt_pkg.init_config(config)
+            config.set("APT::Architecture", "i386")
+            config.clear("APT::Architectures")
+            caches[rootdir] = apt.Cache(rootdir=rootdir, config=config)
+
+        threads = [
+            threading.Thread(target=open_cache, args=(rootdir,))
+            for rootdir in ("./data/test-provides", "./data/test_debs")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(apt_pkg.config.find_dir("Dir"), old_dir)
+        provides = caches["./data/test-provides"]
+        debs = caches["./data/test_debs"]
+        self.assertIsNot(provides.config, apt_pkg.config)
+        self.assertTrue(provides.config.find_dir("Dir").endswith("/test-provides/"))
+        self.assertIn("postfix", provides)
+        self.assertNotIn("autotools-dev", provides)
+        self.assertIn("autotools-dev", debs)
+        self.assertNotIn("postfix", debs)
+
+        # Reopening keeps using the configuration of the cache
+        debs.open()
+        self.assertIn("autotools-dev", debs)
+        self.assertNotIn("postfix", debs)
+
+    def test_thread_records(self):
+        """cache: records objects of other threads are freed with the thread"""
+        config = apt_pkg.Configuration()
+        apt_pkg.init_config(config)
+        config.set("APT::Architecture", "i386")
+        config.clear("APT::Architectures")
+        cache = apt.Cache(rootdir="./data/test_debs", config=config)
+        records = []
+
+        def read_records():
+            records.append(cache._get_records())
+            records.append(cache._get_records())
+
+        thread = threading.Thread(target=read_records)
+        thread.start()
+        thread.join()
+        self.assertIs(records[0], records[1])
+        self.assertIsNot(records[0], cache._get_records())
+        self.assertIs(cache._get_records(), cache._records)
+        del records[1]
+        # Only the list still refers to the records object of the thread
+        self.assertEqual(sys.getrefcount(records[0]), 2)
+
     @if_sources_list_is_readable
     def test_dpkg_journal_dirty(self):
         # create tmp env
@@ -283,21 +357,6 @@ class TestAptCache(testcommon.TestCase):
         self.assertRaises(ValueError, new_depcache.set_candidate_ver, new_pkg, old_ver)
         new_depcache.set_candidate_ver(new_pkg, new_ver)
 
-    @staticmethod
-    def write_status_file(packages):
-        with open(apt_pkg.config["Dir::State::Status"], "w") as fobj:
-            for package in packages:
-                print("Package:", package, file=fobj)
-                print("Status: install ok installed", file=fobj)
-                print("Priority: optional", file=fobj)
-                print("Section: admin", file=fobj)
-                print("Installed-Size: 1", file=fobj)
-                print("Maintainer: X <x@x.invalid>", file=fobj)
-                print("Architecture: all", file=fobj)
-                print("Version: 1", file=fobj)
-                print("Description: blah", file=fobj)
-                print("", file=fobj)
-
     def test_apt_cache_reopen_is_safe_out_of_bounds(self):
         """Check that out of bounds access is remapped correctly."""
         with tempfile.NamedTemporaryFile() as status:
@@ -384,6 +443,179 @@ class TestAptCache(testcommon.TestCase):
             c["a"].mark_delete()
             self.assertEqual([c["a"]], [p for p in c if p.marked_delete])
 
+    def test_apt_cache_identity_map(self):
+        """Check that lookups return the same wrapper, also after reopen."""
+        with tempfile.NamedTemporaryFile() as status:
+            apt_pkg.config["Dir::Etc::SourceList"] = "/dev/null"
+            apt_pkg.config["Dir::Etc::SourceParts"] = "/dev/null"
+            apt_pkg.config["Dir::State::Status"] = status.name
+            apt_pkg.init_system()
+
+            self.write_status_file("abcdefghijklmnopqrstuvwxyz")
+            c = apt.Cache()
+            p = c["z"]
+            self.assertIs(p, c["z"])
+            self.assertIs(p, [pkg for pkg in c if pkg.name == "z"][0])
+            self.assertIs(p, c._rawpkg_to_pkg(c._cache["z"]))
+
+            self.write_status_file("xyz")
+            apt_pkg.init_system()
+            c.open()
+            self.assertIs(p, c["z"])
+            self.assertEqual(p.id, c._cache["z"].id)
+
+    def test_installed_files_after_change(self):
+        """Check that changes by dpkg after loading the file index are seen."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.mkdir(os.path.join(tmpdir, "info"))
+            apt_pkg.config["Dir::Etc::SourceList"] = "/dev/null"
+            apt_pkg.config["Dir::Etc::SourceParts"] = "/dev/null"
+            apt_pkg.config["Dir::State::Status"] = os.path.join(tmpdir, "status")
+            apt_pkg.config["Dir::Cache::fileindex"] = os.path.join(
+                tmpdir, "fileindex.bin"
+            )
+            apt_pkg.init_system()
+
+            def write_list(name, files):
+                path = os.path.join(tmpdir, "info", name + ".list")
+                with open(path, "w") as fobj:
+                    fobj.write("\n".join(files) + "\n")
+                os.utime(path, ns=(len(files), len(files)))
+
+            self.write_status_file("ab")
+            write_list("a", ["/.", "/usr/bin/a"])
+            c = apt.Cache()
+            self.assertEqual(c.file_index.owners("/usr/bin/a"), ["a"])
+            self.assertEqual(c["a"].installed_files, ["/.", "/usr/bin/a"])
+
+            write_list("a", ["/.", "/usr/bin/a", "/usr/bin/a2"])
+            self.assertEqual(
+                c["a"].installed_files, ["/.", "/usr/bin/a", "/usr/bin/a2"]
+            )
+
+            write_list("b", ["/.", "/usr/bin/b"])
+            c.open()
+            self.assertEqual(c.file_index.owners("/usr/bin/b"), ["b"])
+
+    def test_records_for(self):
+        """Check that records_for() prefetches the records of versions."""
+        apt_pkg.config.set("APT::Architecture", "i386")
+        apt_pkg.config.clear("APT::Architectures")
+        apt_pkg.config.set("Dir::State::status", "./data/test_debs/var/lib/dpkg/status")
+        apt_pkg.config.set("Dir::State::lists", "./data/test_debs/var/lib/apt/lists")
+        apt_pkg.config.set(
+            "Dir::Etc::sourcelist", "./data/test_debs/etc/apt/sources.list"
+        )
+        apt_pkg.init_system()
+        cache = apt.Cache()
+        ver = cache["autotools-dev"].candidate
+        (fields,) = cache.records_for([ver], ["filename", "homepage", "sha256"])
+        self.assertEqual(
+            fields["filename"],
+            "pool/main/a/autotools-dev/autotools-dev_20100122.1_all.deb",
+        )
+        self.assertEqual(fields["homepage"], "http://savannah.gnu.org/projects/config/")
+        self.assertEqual(fields["sha256"], ver.sha256)
+        self.assertEqual(
+            set(ver._record_cache or ()), {"filename", "homepage", "sha256"}
+        )
+        self.assertRaises(ValueError, cache.records_for, [ver], ["size"])
+
+    def test_closure(self):
+        """Check closure() and reverse_closure() on a small graph."""
+        relations = {
+            "a": "Depends: b | c, e",
+            "b": "Depends: d",
+            "c": "",
+            "d": "",
+            "e": "Recommends: f",
+            "f": "Depends: mta",
+            "g": "Provides: mta",
+            "h": "Pre-Depends: a",
+        }
+        with tempfile.NamedTemporaryFile() as status:
+            apt_pkg.config["Dir::Etc::SourceList"] = "/dev/null"
+            apt_pkg.config["Dir::Etc::SourceParts"] = "/dev/null"
+            apt_pkg.config["Dir::State::Status"] = status.name
+            apt_pkg.init_system()
+
+            self.write_status_file(relations, relations)
+            cache = apt.Cache()
+
+        names = {pkg.id: pkg.name for pkg in cache._cache.packages}
+
+        def closure(names_, **kwargs):
+            pkgs = [cache[name] for name in names_]
+            if kwargs.pop("reverse", False):
+                ids = cache.reverse_closure(pkgs, **kwargs)
+            else:
+                ids = cache.closure(pkgs, **kwargs)
+            return {names[pkg_id] for pkg_id in ids}
+
+        self.assertEqual(closure("a"), set("abcde"))
+        self.assertEqual(closure("a", or_policy="first"), set("abde"))
+        self.assertEqual(
+            closure("a", types=["Depends", "Recommends"]),
+            set("abcdefg") | {"mta"},
+        )
+        self.assertEqual(closure("cd"), set("cd"))
+        self.assertEqual(closure("d", reverse=True), set("abdh"))
+        self.assertEqual(closure("c", reverse=True), set("ach"))
+        self.assertEqual(closure("c", reverse=True, or_policy="first"), {"c"})
+        self.assertEqual(closure("g", reverse=True), set("fg"))
+
+        # Results are kept until the cache is opened again, or until it
+        # changes for the candidates, which the change may have changed
+        candidate = cache.closure([cache["a"]])
+        installed = cache.closure([cache["a"]], which="installed")
+        self.assertIs(cache.closure([cache["a"]]), candidate)
+        cache["c"].mark_delete()
+        self.assertIs(cache.closure([cache["a"]], which="installed"), installed)
+        self.assertIsNot(cache.closure([cache["a"]]), candidate)
+        self.assertEqual(cache.closure([cache["a"]]), candidate)
+        cache._cache.clear_closures()
+        self.assertEqual(cache._cache.closure([cache["a"].id]), candidate)
+        self.assertRaises(ValueError, cache._cache.clear_closures, "none")
+        self.assertRaises(ValueError, cache.closure, [cache["a"]], or_policy="any")
+        self.assertRaises(IndexError, cache._cache.closure, [len(names)])
+
+    def test_order_list_levels(self):
+        """Check the waves and edges of an OrderList."""
+        relations = {
+            "a": "Depends: b, c",
+            "b": "Pre-Depends: d",
+            "c": "Depends: e",
+            "d": "",
+            "e": "Depends: c",
+        }
+        with tempfile.NamedTemporaryFile() as status:
+            apt_pkg.config["Dir::Etc::SourceList"] = "/dev/null"
+            apt_pkg.config["Dir::Etc::SourceParts"] = "/dev/null"
+            apt_pkg.config["Dir::State::Status"] = status.name
+            apt_pkg.init_system()
+
+            self.write_status_file(relations, relations)
+            cache = apt_pkg.Cache(progress=None)
+
+        order_list = apt_pkg.OrderList(apt_pkg.DepCache(cache))
+        for pkg in cache.packages:
+            if pkg.name in relations:
+                order_list.append(pkg)
+
+        levels = [{pkg.name for pkg in wave} for wave in order_list.levels()]
+        self.assertEqual(levels, [set("cde"), {"b"}, {"a"}])
+        edges = {(a.name, b.name, typ) for a, b, typ in order_list.edges()}
+        self.assertEqual(
+            edges,
+            {
+                ("b", "a", "Depends"),
+                ("c", "a", "Depends"),
+                ("d", "b", "PreDepends"),
+                ("e", "c", "Depends"),
+                ("c", "e", "Depends"),
+            },
+        )
+
     def test_problemresolver_keep_phased_updates(self):
         """Check that the c++ function can be called."""
         with tempfile.NamedTemporaryFile() as status:
@@ -396,6 +628,81 @@ class TestAptCache(testcommon.TestCase):
             problemresolver = apt.ProblemResolver(cache)
             self.assertIsNone(problemresolver.keep_phased_updates())
 
+    def test_tracer(self):
+        """Check the spans of the cache operations."""
+        spans = []
+
+        class RecordingSpan(apt.cache.Span):
+            __slots__ = ("name", "attributes", "parent")
+
+            def __init__(self, name, attributes, parent):
+                self.name = name
+                self.attributes = dict(attributes or {})
+                self.parent = parent
+
+            def __enter__(self):
+                spans.append(self)
+                stack.append(self)
+                return self
+
+            def __exit__(self, typ, value, traceback):
+                stack.pop()
+
+            def is_recording(self):
+                return True
+
+            def set_attribute(self, key, value):
+                self.attributes[key] = value
+
+        class RecordingTracer(apt.cache.Tracer):
+            def span(self, name, attributes=None):
+                parent = stack[-1].name if stack else None
+                return RecordingSpan(name, attributes, parent)
+
+        stack = []
+        with tempfile.NamedTemporaryFile() as status:
+            apt_pkg.config["Dir::Etc::SourceList"] = "/dev/null"
+            apt_pkg.config["Dir::Etc::SourceParts"] = "/dev/null"
+            apt_pkg.config["Dir::State::Status"] = status.name
+            apt_pkg.init_system()
+
+            self.write_status_file("a")
+            cache = apt.Cache(tracer=RecordingTracer())
+            cache.upgrade(dist_upgrade=True)
+            apt.ProblemResolver(cache).resolve()
+
+        self.assertEqual(
+            [(span.name, span.parent) for span in spans],
+            [
+                ("apt.cache.open", None),
+                ("apt.cache.open.build", "apt.cache.open"),
+                ("apt.cache.open.depcache", "apt.cache.open"),
+                ("apt.cache.open.sources", "apt.cache.open"),
+                ("apt.cache.upgrade", None),
+                ("apt.cache.resolve", None),
+            ],
+        )
+        self.assertEqual(spans[0].attributes["packages"], cache._cache.package_count)
+        self.assertEqual(spans[3].attributes, {"sources": 0})
+        self.assertEqual(spans[4].attributes["dist_upgrade"], True)
+        self.assertEqual(spans[4].attributes["install_count"], 0)
+        self.assertEqual(spans[5].attributes["by_keep"], False)
+        self.assertEqual(spans[5].attributes["broken_count"], 0)
+        self.assertEqual(stack, [])
+
+        # Caches without a tracer of their own use the default one
+        cache.tracer = None
+        self.assertIs(type(cache.tracer), apt.cache.Tracer)
+        try:
+            apt.cache.set_tracer(RecordingTracer())
+            del spans[:]
+            cache.upgrade()
+            self.assertEqual([span.name for span in spans], ["apt.cache.upgrade"])
+        finally:
+            apt.cache.set_tracer(None)
+        with cache.tracer.span("noop") as span:
+            self.assertFalse(span.is_recording())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Unit tests for apt.cachediff."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from test_all import get_library_dir
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import apt_pkg
+import testcommon
+
+import apt
+from apt.cachediff import cache_diff
+
+
+class TestCacheDiff(testcommon.TestCase):
+    def setUp(self):
+        testcommon.TestCase.setUp(self)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.status = os.path.join(self.tmpdir.name, "status")
+        apt_pkg.config["Dir::Etc::SourceList"] = "/dev/null"
+        apt_pkg.config["Dir::Etc::SourceParts"] = "/dev/null"
+        apt_pkg.config["Dir::Etc::Preferences"] = "/dev/null"
+        apt_pkg.config["Dir::Etc::PreferencesParts"] = "/dev/null"
+        apt_pkg.config["Dir::State::Status"] = self.status
+        apt_pkg.config["Dir::Cache::pkgcache"] = os.path.join(
+            self.tmpdir.name, "pkgcache.bin"
+        )
+        apt_pkg.config["Dir::Cache::srcpkgcache"] = ""
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def open(self, versions):
+        self.write_status_file(versions, versions=versions)
+        apt_pkg.init_system()
+        return apt.Cache()
+
+    def test_diff(self):
+        cache = self.open({"a": "1", "b": "1", "c": "1"})
+        before = cache._cache.fingerprint()
+        self.assertTrue(before.startswith(b"apt-fingerprint 1\n"))
+        self.assertIn(b"\na:all\t1\t", before)
+        saved = os.path.join(self.tmpdir.name, "saved.bin")
+        shutil.copy(self.tmpdir.name + "/pkgcache.bin", saved)
+        self.assertEqual(apt_pkg.cache_fingerprint(saved), before)
+        self.assertFalse(cache_diff(before, cache))
+
+        cache = self.open({"a": "1", "b": "2", "d": "1"})
+        for old in [before, saved]:
+            diff = cache_diff(old, cache)
+            self.assertEqual(diff.added, ["d:all"])
+            self.assertEqual(diff.removed, ["c:all"])
+            self.assertEqual(diff.candidates, [("b:all", "1", "2")])
+            self.assertEqual(diff.installed, [("b:all", "1", "2")])
+            self.assertEqual(diff.priorities, [])
+            self.assertTrue(diff)
+
+        self.assertIs(apt.cache_diff, cache_diff)
+        self.assertRaises(ValueError, cache_diff, b"", cache)
+        self.assertRaises(
+            apt_pkg.Error, apt_pkg.cache_fingerprint, self.tmpdir.name + "/none"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
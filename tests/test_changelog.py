@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Unit tests for apt.changelog and apt.Cache.get_changelogs()."""
+import gc
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+from urllib.error import HTTPError
+
+from test_all import get_library_dir
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import apt_pkg
+import testcommon
+
+import apt
+import apt.changelog
+
+CHANGELOG = """\
+hello (2.10-1) unstable; urgency=low
+
+  * New upstream release.
+
+ -- Joe <joe@example.com>  Tue, 01 Mar 2022 10:00:00 +0000
+
+hello (2.9-1) unstable; urgency=low
+
+  * New upstream release.
+
+ -- Joe <joe@example.com>  Mon, 01 Feb 2021 10:00:00 +0000
+
+hello (1:1.0-1) unstable; urgency=low
+
+  * Initial release.
+
+ -- Joe <joe@example.com>  Fri, 01 Jan 2010 10:00:00 +0000
+"""
+
+
+class ChangelogHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        body = self.server.changelogs.get(self.path)
+        self.server.requests.append(self.path)
+        if self.path == "/slow/changelog":
+            # Let the client time out waiting for the response
+            time.sleep(0.5)
+            return
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = '"%x"' % hash(body)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestChangelog(testcommon.TestCase):
+    def setUp(self):
+        testcommon.TestCase.setUp(self)
+        self.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), ChangelogHandler
+        )
+        self.server.daemon_threads = True
+        self.server.changelogs = {"/hello_2.10-1/changelog": CHANGELOG}
+        self.server.requests = []
+        self.server.connections = 0
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.base = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.tmpdir.cleanup()
+
+    def test_truncate_changelog(self):
+        truncate = apt.changelog.truncate_changelog
+        self.assertEqual(truncate(CHANGELOG, "hello", None), CHANGELOG)
+        self.assertEqual(
+            truncate(CHANGELOG, "hello", "2.9-1"),
+            CHANGELOG[: CHANGELOG.index("hello (2.9-1)")],
+        )
+        self.assertEqual(
+            truncate(CHANGELOG, "hello", "2:1.0-1"),
+            CHANGELOG[: CHANGELOG.index("hello (1:1.0-1)")],
+        )
+        self.assertEqual(truncate(CHANGELOG, "hello", "3.0-1"), "")
+        self.assertEqual(truncate(CHANGELOG, "other", "3.0-1"), CHANGELOG)
+
+    def test_fetch(self):
+        """Changelogs are revalidated over one reused connection."""
+        uri = self.base + "/hello_2.10-1/changelog"
+        with apt.changelog.ChangelogFetcher(self.tmpdir.name) as fetcher:
+            self.assertEqual(fetcher.fetch(uri, "hello", "2.10-1"), CHANGELOG)
+            self.assertEqual(fetcher.fetch(uri, "hello", "2.10-1"), CHANGELOG)
+            self.assertRaises(
+                HTTPError, fetcher.fetch, self.base + "/x/changelog", "x", "1"
+            )
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.server.connections, 1)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, "hello_2.10-1")))
+
+        # A new fetcher revalidates the stored changelog
+        with apt.changelog.ChangelogFetcher(self.tmpdir.name) as fetcher:
+            self.assertEqual(fetcher.fetch(uri, "hello", "2.10-1"), CHANGELOG)
+        self.assertEqual(len(self.server.requests), 4)
+
+        # ...unless it is young enough
+        with apt.changelog.ChangelogFetcher(self.tmpdir.name, max_age=3600) as fetcher:
+            self.assertEqual(fetcher.fetch(uri, "hello", "2.10-1"), CHANGELOG)
+        self.assertEqual(len(self.server.requests), 4)
+
+        # Canceled downloads return None
+        cancel = threading.Event()
+        cancel.set()
+        with apt.changelog.ChangelogFetcher() as fetcher:
+            self.assertIsNone(fetcher.fetch(uri, "hello", "2.10-1", cancel))
+
+    def test_fetch_timeout(self):
+        """Connections are closed when a response times out."""
+        uri = self.base + "/hello_2.10-1/changelog"
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            with apt.changelog.ChangelogFetcher(timeout=0.1) as fetcher:
+                self.assertEqual(fetcher.fetch(uri, "hello", "2.10-1"), CHANGELOG)
+                self.assertRaises(
+                    OSError, fetcher.fetch, self.base + "/slow/changelog", "slow", "1"
+                )
+                self.assertEqual(fetcher.fetch(uri, "hello", "2.10-1"), CHANGELOG)
+            gc.collect()
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(
+            [w for w in caught if issubclass(w.category, ResourceWarning)], []
+        )
+
+    def test_get_changelogs(self):
+        apt_pkg.config.set("APT::Architecture", "i386")
+        apt_pkg.config.clear("APT::Architectures")
+        apt_pkg.config.set("Dir::State::status", "./data/test_debs/var/lib/dpkg/status")
+        apt_pkg.config.set("Dir::State::lists", "./data/test_debs/var/lib/apt/lists")
+        apt_pkg.config.set(
+            "Dir::Etc::sourcelist", "./data/test_debs/etc/apt/sources.list"
+        )
+        apt_pkg.init_system()
+        cache = apt.Cache()
+        pkg = cache["autotools-dev"]
+        path = "/{0}_{1}/changelog".format(
+            pkg.candidate.source_name, pkg.candidate.source_version
+        )
+        self.server.changelogs[path] = CHANGELOG.replace("hello", "autotools-dev")
+
+        uri = self.base + "/%(src_pkg)s_%(src_ver)s/changelog"
+        changelogs = cache.get_changelogs(
+            [pkg, pkg], concurrency=2, uri=uri, cachedir=self.tmpdir.name
+        )
+        self.assertEqual(changelogs, [self.server.changelogs[path]] * 2)
+        self.assertEqual(self.server.requests, [path])
+        self.assertEqual(pkg.get_changelog(uri), changelogs[0])
+        self.assertEqual(self.server.requests, [path])
+
+
+if __name__ == "__main__":
+    unittest.main()
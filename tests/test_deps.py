@@ -137,6 +137,57 @@ class TestDependencies(testcommon.TestCase):
         self.assertEqual(">=", apt_pkg.ParseDepends("p1 (> 1)")[0][0][2])
         self.assertEqual(">>", apt_pkg.ParseDepends("p1 (>> 1)")[0][0][2])
 
+    def test_dependency_graph(self):
+        apt_cache = apt.Cache(rootdir="./data/test_debs")
+        cache = apt_cache._cache
+        comp_types = ["", "<=", ">=", "<", ">", "=", "!="]
+        for which in "candidate", "installed", "all":
+            graph = cache.dependency_graph(["Depends", "Recommends"], which)
+            offsets = graph["offsets"]
+            self.assertEqual(len(offsets), cache.package_count + 1)
+            self.assertEqual(graph["version_strings"][0], "")
+
+            packages = {pkg.id: pkg for pkg in cache.packages}
+            for pkg_id, pkg in packages.items():
+                if which == "candidate":
+                    versions = [apt_cache._depcache.get_candidate_ver(pkg)]
+                elif which == "installed":
+                    versions = [pkg.current_ver]
+                else:
+                    versions = pkg.version_list
+                expected = []
+                for ver in filter(None, versions):
+                    for dep_type in "Depends", "Recommends":
+                        for group in ver.depends_list.get(dep_type, []):
+                            for dep in group:
+                                expected.append(
+                                    (
+                                        dep.target_pkg.id,
+                                        dep.comp_type,
+                                        dep.target_ver,
+                                        dep.dep_type_enum,
+                                        ver.id,
+                                    )
+                                )
+                edges = [
+                    (
+                        graph["targets"][i],
+                        comp_types[graph["comp_types"][i]],
+                        graph["version_strings"][graph["versions"][i]],
+                        graph["dep_types"][i],
+                        graph["parent_versions"][i],
+                    )
+                    for i in range(offsets[pkg_id], offsets[pkg_id + 1])
+                ]
+                self.assertEqual(sorted(edges), sorted(expected))
+
+        graph = cache.dependency_graph(["Depends"], "all")
+        groups = graph["or_groups"]
+        self.assertEqual(list(groups), sorted(groups))
+        self.assertRaises(ValueError, cache.dependency_graph, ["Depend"])
+        self.assertRaises(ValueError, cache.dependency_graph, which="none")
+
+
 
 if __name__ == "__main__":
     unittest.main()
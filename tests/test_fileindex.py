@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Unit tests for apt.fileindex."""
+import os
+import sys
+import tempfile
+import unittest
+
+from test_all import get_library_dir
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import testcommon
+
+import apt.fileindex
+
+
+class TestFileIndex(testcommon.TestCase):
+    def setUp(self):
+        testcommon.TestCase.setUp(self)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.infodir = os.path.join(self.tmpdir.name, "info")
+        self.path = os.path.join(self.tmpdir.name, "fileindex.bin")
+        os.mkdir(self.infodir)
+        self.write_list("a", ["/.", "/usr", "/usr/bin", "/usr/bin/a"])
+        self.write_list("b:amd64", ["/.", "/usr", "/usr/lib", "/usr/lib/libb.so.1"])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_list(self, name, files, mtime=None):
+        path = os.path.join(self.infodir, name + ".list")
+        with open(path, "w") as fobj:
+            fobj.write("\n".join(files) + "\n")
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+
+    def test_queries(self):
+        index = apt.fileindex.FileIndex(self.infodir, self.path)
+        self.assertEqual(index.owners("/usr/bin/a"), ["a"])
+        self.assertEqual(sorted(index.owners("/usr/")), ["a", "b:amd64"])
+        self.assertEqual(index.owners("/usr/bin/b"), [])
+        self.assertIn("/usr/lib/libb.so.1", index)
+        self.assertEqual(
+            list(index.find_prefix("/usr/lib")),
+            [("/usr/lib", ["b:amd64"]), ("/usr/lib/libb.so.1", ["b:amd64"])],
+        )
+        self.assertEqual(
+            list(index.glob("/usr/*/lib*.so.*")),
+            [("/usr/lib/libb.so.1", ["b:amd64"])],
+        )
+        self.assertEqual(index.files("a"), ["/.", "/usr", "/usr/bin", "/usr/bin/a"])
+        self.assertIsNone(index.files("c"))
+
+    def test_persistence_and_refresh(self):
+        index = apt.fileindex.FileIndex(self.infodir, self.path)
+        self.assertEqual(len(index), 6)
+        self.assertTrue(os.path.exists(self.path))
+
+        # A new index object reads the stored index and has nothing to do
+        index = apt.fileindex.FileIndex(self.infodir, self.path)
+        self.assertFalse(index.loaded)
+        self.assertFalse(index.refresh())
+        self.assertTrue(index.loaded)
+        self.assertEqual(len(index), 6)
+
+        # Changed, added and removed list files are picked up
+        self.write_list("a", ["/.", "/usr", "/usr/bin", "/usr/bin/a2"], mtime=1)
+        self.write_list("c", ["/.", "/etc", "/etc/c.conf"])
+        os.unlink(os.path.join(self.infodir, "b:amd64.list"))
+        self.assertTrue(index.refresh())
+        self.assertEqual(index.owners("/usr/bin/a"), [])
+        self.assertEqual(index.owners("/usr/bin/a2"), ["a"])
+        self.assertEqual(index.owners("/etc/c.conf"), ["c"])
+        self.assertEqual(index.owners("/usr/lib/libb.so.1"), [])
+        self.assertEqual(sorted(index.owners("/.")), ["a", "c"])
+
+    def test_refresh_names(self):
+        index = apt.fileindex.FileIndex(self.infodir, self.path)
+        self.assertEqual(index.files("a"), ["/.", "/usr", "/usr/bin", "/usr/bin/a"])
+
+        # Only the list files of the given packages are checked
+        self.write_list("a", ["/.", "/usr", "/usr/bin", "/usr/bin/a2"], mtime=1)
+        self.write_list("c", ["/.", "/etc", "/etc/c.conf"])
+        self.assertFalse(index.refresh(["b:amd64"]))
+        self.assertTrue(index.refresh(["a"]))
+        self.assertEqual(index.files("a"), ["/.", "/usr", "/usr/bin", "/usr/bin/a2"])
+        self.assertIsNone(index.files("c"))
+
+        os.unlink(os.path.join(self.infodir, "b:amd64.list"))
+        self.assertTrue(index.refresh(["b:amd64"]))
+        self.assertIsNone(index.files("b:amd64"))
+        self.assertTrue(index.refresh())
+        self.assertEqual(index.files("c"), ["/.", "/etc", "/etc/c.conf"])
+
+
+if __name__ == "__main__":
+    unittest.main()
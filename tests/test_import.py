@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Unit tests for the lazy loading of the apt package."""
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from test_all import get_library_dir
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import testcommon
+
+import apt
+
+CHILD = """\
+import json, sys
+import apt, apt_pkg
+before = sorted(name for name in sys.modules if name.startswith("apt."))
+initialized = "APT" in apt_pkg.config
+apt.Cache, apt.package.Version
+after = sorted(name for name in sys.modules if name.startswith("apt."))
+print(json.dumps([before, initialized, after]))
+"""
+
+CHILD_SOURCES = """\
+import apt_pkg
+import apt, aptsources, aptsources.distinfo, aptsources.sourceslist
+print("APT" in apt_pkg.config)
+"""
+
+
+class TestImport(testcommon.TestCase):
+    def test_lazy(self):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        env.pop("APT_CONFIG", None)
+        output = subprocess.check_output([sys.executable, "-c", CHILD], env=env)
+        before, initialized, after = json.loads(output)
+        self.assertEqual(before, [])
+        self.assertFalse(initialized)
+        self.assertIn("apt.cache", after)
+        self.assertIn("apt.package", after)
+
+    def test_no_init(self):
+        """Importing apt and aptsources does not initialize apt_pkg."""
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        env.pop("APT_CONFIG", None)
+        output = subprocess.check_output(
+            [sys.executable, "-c", CHILD_SOURCES], env=env, text=True
+        )
+        self.assertEqual(output.strip(), "False")
+
+    def test_attributes(self):
+        import apt.cache
+
+        self.assertIs(apt.Cache, apt.cache.Cache)
+        self.assertIs(apt.ProblemResolver, apt.cache.ProblemResolver)
+        self.assertIn("scan_roots", dir(apt))
+        self.assertRaises(AttributeError, getattr, apt, "no_such_name")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Unit tests for sharing generated caches with apt.indexstore."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from test_all import get_library_dir
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import apt_pkg
+import testcommon
+
+import apt
+from apt.indexstore import IndexStore
+
+
+class TestIndexStore(testcommon.TestCase):
+    def setUp(self):
+        testcommon.TestCase.setUp(self)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.roots = []
+        for i in range(2):
+            root = os.path.join(self.tmpdir.name, str(i))
+            for path in ["etc/apt", "var/lib/dpkg", "var/lib/apt/lists"]:
+                shutil.copytree(
+                    os.path.join("data", "test_debs", path), os.path.join(root, path)
+                )
+            self.roots.append(root)
+        self.store = IndexStore(os.path.join(self.tmpdir.name, "store"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def open(self, root, config=None):
+        if config is None:
+            config = apt_pkg.Configuration()
+            apt_pkg.init_config(config)
+            config.set("APT::Architecture", "i386")
+            config.set("APT::Architectures", "i386")
+        return apt.Cache(rootdir=root, config=config, index_store=self.store)
+
+    def write_first_stanza(self, root):
+        """Keep only the first package in the status file of *root*."""
+        status = os.path.join(root, "var/lib/dpkg/status")
+        with open(status) as fobj:
+            first = fobj.read().split("\n\n")[0]
+        with open(status, "w") as fobj:
+            fobj.write(first + "\n")
+
+    def entries(self, path):
+        return sorted(name for name in os.listdir(path) if len(name) == 64)
+
+    def test_shared(self):
+        cache = self.open(self.roots[0])
+        self.assertTrue(cache["postfix"].is_installed)
+        self.assertRaises(ValueError, cache.commit)
+        self.assertRaises(ValueError, cache.update)
+        cache.close()
+
+        (lists_key,) = self.entries(self.store.directory)
+        lists_entry = os.path.join(self.store.directory, lists_key)
+        (status_key,) = self.entries(lists_entry)
+        srcpkgcache = os.path.join(lists_entry, "srcpkgcache.bin")
+        pkgcache = os.path.join(lists_entry, status_key, "pkgcache.bin")
+        mtimes = os.stat(srcpkgcache).st_mtime_ns, os.stat(pkgcache).st_mtime_ns
+
+        # An identical root directory maps the stored caches
+        cache = self.open(self.roots[1])
+        self.assertTrue(cache["postfix"].is_installed)
+        cache.close()
+        self.assertEqual(
+            (os.stat(srcpkgcache).st_mtime_ns, os.stat(pkgcache).st_mtime_ns), mtimes
+        )
+
+        # A different status file gets an entry of its own, but reuses the
+        # source package cache
+        self.write_first_stanza(self.roots[1])
+        cache = self.open(self.roots[1])
+        self.assertFalse(cache["postfix"].is_installed)
+        cache.close()
+        self.assertEqual(self.entries(self.store.directory), [lists_key])
+        self.assertEqual(len(self.entries(lists_entry)), 2)
+        self.assertEqual(os.stat(srcpkgcache).st_mtime_ns, mtimes[0])
+
+
+    def test_reopen(self):
+        config = apt_pkg.Configuration()
+        apt_pkg.init_config(config)
+        config.set("APT::Architecture", "i386")
+        config.set("APT::Architectures", "i386")
+        cache = self.open(self.roots[0], config)
+        status = os.path.join(self.roots[0], "var/lib/dpkg/status")
+        self.assertEqual(config.find_file("Dir::State::status"), status)
+        self.assertNotEqual(cache.config.find_file("Dir::State::status"), status)
+        self.assertFalse(cache.dpkg_journal_dirty)
+        self.assertEqual(
+            cache.file_index.infodir, os.path.join(os.path.dirname(status), "info")
+        )
+        self.assertTrue(cache["postfix"].is_installed)
+
+        # Opening the cache again picks up the changed status file
+        self.write_first_stanza(self.roots[0])
+        cache.open()
+        self.assertFalse(cache["postfix"].is_installed)
+        self.assertEqual(config.find_file("Dir::State::status"), status)
+
+
+    def test_keys_digests(self):
+        config = apt_pkg.Configuration()
+        apt_pkg.init_config(config)
+        config.set("Dir", self.roots[0])
+        keys = self.store.keys(config)
+        self.assertTrue(os.path.exists(os.path.join(self.store.directory, "digests")))
+
+        # Unchanged files are not hashed again, also not by another process
+        store = IndexStore(self.store.directory)
+        with mock.patch("apt.indexstore._hash_file") as hash_file:
+            self.assertEqual(store.keys(config), keys)
+        hash_file.assert_not_called()
+
+        self.write_first_stanza(self.roots[0])
+        self.assertEqual(store.keys(config)[0], keys[0])
+        self.assertNotEqual(store.keys(config)[1], keys[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Unit tests for reading the status of APT and dpkg in InstallProgress."""
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+from test_all import get_library_dir
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+import testcommon
+
+from apt.progress.base import InstallProgress, InstallTelemetry
+
+STATUS_LINES = [
+    "pmstatus:hello:20.0:Preparing hello",
+    "processing:install:hello",
+    "status:hello:half-installed",
+    "pmstatus:hello:60.0:Configuring hello",
+    "pmconffile:/etc/hello.conf:40:'/etc/hello.conf' '/etc/hello.conf.dpkg-new' 1 1",
+    "pmerror:hello:80.0:subprocess failed",
+    "status:hello:installed",
+]
+
+
+class StatusWriter:
+    """Write many status lines in small pieces, like dpkg does."""
+
+    def __init__(self, repeat=200):
+        self.repeat = repeat
+
+    def do_install(self, fd):
+        data = ("\n".join(STATUS_LINES) + "\n").encode("utf-8") * self.repeat
+        for i in range(0, len(data), 100):
+            os.write(fd, data[i : i + 100])
+        return 0
+
+
+class RecordingProgress(InstallProgress):
+    def __init__(self):
+        InstallProgress.__init__(self)
+        self.calls = []
+
+    def status_change(self, pkg, percent, status):
+        self.calls.append(("status_change", pkg, percent, status))
+
+    def processing(self, pkg, stage):
+        self.calls.append(("processing", pkg, stage))
+
+    def dpkg_status_change(self, pkg, status):
+        self.calls.append(("dpkg_status_change", pkg, status))
+
+    def conffile(self, current, new):
+        self.calls.append(("conffile", current, new))
+
+    def error(self, pkg, errormsg):
+        self.calls.append(("error", pkg, errormsg))
+
+
+EXPECTED_CALLS = [
+    ("status_change", "hello", 20.0, "Preparing hello"),
+    ("processing", "hello", "install"),
+    ("dpkg_status_change", "hello", "half-installed"),
+    ("status_change", "hello", 60.0, "Configuring hello"),
+    ("conffile", "/etc/hello.conf", "/etc/hello.conf.dpkg-new"),
+    ("error", "hello", "subprocess failed"),
+    ("dpkg_status_change", "hello", "installed"),
+]
+
+
+class TestInstallProgress(testcommon.TestCase):
+    def test_partial_lines(self):
+        with RecordingProgress() as prog:
+            os.write(prog.writefd, b"status:hello:inst")
+            prog.update_interface()
+            self.assertEqual(prog.calls, [])
+            os.write(prog.writefd, b"alled\nstatus:hello:")
+            prog.update_interface()
+            self.assertEqual(prog.calls, [("dpkg_status_change", "hello", "installed")])
+
+    def test_run(self):
+        with RecordingProgress() as prog:
+            self.assertEqual(prog.run(StatusWriter()), 0)
+            self.assertEqual(prog.calls[: len(EXPECTED_CALLS)], EXPECTED_CALLS)
+            self.assertEqual(len(prog.calls), 200 * len(EXPECTED_CALLS))
+
+    def test_run_async(self):
+        with RecordingProgress() as prog:
+            self.assertEqual(asyncio.run(prog.run_async(StatusWriter())), 0)
+            self.assertEqual(prog.calls[: len(EXPECTED_CALLS)], EXPECTED_CALLS)
+            self.assertEqual(len(prog.calls), 200 * len(EXPECTED_CALLS))
+
+    def test_telemetry(self):
+        now = [0.0]
+        telemetry = InstallTelemetry(clock=lambda: now[0])
+        lines = [
+            (0.0, "pmstatus:hello:10.0:Preparing hello"),
+            (1.0, "pmstatus:hello:20.0:Unpacking hello"),
+            (3.0, "pmstatus:libfoo:30.0:Preparing to configure libfoo"),
+            (3.5, "status:libfoo:installed"),
+            (4.0, "pmstatus:hello:40.0:Configuring hello"),
+            (6.0, "pmstatus:hello:50.0:Installed hello"),
+            (6.0, "pmstatus:man-db:60.0:Running post-installation trigger man-db"),
+            (6.5, "pmstatus:dpkg-exec:70.0:Running dpkg"),
+            (7.0, "processing:remove:bar"),
+            (9.0, "processing:purge:bar"),
+        ]
+        with InstallProgress() as prog:
+            prog.telemetry = telemetry
+            for now[0], line in lines:
+                prog._parse_status_line(line)
+        now[0] = 10.0
+        telemetry.finish()
+
+        def entry(package, stage, seconds):
+            return {"package": package, "stage": stage, "seconds": seconds, "count": 1}
+
+        self.assertEqual(
+            telemetry.report(),
+            [
+                entry("hello", "unpack", 4.0),
+                entry("man-db", "trigproc", 4.0),
+                entry("bar", "remove", 2.0),
+                entry("hello", "configure", 2.0),
+                entry("bar", "purge", 1.0),
+                entry("libfoo", "configure", 0.5),
+            ],
+        )
+        report = json.loads(telemetry.to_json())
+        self.assertEqual(report["seconds"], 10.0)
+        self.assertEqual(report["packages"]["hello"], {"unpack": 4.0, "configure": 2.0})
+        self.assertEqual(len(report["stages"]), 6)
+
+    def test_telemetry_run(self):
+        with RecordingProgress() as prog:
+            prog.telemetry = InstallTelemetry()
+            prog.run(StatusWriter(repeat=1))
+        stages = {(e["package"], e["stage"]) for e in prog.telemetry.report()}
+        self.assertEqual(stages, {("hello", "unpack"), ("hello", "configure")})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Unit tests for waiting on locks held by other processes."""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from test_all import get_library_dir
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import apt_pkg
+import testcommon
+
+import apt.cache
+
+HOLDER = """\
+import fcntl, os, sys
+fd = os.open(sys.argv[1], os.O_RDWR | os.O_CREAT)
+fcntl.lockf(fd, fcntl.LOCK_EX)
+print("locked", flush=True)
+sys.stdin.read()
+"""
+
+
+class TestLock(testcommon.TestCase):
+    def setUp(self):
+        testcommon.TestCase.setUp(self)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "lock")
+        self.holder = subprocess.Popen(
+            [sys.executable, "-c", HOLDER, self.path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self.holder.stdout.readline()
+
+    def tearDown(self):
+        self.release()
+        self.tmpdir.cleanup()
+
+    def release(self):
+        if self.holder.poll() is None:
+            self.holder.stdin.close()
+            self.holder.wait()
+        self.holder.stdout.close()
+
+    def test_timeout(self):
+        lock = apt_pkg.FileLock(self.path)
+        self.assertEqual(lock.holder, self.holder.pid)
+        self.assertEqual(lock.timeout, 0)
+        self.assertRaises(apt_pkg.Error, lock.__enter__)
+
+        lock.timeout = 0.2
+        start = time.monotonic()
+        self.assertRaises(apt_pkg.Error, lock.__enter__)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+        self.assertRaises(ValueError, apt_pkg.FileLock, self.path, 1, 0)
+
+    def test_wait(self):
+        timer = threading.Timer(0.2, self.release)
+        timer.start()
+        try:
+            with apt_pkg.FileLock(self.path, timeout=10, poll=0.05) as lock:
+                self.assertIsNone(lock.holder)
+        finally:
+            timer.join()
+
+    def test_wrapped_lock(self):
+        lock = apt.cache._WrappedLock(self.tmpdir.name)
+        with self.assertRaises(apt.cache.LockFailedException) as cm:
+            lock.__enter__()
+        self.assertEqual(cm.exception.holder_pid, self.holder.pid)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,8 @@
 # are permitted in any medium without royalty provided the copyright
 # notice and this notice are preserved.
 
+import os
+import tempfile
 import unittest
 
 import apt_pkg
@@ -57,6 +59,47 @@ class TestAptPolicy(testcommon.TestCase):
                 policy.get_priority(ver)
                 dpolicy.get_priority(ver)
 
+    def test_apt_policy_arrays(self):
+        cache = apt_pkg.Cache()
+        policy = cache.policy
+        priorities = policy.priorities_array()
+        candidates = policy.candidates_array()
+        self.assertEqual(len(priorities), cache.version_count)
+        self.assertEqual(len(candidates), cache.package_count)
+
+        for pkg in cache.packages:
+            for ver in pkg.version_list:
+                self.assertEqual(priorities[ver.id], policy.get_priority(ver))
+            cand = policy.get_candidate_ver(pkg)
+            self.assertEqual(candidates[pkg.id], cand.id if cand else -1)
+
+    def test_candidate_diff(self):
+        config = apt_pkg.Configuration()
+        apt_pkg.init_config(config)
+        config.set("APT::Architecture", "i386")
+        config.set("APT::Architectures", "i386")
+        rootdir = os.path.abspath(os.path.join("data", "test_debs"))
+        cache = apt.Cache(rootdir=rootdir, memonly=True, config=config)
+        self.assertEqual(cache.candidate_diff(), {})
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            preferences = os.path.join(tmpdir, "preferences")
+            with open(preferences, "w") as fobj:
+                fobj.write("Package: autotools-dev\n")
+                fobj.write("Pin: version *\n")
+                fobj.write("Pin-Priority: -1\n")
+            diff = cache.candidate_diff(new=preferences)
+            self.assertEqual(list(diff), ["autotools-dev"])
+            old, new = diff["autotools-dev"]
+            self.assertEqual(old, cache["autotools-dev"].candidate)
+            self.assertIsNone(new)
+            self.assertEqual(
+                cache.candidate_diff(old=preferences)["autotools-dev"], (None, old)
+            )
+            self.assertEqual(cache.candidate_diff(preferences, preferences), {})
+        # The candidates of the cache itself do not change
+        self.assertEqual(cache["autotools-dev"].candidate, old)
+
     def test_apt_policy_highlevel(self):
         return  # TODO: Make tests independent of system state
         cache = apt.Cache()
@@ -52,6 +52,26 @@ class TestProgress(testcommon.TestCase):
         cache.update(progress)
         self.assertTrue(progress.pulsed)
 
+    def test_acquire_event_sink(self):
+        sink = apt_pkg.AcquireEventSink(capacity=2)
+        self.assertEqual(sink.capacity, 2)
+        self.assertRaises(ValueError, apt_pkg.AcquireEventSink, 0)
+        cache = apt.Cache()
+        cache.update(sink)
+        state = sink.snapshot()
+        self.assertFalse(state["running"])
+        self.assertEqual(state["workers"], [])
+        # Only the newest events are kept
+        self.assertEqual(sink.pending, 2)
+        self.assertGreater(state["dropped"], 0)
+        events = sink.drain()
+        self.assertEqual(len(events), 2)
+        self.assertEqual(events[-1][0], "stop")
+        self.assertEqual(sink.drain(), [])
+        self.assertFalse(sink.cancelled)
+        sink.cancel()
+        self.assertTrue(sink.cancelled)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Unit tests for apt.scan_roots()."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from test_all import get_library_dir
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import testcommon
+
+import apt
+import apt.scan
+
+
+def package_count(cache):
+    return len(cache)
+
+
+class TestScanRoots(testcommon.TestCase):
+    def setUp(self):
+        testcommon.TestCase.setUp(self)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.roots = []
+        for i, source in enumerate(["test_debs", "test_debs", "test-provides"]):
+            root = os.path.join(self.tmpdir.name, str(i))
+            for path in ["etc/apt", "var/lib/dpkg", "var/lib/apt/lists"]:
+                shutil.copytree(
+                    os.path.join("data", source, path), os.path.join(root, path)
+                )
+            self.roots.append(root)
+        self.options = {"APT::Architecture": "i386", "APT::Architectures": "i386"}
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def scan(self, query, **kwargs):
+        results = apt.scan_roots(
+            self.roots,
+            workers=2,
+            query=query,
+            options=self.options,
+            **kwargs,
+        )
+        return {result.rootdir: result for result in results}
+
+    def test_installed(self):
+        cachedir = os.path.join(self.tmpdir.name, "cache")
+        os.mkdir(cachedir)
+        results = self.scan("installed", cachedir=cachedir)
+        self.assertEqual(len(results), 3)
+        for root in self.roots:
+            self.assertIsNone(results[root].error)
+        self.assertEqual(results[self.roots[0]].result, results[self.roots[1]].result)
+        self.assertIn(
+            "postfix", [name for name, arch, ver in results[self.roots[2]].result]
+        )
+
+        # The first two roots share their lists, status and package cache
+        entries = [name for name in os.listdir(cachedir) if len(name) == 64]
+        self.assertEqual(len(entries), 2)
+        for lists_key in entries:
+            status_keys = [
+                name
+                for name in os.listdir(os.path.join(cachedir, lists_key))
+                if len(name) == 64
+            ]
+            self.assertEqual(len(status_keys), 1)
+            entry = os.path.join(cachedir, lists_key, status_keys[0])
+            self.assertTrue(os.path.exists(os.path.join(entry, "pkgcache.bin")))
+
+    def test_custom_query(self):
+        results = self.scan(package_count)
+        self.assertGreater(results[self.roots[2]].result, 0)
+        self.assertEqual(results[self.roots[0]].result, results[self.roots[1]].result)
+
+    def test_unknown_query(self):
+        self.assertRaises(ValueError, apt.scan_roots, self.roots, query="unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Unit tests for apt.search."""
+import os
+import sys
+import tempfile
+import unittest
+
+from test_all import get_library_dir
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import apt_pkg
+import testcommon
+
+import apt
+import apt.cache
+import apt.search
+
+PACKAGES = """\
+Package: python3-apt
+Architecture: amd64
+Version: 3.0
+Description-md5: 0123456789abcdef0123456789abcdef
+
+Package: libfoo1
+Architecture: i386
+Version: 1.0
+Description: Library for foo
+ The foo library implements the Python bindings of nothing.
+
+Package: apt
+Architecture: amd64
+Version: 2.0
+Description: commandline package manager
+ This package provides commandline tools for searching and managing
+ packages with Python bindings.
+"""
+
+TRANSLATION = """\
+Package: python3-apt
+Description-md5: 0123456789abcdef0123456789abcdef
+Description-en: Python 3 interface to libapt-pkg
+ The apt_pkg Python 3 module provides access to APT internal structures.
+"""
+
+
+class TestSearchIndex(testcommon.TestCase):
+    def setUp(self):
+        testcommon.TestCase.setUp(self)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.packages = os.path.join(self.tmpdir.name, "Packages")
+        self.translation = os.path.join(self.tmpdir.name, "Translation-en")
+        self.path = os.path.join(self.tmpdir.name, "searchindex.bin")
+        with open(self.packages, "w") as fobj:
+            fobj.write(PACKAGES)
+        with open(self.translation, "w") as fobj:
+            fobj.write(TRANSLATION)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def index(self):
+        return apt.search.SearchIndex(
+            [self.packages, self.translation], self.path, "amd64"
+        )
+
+    def names(self, index, query, fields=("name", "summary", "description")):
+        return [name for name, _score in index.search(query, fields)]
+
+    def test_tokenize(self):
+        self.assertEqual(
+            apt.search.tokenize("The python3-apt, libstdc++6."),
+            {"the", "python3-apt", "python3", "apt", "libstdc++6", "libstdc", "6"},
+        )
+
+    def test_search(self):
+        index = self.index()
+        self.assertEqual(len(index), 3)
+        # Exact names first, then matches in the name, summary, description
+        self.assertEqual(self.names(index, "apt"), ["apt", "python3-apt"])
+        self.assertEqual(self.names(index, "python bindings"), ["apt", "libfoo1:i386"])
+        self.assertEqual(
+            self.names(index, "Python"), ["python3-apt", "apt", "libfoo1:i386"]
+        )
+        self.assertEqual(self.names(index, "python3", ["name"]), ["python3-apt"])
+        self.assertEqual(self.names(index, "python", ["summary"]), ["python3-apt"])
+        self.assertEqual(self.names(index, "python nothing"), ["libfoo1:i386"])
+        self.assertEqual(self.names(index, "python missing"), [])
+        self.assertEqual(self.names(index, ""), [])
+        self.assertRaises(ValueError, index.search, "apt", ["maintainer"])
+
+    def test_persistence_and_refresh(self):
+        index = self.index()
+        self.assertEqual(len(index), 3)
+        self.assertTrue(os.path.exists(self.path))
+
+        index = self.index()
+        self.assertFalse(index.refresh())
+        self.assertEqual(self.names(index, "library"), ["libfoo1:i386"])
+
+        with open(self.packages, "a") as fobj:
+            fobj.write("\nPackage: bar\nArchitecture: all\nVersion: 1\n")
+            fobj.write("Description: Library for bar\n")
+        self.assertTrue(index.refresh())
+        # The summary and description of libfoo1 both match
+        self.assertEqual(self.names(index, "library"), ["libfoo1:i386", "bar"])
+        self.assertTrue(index.save())
+        self.assertFalse(self.index().refresh())
+
+    def test_translation_order(self):
+        translation_de = os.path.join(self.tmpdir.name, "Translation-de")
+        with open(translation_de, "w") as fobj:
+            fobj.write(
+                TRANSLATION.replace("Description-en", "Description-de").replace(
+                    "Python 3 interface", "Python 3 Schnittstelle"
+                )
+            )
+        # The description is taken from the first translation file
+        for files, expected in [
+            ([translation_de, self.translation], ["python3-apt"]),
+            ([self.translation, translation_de], []),
+        ]:
+            path = files[0] + ".searchindex"
+            index = apt.search.SearchIndex([self.packages, *files], path, "amd64")
+            self.assertEqual(self.names(index, "schnittstelle"), expected)
+
+    def test_unwritable(self):
+        path = os.path.join(self.tmpdir.name, "missing", "searchindex.bin")
+        index = apt.search.SearchIndex([self.packages], path, "amd64")
+        self.assertEqual(self.names(index, "library"), ["libfoo1:i386"])
+        self.assertFalse(index.save())
+
+
+class TestCacheSearch(testcommon.TestCase):
+    def test_search(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config = apt_pkg.Configuration()
+            apt_pkg.init_config(config)
+            config.set("APT::Architecture", "i386")
+            config.set("APT::Architectures", "i386")
+            config.set("Dir::Cache::searchindex", tmpdir + "/searchindex.bin")
+            rootdir = os.path.abspath(os.path.join("data", "test_debs"))
+            cache = apt.Cache(rootdir=rootdir, memonly=True, config=config)
+            self.assertEqual(
+                [pkg.name for pkg in cache.search("mail transport")], ["postfix"]
+            )
+            self.assertEqual(
+                [pkg.name for pkg in cache.search("config.guess")], ["autotools-dev"]
+            )
+            self.assertEqual(cache.search("dpkg", ["name"]), [])
+            self.assertIs(cache.search("dpkg")[0], cache["apt"])
+            self.assertTrue(os.path.exists(tmpdir + "/searchindex.bin"))
+
+    def test_translation_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for lang in "de", "en", "fr", "pt_BR":
+                open(f"{tmpdir}/host_dists_main_i18n_Translation-{lang}", "w").close()
+            open(f"{tmpdir}/host_dists_main_binary-all_Packages", "w").close()
+            self.assertEqual(
+                [
+                    os.path.basename(path).rpartition("-")[2]
+                    for path in apt.cache._translation_files(tmpdir, ["pt_BR", "de"])
+                ],
+                ["pt_BR", "de", "en"],
+            )
+            self.assertEqual(
+                [
+                    os.path.basename(path).rpartition("-")[2]
+                    for path in apt.cache._translation_files(tmpdir, ["en", "fr"])
+                ],
+                ["en", "fr"],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
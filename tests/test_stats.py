@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+#
+# Copying and distribution of this file, with or without modification,
+# are permitted in any medium without royalty provided the copyright
+# notice and this notice are preserved.
+"""Unit tests for apt_pkg.stats() and apt.stats."""
+import os
+import sys
+import unittest
+
+from test_all import get_library_dir
+
+libdir = get_library_dir()
+if libdir:
+    sys.path.insert(0, libdir)
+
+import apt_pkg
+import testcommon
+
+import apt
+import apt.progress.base
+import apt.stats
+
+
+class TestStats(testcommon.TestCase):
+    def setUp(self):
+        testcommon.TestCase.setUp(self)
+        apt.stats.reset()
+
+    def tearDown(self):
+        apt.stats.enable(False)
+        apt.stats.reset()
+
+    def open_cache(self):
+        config = apt_pkg.Configuration()
+        apt_pkg.init_config(config)
+        config.set("APT::Architecture", "i386")
+        config.set("APT::Architectures", "i386")
+        rootdir = os.path.abspath(os.path.join("data", "test_debs"))
+        return apt.Cache(
+            apt.progress.base.OpProgress(), rootdir=rootdir, memonly=True, config=config
+        )
+
+    def test_disabled(self):
+        cache = self.open_cache()
+        cache["postfix"].candidate.record
+        stats = apt.stats.stats()
+        self.assertEqual(stats["record_lookups"], 0)
+        self.assertEqual(stats["package_wrappers"], 0)
+        self.assertEqual(stats["allocations"], {})
+
+    def test_counters(self):
+        self.assertFalse(apt.stats.enable())
+        cache = self.open_cache()
+        pkg = cache["postfix"]
+        pkg.candidate.record
+        pkg.mark_install()
+        status = os.path.join("data", "test_debs", "var", "lib", "dpkg", "status")
+        with apt_pkg.TagFile(status) as tagfile:
+            sections = len(list(tagfile))
+
+        stats = apt.stats.stats()
+        self.assertGreaterEqual(stats["package_wrappers"], 1)
+        self.assertGreaterEqual(stats["version_wrappers"], 1)
+        self.assertGreaterEqual(stats["record_lookups"], 1)
+        self.assertGreater(stats["record_bytes"], 0)
+        self.assertEqual(stats["tag_sections"], sections)
+        self.assertGreater(stats["tag_bytes"], 0)
+        self.assertGreater(stats["progress_calls"], 0)
+        self.assertGreaterEqual(stats["progress_time"], 0.0)
+        self.assertGreaterEqual(stats["marks"]["install"], 1)
+        self.assertGreater(stats["allocations"]["apt_pkg.Package"], 0)
+
+        self.assertTrue(apt.stats.enable(False))
+        cache["apt"].candidate
+        self.assertEqual(apt.stats.stats(), stats)
+        apt.stats.reset()
+        stats = apt.stats.stats()
+        self.assertEqual(stats["package_wrappers"], 0)
+        self.assertEqual(stats["record_lookups"], 0)
+        self.assertEqual(stats["marks"]["install"], 0)
+        self.assertEqual(stats["allocations"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
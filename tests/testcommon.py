@@ -30,3 +30,28 @@ class TestCase(unittest.TestCase):
         # Restore default values
         apt_pkg.config["Dir::Etc::main"] = "apt.conf"
         apt_pkg.config["Dir::Etc::parts"] = "apt.conf.d"
+
+    @staticmethod
+    def write_status_file(packages, relations=None, versions=None):
+        """Write installed *packages* to the status file.
+
+        The optional dictionary *relations* maps package names to relation
+        fields, such as ``"Depends: b"``, added to their stanzas, and
+        *versions* maps them to their versions, which default to 1.
+        """
+        relations = relations or {}
+        versions = versions or {}
+        with open(apt_pkg.config["Dir::State::Status"], "w") as fobj:
+            for package in packages:
+                print("Package:", package, file=fobj)
+                print("Status: install ok installed", file=fobj)
+                print("Priority: optional", file=fobj)
+                print("Section: admin", file=fobj)
+                print("Installed-Size: 1", file=fobj)
+                print("Maintainer: X <x@x.invalid>", file=fobj)
+                print("Architecture: all", file=fobj)
+                print("Version:", versions.get(package, 1), file=fobj)
+                print("Description: blah", file=fobj)
+                if relations.get(package):
+                    print(relations[package], file=fobj)
+                print("", file=fobj)
@@ -35,8 +35,11 @@ class Configuration(Mapping[str, str]):
 config = Configuration()
 
 def init() -> None: ...
-def init_config() -> None: ...
+def init_config(configuration: Configuration = ...) -> None: ...
 def init_system() -> None: ...
+def swap_config(
+    configuration: Configuration, init_system: bool = False
+) -> Configuration: ...
 
 # FIXME: this is really a file-like object
 def md5sum(o: Any) -> str: ...
@@ -196,11 +199,24 @@ class Acquire:
     RESULT_CANCELLED: int
     RESULT_FAILED: int
     RESULT_CONTINUE: int
-    def __init__(self, progress: Optional[AcquireProgress] = None) -> None: ...
+    def __init__(
+        self, progress: Optional[Union[AcquireProgress, AcquireEventSink]] = None
+    ) -> None: ...
     def run(self) -> int: ...
     def shutdown(self) -> None: ...
     def get_lock(self, path: str) -> None: ...
 
+class AcquireEventSink:
+    cancelled: bool
+    capacity: int
+    pending: int
+    def __init__(self, capacity: int = 4096) -> None: ...
+    def drain(
+        self, max_events: int = -1
+    ) -> List[Tuple[str, str, str, str, int, int, str]]: ...
+    def snapshot(self) -> Dict[str, Any]: ...
+    def cancel(self) -> None: ...
+
 class AcquireWorker:
     current_item: AcquireItemDesc
     current_size: int
@@ -296,6 +312,18 @@ class SourceRecords:
 class ActionGroup:
     def __init__(self, depcache: DepCache) -> None: ...
 
+class OrderList:
+    def __init__(self, depcache: DepCache) -> None: ...
+    def __getitem__(self, index: int) -> Package: ...
+    def __len__(self) -> int: ...
+    def append(self, pkg: Package) -> None: ...
+    def score(self, pkg: Package) -> int: ...
+    def order_critical(self) -> None: ...
+    def order_unpack(self) -> None: ...
+    def order_configure(self) -> None: ...
+    def levels(self) -> List[List[Package]]: ...
+    def edges(self) -> List[Tuple[Package, Package, str]]: ...
+
 class MetaIndex:
     dist: str
     index_files: List[IndexFile]
@@ -323,8 +351,24 @@ class Cache:
     def __getitem__(self, name: Union[str, Tuple[str, str]]) -> Package: ...
     def __len__(self) -> int: ...
     def update(
-        self, progress: AcquireProgress, sources: SourceList, pulse_interval: int
+        self,
+        progress: Union[AcquireProgress, AcquireEventSink],
+        sources: SourceList,
+        pulse_interval: int,
     ) -> int: ...
+    def closure(
+        self,
+        packages: Sequence[Union[Package, int]],
+        types: Sequence[str] = ...,
+        which: str = "candidate",
+        or_policy: str = "all",
+        reverse: bool = False,
+    ) -> Set[int]: ...
+    def clear_closures(self, which: str = ...) -> None: ...
+    def dependency_graph(
+        self, types: Sequence[str] = ..., which: str = "candidate"
+    ) -> Dict[str, Any]: ...
+    def fingerprint(self) -> bytes: ...
 
 class DepCache:
     broken_count: int
@@ -362,19 +406,38 @@ class DepCache:
     def phasing_applied(self, pkg: Package) -> bool: ...
 
 class Policy:
+    def __init__(self, cache: Cache) -> None: ...
     def get_priority(self, pkg: Union[PackageFile, Version]) -> int: ...
+    def get_candidate_ver(self, pkg: Package) -> Optional[Version]: ...
+    def read_pinfile(self, filename: str) -> bool: ...
+    def read_pindir(self, dirname: str) -> bool: ...
+    def init_defaults(self) -> None: ...
+    def priorities_array(self) -> memoryview: ...
+    def candidates_array(self) -> memoryview: ...
 
 class SystemLock:
+    holder: Optional[int]
+    poll: float
+    timeout: float
+    def __init__(self, timeout: float = -1, poll: float = 1) -> None: ...
     def __enter__(self) -> None: ...
     def __exit__(self, typ: object, value: object, traceback: object) -> None: ...
 
 class FileLock:
-    def __init__(self, path: str) -> None: ...
+    holder: Optional[int]
+    poll: float
+    timeout: float
+    def __init__(self, path: str, timeout: float = 0, poll: float = 1) -> None: ...
     def __enter__(self) -> None: ...
     def __exit__(self, typ: object, value: object, traceback: object) -> None: ...
 
 def upstream_version(ver: str) -> str: ...
 def get_architectures() -> List[str]: ...
+def get_languages() -> List[str]: ...
+def cache_fingerprint(filename: str) -> bytes: ...
+def stats() -> Dict[str, Any]: ...
+def enable_stats(enable: bool = True) -> bool: ...
+def reset_stats() -> None: ...
 def check_dep(pkg_ver: str, dep_op: str, dep_ver: str) -> bool: ...
 def uri_to_filename(uri: str) -> str: ...
 def str_to_time(rfc_time: str) -> int: ...